@@ -0,0 +1,270 @@
+"""
+Permission-checked serving of the uploaded media files.
+
+``MediaFileView`` serves the card request documents, their previews and the
+profile pictures under ``MEDIA_URL`` to their owner and to admins (the rule of
+``cards.permissions.IsOwnerOrAdmin``), in production as in development.
+
+Responses carry a strong ``ETag`` and ``Last-Modified``; ``If-None-Match`` and
+``If-Modified-Since`` are answered with an empty 304, so a document already
+seen is never transferred again. The bytes themselves are handed off:
+
+* ``MEDIA_SENDFILE_BACKEND = 'x-accel-redirect'``: nginx serves the file from
+  the internal location ``MEDIA_SENDFILE_URL_PREFIX``;
+* ``'x-sendfile'``: Apache (mod_xsendfile) or lighttpd serves the file path;
+* ``None``: Django serves it, a whole file through ``wsgi.file_wrapper``
+  (``os.sendfile`` under gunicorn and uWSGI), a byte range in blocks.
+
+Single byte ranges (``Range: bytes=...``, with ``If-Range``) are supported by
+all three; other files under ``MEDIA_ROOT`` are never served.
+
+The API returns signed URLs (``signed_url``, ``SignedFileField``,
+``SignedImageField``): a
+``signature`` query parameter grants access to one file, without credentials,
+for ``MEDIA_URL_MAX_AGE`` seconds, so the frontend can use them in plain links
+and images. Without a valid signature the token of the owner or of an admin
+is required.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from collections import namedtuple
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import serializers
+from rest_framework.views import APIView
+
+from cards.models import CardRequest, DocumentUpload
+from cards.permissions import IsOwnerOrAdmin
+from users.models import CustomUser
+
+BLOCK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+SIGNATURE_SALT = 'backend.media'
+
+# A served file and its owner, checked by IsOwnerOrAdmin
+MediaFile = namedtuple('MediaFile', ['name', 'user'])
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def file_etag(stat):
+    """Strong validator: stored files are never rewritten in place"""
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+    """First and last byte of a single range, None to send the whole file"""
+    match = RANGE_RE.match(header.strip())
+    if not match or not any(match.groups()):
+        # Several ranges or an invalid header: the whole file is an allowed answer
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if not length or not size:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+
+    first = int(first)
+    if first >= size:
+        raise RangeNotSatisfiable()
+    last = min(int(last), size - 1) if last else size - 1
+    if last < first:
+        return None
+    return first, last
+
+
+def iter_range(path, first, last):
+    with open(path, 'rb') as fileobj:
+        fileobj.seek(first)
+        remaining = last - first + 1
+        while remaining:
+            block = fileobj.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def serve_file(request, name):
+    """Response for the media file ``name`` (relative to MEDIA_ROOT)"""
+    try:
+        path = safe_join(settings.MEDIA_ROOT, name)
+        stat = os.stat(path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404("File not found")
+
+    etag = file_etag(stat)
+    # HTTP dates have a one second resolution
+    mtime = int(stat.st_mtime)
+    last_modified = http_date(mtime)
+    content_type, encoding = mimetypes.guess_type(path)
+
+    # 304 (or 412) without opening the file
+    conditional = get_conditional_response(request, etag=etag, last_modified=mtime)
+    if conditional is None:
+        byte_range = None
+        range_header = request.META.get('HTTP_RANGE')
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if range_header and (not if_range or if_range in (etag, last_modified)):
+            try:
+                byte_range = parse_range(range_header, stat.st_size)
+            except RangeNotSatisfiable:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{stat.st_size}'
+                return response
+        response = _file_response(name, path, stat, content_type, byte_range)
+    else:
+        response = conditional
+
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = f"private, max-age={getattr(settings, 'MEDIA_CACHE_MAX_AGE', 0)}"
+    response['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+
+def _file_response(name, path, stat, content_type, byte_range):
+    backend = getattr(settings, 'MEDIA_SENDFILE_BACKEND', None)
+    content_type = content_type or 'application/octet-stream'
+
+    if backend is not None:
+        # The web server sends the bytes and handles the Range header itself
+        response = HttpResponse(content_type=content_type)
+        if backend == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = settings.MEDIA_SENDFILE_URL_PREFIX + quote(name)
+        elif backend == 'x-sendfile':
+            response['X-Sendfile'] = path
+        else:
+            raise ValueError(f"Unknown MEDIA_SENDFILE_BACKEND: {backend}")
+    elif byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    else:
+        first, last = byte_range
+        response = StreamingHttpResponse(iter_range(path, first, last), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {first}-{last}/{stat.st_size}'
+        response['Content-Length'] = str(last - first + 1)
+
+    response['Content-Disposition'] = f"inline; filename*=UTF-8''{quote(os.path.basename(name))}"
+    return response
+
+
+def signed_url(name):
+    """URL of the media file ``name``, valid without credentials for MEDIA_URL_MAX_AGE seconds"""
+    signer = signing.TimestampSigner(salt=SIGNATURE_SALT)
+    # "<name>:<timestamp>:<signature>", the name is already in the path
+    signature = signer.sign(name)[len(name) + 1:]
+    return f"{default_storage.url(name)}?{urlencode({'signature': signature})}"
+
+
+def has_valid_signature(name, signature):
+    signer = signing.TimestampSigner(salt=SIGNATURE_SALT)
+    try:
+        signer.unsign(f'{name}{signer.sep}{signature}', max_age=getattr(settings, 'MEDIA_URL_MAX_AGE', 600))
+    except signing.BadSignature:
+        # Also raised once the signature has expired
+        return False
+    return True
+
+
+class SignedURLMixin:
+    """Represent a file field by a signed URL (see signed_url)"""
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        url = signed_url(value.name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+
+class SignedFileField(SignedURLMixin, serializers.FileField):
+    pass
+
+
+class SignedImageField(SignedURLMixin, serializers.ImageField):
+    pass
+
+
+def _is_document_owner(name, user):
+    return (
+        CardRequest.objects.filter(Q(identity_document=name) | Q(income_proof=name), user=user).exists()
+        or DocumentUpload.objects.filter(file=name, user=user).exists()
+    )
+
+
+def _is_preview_owner(name, user):
+    # previews/<2 chars>/<sha256>-<size>.jpg, shared by identical documents
+    sha256 = os.path.basename(name).split('-')[0]
+    return CardRequest.objects.filter(
+        Q(document_previews__identity_document__sha256=sha256)
+        | Q(document_previews__income_proof__sha256=sha256),
+        user=user
+    ).exists()
+
+
+def _is_profile_picture_owner(name, user):
+    return CustomUser.objects.filter(pk=user.pk, profile_picture=name).exists()
+
+
+# Served directories, and whether a user owns one of their files
+MEDIA_OWNERS = {
+    'documents/': _is_document_owner,
+    'previews/': _is_preview_owner,
+    CustomUser._meta.get_field('profile_picture').upload_to: _is_profile_picture_owner,
+}
+
+
+class MediaFileView(APIView):
+    """Serve a media file to its owner or to an admin, or with a valid signature"""
+
+    permission_classes = [IsOwnerOrAdmin]
+
+    def check_permissions(self, request):
+        # A signature is checked in get_object, credentials are then optional
+        if 'signature' not in request.query_params:
+            super().check_permissions(request)
+
+    def get_object(self, path):
+        # Match the owners on the path actually served: "documents/../x" is "x"
+        path = posixpath.normpath(path)
+        if path.startswith('/') or path == '..' or path.startswith('../'):
+            raise Http404("File not found")
+        for prefix, is_owner in MEDIA_OWNERS.items():
+            if path.startswith(prefix):
+                signature = self.request.query_params.get('signature')
+                if signature is not None:
+                    if has_valid_signature(path, signature):
+                        return MediaFile(path, None)
+                    # Expired or forged: fall back to the credentials
+                    super().check_permissions(self.request)
+                user = self.request.user
+                # Admins may see any file, including orphans. A file may be
+                # shared by several users (e.g. the preview of identical
+                # documents): the question is whether this user is one of them
+                owner = user if not user.is_admin and is_owner(path, user) else None
+                media_file = MediaFile(path, owner)
+                self.check_object_permissions(self.request, media_file)
+                return media_file
+        raise Http404("File not found")
+
+    def get(self, request, path):
+        media_file = self.get_object(path)
+        return serve_file(request, media_file.name)
@@ -0,0 +1,85 @@
+"""
+Keyset (cursor) pagination shared by the admin list endpoints.
+
+Pages are selected with ``WHERE <ordering field> < <cursor position>`` over a
+composite ``(ordering field, id)`` index instead of OFFSET, so page N costs
+the same as page 1. The id tiebreaker keeps the ordering total; rows sharing
+the same ordering value are skipped with the (small) offset stored in the
+cursor, as DRF's ``CursorPagination`` does.
+
+No ``COUNT(*)`` is run by default. ``count`` is an estimate read from the
+table statistics for unfiltered lists, or ``null``. Clients that need the
+exact total pass ``?count=exact``.
+"""
+from django.db import connections
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(CursorPagination):
+    """Cursor pagination over the view's ``ordering`` with an optional count"""
+
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    count_query_param = 'count'
+    ordering = ('-id',)
+
+    def get_ordering(self, request, queryset, view):
+        # Each view declares its own ordering, with an id tiebreaker
+        ordering = getattr(view, 'ordering', None)
+        if ordering:
+            return (ordering,) if isinstance(ordering, str) else tuple(ordering)
+        return super().get_ordering(request, queryset, view)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = self.get_count(queryset, request)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_count(self, queryset, request):
+        """Exact count when requested, else a cheap estimate when available"""
+        if request.query_params.get(self.count_query_param) == 'exact':
+            return queryset.count()
+        if queryset.query.where:
+            # A filtered list cannot be estimated from the table statistics
+            return None
+        return estimate_row_count(queryset.model, queryset.db)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'count': self.count,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count'] = {
+            'type': 'integer',
+            'nullable': True,
+        }
+        return response_schema
+
+
+def estimate_row_count(model, using='default'):
+    """Approximate number of rows of a model's table, or None if unknown"""
+    connection = connections[using]
+    table = model._meta.db_table
+
+    if connection.vendor == 'mysql':
+        sql = (
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s"
+        )
+    elif connection.vendor == 'postgresql':
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE relname = %s"
+    else:
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
@@ -107,6 +107,12 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing and checking run in a pool of worker processes (see
+# users.hashing); 0 hashes in the request thread. Requests wait once more
+# than PASSWORD_HASHING_MAX_PENDING hashes are queued.
+PASSWORD_HASHING_WORKERS = 2
+PASSWORD_HASHING_MAX_PENDING = 64
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -136,7 +142,7 @@ AUTH_USER_MODEL = 'users.CustomUser'
 # Django REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -168,11 +174,111 @@ CORS_ALLOW_CREDENTIALS = True
 
 CORS_ALLOW_ALL_ORIGINS = True  # Only for development
 
+# Notifications are queued in an outbox and processed by
+# `python manage.py run_notification_worker`. Set to True to process them in
+# the web process right after each transaction commits (development/tests).
+NOTIFICATION_OUTBOX_EAGER = False
+
+# The notification streams of an ASGI process are woken up in-process, and
+# every NOTIFICATION_STREAM_POLL_INTERVAL seconds for the notifications
+# created by the outbox worker (one query per process while streams are open)
+NOTIFICATION_STREAM_POLL_INTERVAL = 1.0
+
+# Lifetime in seconds of the tickets opening a notification stream
+# (EventSource cannot send the token in a header)
+NOTIFICATION_STREAM_TICKET_MAX_AGE = 60
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory is per process. 'shared' is seen by every process of the
+# host, such as the web server and `manage.py run_notification_worker`;
+# use Redis or Memcached instead when they run on several hosts.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    },
+}
+
+# Cache holding the per-user unread notification counters, and how long a
+# counter is trusted before being recounted from the database. It must be
+# shared with the outbox worker, which invalidates the counters of the
+# users it notifies.
+NOTIFICATION_UNREAD_CACHE = 'shared'
+NOTIFICATION_UNREAD_CACHE_TIMEOUT = 300
+
+# Token -> user lookups cached by users.authentication.CachedTokenAuthentication.
+# None keeps them in a per-process LRU of AUTH_TOKEN_CACHE_SIZE entries;
+# set a shared cache alias when running several worker processes
+AUTH_TOKEN_CACHE = None
+AUTH_TOKEN_CACHE_SIZE = 10000
+AUTH_TOKEN_CACHE_TIMEOUT = 60
+
+# User activities are buffered per process and written in one INSERT when
+# USER_ACTIVITY_BUFFER_SIZE are waiting or every USER_ACTIVITY_FLUSH_INTERVAL
+# seconds (0 writes each activity on commit)
+USER_ACTIVITY_BUFFER_SIZE = 100
+USER_ACTIVITY_FLUSH_INTERVAL = 2
+
+# Retention of old rows (manage.py prune): rows older than `days` are archived
+# under RETENTION_ARCHIVE_DIR then deleted, one day or month of rows at a time.
+# `categories` overrides `days` per notification category / activity type,
+# None keeps the rows forever
+RETENTION_ARCHIVE_DIR = BASE_DIR / 'archives'
+RETENTION_POLICIES = {
+    'user_activities': {
+        'days': 365,
+        'bucket': 'month',
+    },
+    'notifications': {
+        'days': 180,
+        'bucket': 'day',
+        'categories': {
+            'security': 365,
+            'system': 90,
+        },
+    },
+}
+
 # Media files configuration
 import os
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Media files are served by backend.media.MediaFileView after a permission
+# check. MEDIA_SENDFILE_BACKEND hands the transfer to the web server:
+# 'x-accel-redirect' (nginx, with an internal location at
+# MEDIA_SENDFILE_URL_PREFIX aliased to MEDIA_ROOT), 'x-sendfile' (Apache
+# mod_xsendfile) or None to send files from Django
+MEDIA_SENDFILE_BACKEND = None
+MEDIA_SENDFILE_URL_PREFIX = '/protected-media/'
+MEDIA_CACHE_MAX_AGE = 0
+# Lifetime in seconds of the signed media URLs returned by the API
+MEDIA_URL_MAX_AGE = 10 * 60
+
+# Chunked document uploads (cards.uploads): parts are written under
+# DOCUMENT_UPLOAD_TEMP_DIR, which must not be served. Assembled uploads are
+# processed by DOCUMENT_PROCESSING_WORKERS processes started by the web
+# process; with 0 they wait for `python manage.py process_document_uploads`
+DOCUMENT_UPLOAD_TEMP_DIR = os.path.join(BASE_DIR, 'upload_parts')
+DOCUMENT_UPLOAD_CHUNK_SIZE = 1024 * 1024
+DOCUMENT_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+DOCUMENT_IMAGE_MAX_DIMENSION = 3000
+DOCUMENT_PROCESSING_WORKERS = 1
+
+# Renditions of the document images shown to admins (cards.previews):
+# longest side in pixels
+DOCUMENT_PREVIEW_SIZES = {
+    'thumbnail': 200,
+    'preview': 1024,
+}
+
+# Maximum number of card requests approved or rejected in one bulk review
+CARD_BULK_REVIEW_MAX_IDS = 5000
+
 # Additional security settings for development
 CORS_ALLOW_METHODS = [
     'DELETE',
@@ -193,4 +299,10 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'idempotency-key',
+]
+
+# Response headers readable by the frontend
+CORS_EXPOSE_HEADERS = [
+    'idempotent-replayed',
 ]
@@ -0,0 +1,161 @@
+"""
+Streaming JSON responses for unpaginated list endpoints.
+
+Rows are read in pages of ``STREAM_CHUNK_SIZE`` rows by primary key
+(``WHERE id > <last id> ORDER BY id LIMIT n``, or descending), serialized one
+at a time, then written in chunks of about ``STREAM_BUFFER_SIZE`` bytes.
+Unlike ``QuerySet.iterator()``, whose result set the MySQL driver buffers
+client-side as a whole, each page is a separate bounded query, so at most one
+page of model instances is held in memory, whatever the number of rows. The
+rows come out in primary key order: the streamed lists are ordered by their
+creation date, which follows it.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.db.models.fields.files import FieldFile
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+STREAM_BUFFER_SIZE = 64 * 1024
+STREAM_CHUNK_SIZE = 500
+
+
+class SyncStreamingResponse(StreamingHttpResponse):
+    """Streaming response fed by a synchronous iterator, also under ASGI"""
+
+    async def __aiter__(self):
+        # Under ASGI Django would consume the whole iterator with
+        # sync_to_async(list); pull one buffered chunk at a time instead.
+        # thread_sensitive keeps the database cursor on a single thread.
+        iterator = iter(self.streaming_content)
+        next_chunk = sync_to_async(next, thread_sensitive=True)
+        while True:
+            chunk = await next_chunk(iterator, None)
+            if chunk is None:
+                break
+            yield chunk
+
+
+class StreamingJSONResponse(SyncStreamingResponse):
+    """Streaming response fed by a synchronous iterator of JSON text"""
+
+    def __init__(self, streaming_content=(), status=200, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(streaming_content, status=status, **kwargs)
+
+
+def is_descending(queryset):
+    """Whether the first ordering term of ``queryset`` is descending"""
+    ordering = queryset.query.order_by or queryset.model._meta.ordering
+    if not ordering:
+        return False
+    first = ordering[0]
+    if hasattr(first, 'descending'):
+        return first.descending
+    return str(first).startswith('-')
+
+
+def iter_pages(queryset, chunk_size, descending=False, get_pk=lambda row: row.pk):
+    """Yield lists of at most ``chunk_size`` rows of ``queryset`` in primary key order.
+
+    Each page is one query seeking past the last primary key of the previous
+    page, so no cursor stays open and memory is bounded by ``chunk_size``.
+    ``get_pk`` reads the primary key of a row (e.g. of a ``values_list`` tuple).
+    """
+    if descending:
+        queryset = queryset.order_by('-pk')
+    else:
+        queryset = queryset.order_by('pk')
+
+    last_pk = None
+    while True:
+        page = queryset
+        if last_pk is not None:
+            page = queryset.filter(pk__lt=last_pk) if descending else queryset.filter(pk__gt=last_pk)
+        rows = list(page[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last_pk = get_pk(rows[-1])
+
+
+def serialize_rows(queryset, serializer_class, context=None, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield the representation of each row of ``queryset``, one at a time"""
+    # An unbound serializer builds its fields once and is reused for every row
+    serializer = serializer_class(context=context or {})
+    for rows in iter_pages(queryset, chunk_size, descending=is_descending(queryset)):
+        for instance in rows:
+            yield serializer.to_representation(instance)
+        for instance in rows:
+            release_files(instance)
+
+
+def release_files(instance):
+    """Drop the loaded file fields of ``instance`` and of its cached related instances.
+
+    A ``FieldFile`` references its instance, and the cycle would keep each
+    page alive until the next full garbage collection instead of freeing it
+    as soon as the next page is read.
+    """
+    for attname, value in list(instance.__dict__.items()):
+        if isinstance(value, FieldFile):
+            del instance.__dict__[attname]
+    for related in instance._state.fields_cache.values():
+        if related is not None:
+            release_files(related)
+
+
+def iter_json_list(items):
+    """Yield the JSON text of a list, one item at a time"""
+    encoder = JSONEncoder()
+    yield '['
+    first = True
+    for item in items:
+        if not first:
+            yield ','
+        first = False
+        yield encoder.encode(item)
+    yield ']'
+
+
+def iter_json_object(data, streamed_key, items):
+    """Yield the JSON text of ``data`` with ``items`` streamed as its last key"""
+    encoder = JSONEncoder()
+    head = encoder.encode(data)
+    if data:
+        yield head[:-1] + ', '
+    else:
+        yield '{'
+    yield json.dumps(streamed_key) + ': '
+    yield from iter_json_list(items)
+    yield '}'
+
+
+def buffered(parts, size=STREAM_BUFFER_SIZE):
+    """Group small text parts into chunks of about ``size`` bytes"""
+    buffer = []
+    length = 0
+    for part in parts:
+        buffer.append(part)
+        length += len(part)
+        if length >= size:
+            yield ''.join(buffer).encode()
+            buffer = []
+            length = 0
+    if buffer:
+        yield ''.join(buffer).encode()
+
+
+def stream_list(queryset, serializer_class, context=None, **kwargs):
+    """Streaming response with the serialized rows of ``queryset`` as a JSON list"""
+    rows = serialize_rows(queryset, serializer_class, context)
+    return StreamingJSONResponse(buffered(iter_json_list(rows)), **kwargs)
+
+
+def stream_object(data, streamed_key, queryset, serializer_class, context=None, **kwargs):
+    """Streaming response with ``data`` plus the rows of ``queryset`` under ``streamed_key``"""
+    rows = serialize_rows(queryset, serializer_class, context)
+    return StreamingJSONResponse(buffered(iter_json_object(data, streamed_key, rows)), **kwargs)
@@ -0,0 +1,67 @@
+"""
+Change tracking of model fields, shared by the apps.
+"""
+from django.db import models
+
+
+class TrackedFieldsModel(models.Model):
+    """Model remembering the database values of its TRACKED_FIELDS (attnames).
+    
+    Values are captured when an instance is loaded and refreshed after each
+    save, so changes can be detected without querying the old row.
+    """
+    
+    TRACKED_FIELDS = ()
+    
+    class Meta:
+        abstract = True
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_loaded_values()
+        return instance
+    
+    def remember_loaded_values(self, attnames=None):
+        """Snapshot the tracked fields (deferred fields are skipped)"""
+        if attnames is None:
+            attnames = self.TRACKED_FIELDS
+        # A new dict: shallow copies of the instance keep their own snapshot
+        self._loaded_values = {
+            **getattr(self, '_loaded_values', {}),
+            **{
+                attname: self.__dict__[attname]
+                for attname in attnames
+                if attname in self.__dict__
+            }
+        }
+    
+    def get_loaded_values(self):
+        """Return the tracked values as stored in the database"""
+        loaded_values = dict(getattr(self, '_loaded_values', {}))
+        missing = [f for f in self.TRACKED_FIELDS if f not in loaded_values]
+        if missing and self.pk is not None:
+            # Deferred fields or instance not loaded from the database
+            loaded_values.update(
+                type(self)._base_manager.filter(pk=self.pk).values(*missing).first() or {}
+            )
+            self._loaded_values = loaded_values
+        return dict(loaded_values)
+    
+    def has_changed(self, attname):
+        """True if the field differs from its value in the database"""
+        if self._state.adding:
+            return False
+        loaded_values = self.get_loaded_values()
+        return attname in loaded_values and loaded_values[attname] != getattr(self, attname)
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.remember_loaded_values()
+        else:
+            # Fields left out of update_fields keep their stored value
+            saved = {self._meta.get_field(name).attname for name in update_fields}
+            self.remember_loaded_values([f for f in self.TRACKED_FIELDS if f in saved])
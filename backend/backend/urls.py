@@ -17,15 +17,13 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
+from .media import MediaFileView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/users/', include('users.urls')),
     path('api/cards/', include('cards.urls')),
     path('api/notifications/', include('notifications.urls')),
+    # Media files, served to their owner and to admins (see backend.media)
+    path(f"{settings.MEDIA_URL.lstrip('/')}<path:path>", MediaFileView.as_view(), name='media-file'),
 ]
-
-# Serve media files during development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,67 @@
+"""
+Bulk CSV import of card requests.
+
+Each row names the requesting user by ``user_email`` and is validated with
+the same rules as ``CardRequestCreateSerializer``, on behalf of that user.
+Valid rows of a chunk are inserted with ``bulk_create``, and the admins
+receive one notification per chunk instead of one per request, queued in the
+notification outbox in the same transaction.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from notifications import outbox
+from users.bulk_import import ImportResult, iter_csv_chunks, bulk_insert
+from .models import CardRequest
+from .serializers import CardRequestCreateSerializer
+
+
+def import_card_requests(fileobj, chunk_size=500, dry_run=False):
+    """Import card requests from a CSV file object, return an ``ImportResult``"""
+    result = ImportResult()
+
+    for chunk in iter_csv_chunks(fileobj, chunk_size):
+        valid = _validate_requests(chunk, result)
+        if not valid or dry_run:
+            result.created += len(valid)
+            continue
+
+        lines = [line for line, data in valid]
+        card_requests = [CardRequest(**data) for line, data in valid]
+
+        with transaction.atomic():
+            card_requests = bulk_insert(CardRequest, card_requests, lines, result)
+            if card_requests:
+                # bulk_create sends no signal (and sets no pk on MySQL)
+                outbox.enqueue('card_request_batch_imported', 0, count=len(card_requests))
+        result.created += len(card_requests)
+
+    return result
+
+
+def _validate_requests(chunk, result):
+    """Validate a chunk of rows, return ``(line, model data)`` of the valid ones"""
+    User = get_user_model()
+    emails = {
+        User.objects.normalize_email(row['user_email'])
+        for line, row in chunk if 'user_email' in row
+    }
+    users = {user.email: user for user in User.objects.filter(email__in=emails)}
+
+    valid = []
+    for line, row in chunk:
+        user = users.get(User.objects.normalize_email(row.get('user_email', '')))
+        serializer = CardRequestCreateSerializer(data=row, context={'user': user})
+        serializer.is_valid()
+
+        errors = dict(serializer.errors)
+        if 'date_of_birth' not in row:
+            errors['date_of_birth'] = ['Date of birth is required.']
+        if user is None:
+            errors['user_email'] = ['No user with this email.']
+        if errors:
+            result.add_error(line, errors)
+            continue
+
+        valid.append((line, serializer.get_model_data(serializer.validated_data)))
+    return valid
@@ -0,0 +1,322 @@
+"""
+Bulk export of cards, card requests, notifications and user activities.
+
+Rows are read as tuples (``values_list``) in primary-key order, one chunk of
+``chunk_size`` rows at a time with ``WHERE id > <last id>``. Each chunk is a
+range scan of the primary key: memory stays constant and the database never
+holds a cursor open for the whole export (MySQL drivers buffer the result of
+``iterator()`` client-side, so this is also how we get constant memory there).
+
+Supported formats are gzip-compressed CSV and JSON Lines, plus Parquet when
+pyarrow is installed. Card numbers and CVVs are always masked.
+"""
+import csv
+import datetime
+import gzip
+import io
+import json
+from collections import namedtuple
+
+from django.apps import apps
+
+from backend.streaming import iter_pages
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from .models import CarteVirtuelle
+
+DEFAULT_CHUNK_SIZE = 10000
+# Fastest gzip level: exports are bound by CPU, the size cost is small
+DEFAULT_COMPRESS_LEVEL = 1
+
+# name: column name in the export, lookup: values_list() lookup,
+# transform: optional function applied to the value (masking)
+ExportColumn = namedtuple('ExportColumn', ['name', 'lookup', 'transform'])
+
+
+def column(lookup, name=None, transform=None):
+    return ExportColumn(name or lookup, lookup, transform)
+
+
+class ExportDataset:
+    """A model and the columns exported for it, the primary key first"""
+
+    def __init__(self, model_label, columns):
+        self.model_label = model_label
+        self.columns = columns
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    @property
+    def column_names(self):
+        return [col.name for col in self.columns]
+
+    def get_field(self, col):
+        return self.model._meta.get_field(col.lookup)
+
+    def iter_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE, queryset=None):
+        """Yield lists of row tuples, ``chunk_size`` rows at a time
+
+        ``queryset`` restricts the export to some rows of the model.
+        """
+        if queryset is None:
+            queryset = self.model._base_manager.all()
+        queryset = queryset.order_by('pk').values_list(
+            *[col.lookup for col in self.columns]
+        )
+        transforms = [
+            (index, col.transform)
+            for index, col in enumerate(self.columns)
+            if col.transform
+        ]
+
+        # The first column is the primary key
+        for rows in iter_pages(queryset, chunk_size, get_pk=lambda row: row[0]):
+            if transforms:
+                rows = [list(row) for row in rows]
+                for row in rows:
+                    for index, transform in transforms:
+                        row[index] = transform(row[index])
+            yield rows
+
+
+DATASETS = {
+    'cards': ExportDataset('cards.CarteVirtuelle', [
+        column('id'),
+        column('numeroCart', transform=CarteVirtuelle.mask_card_number),
+        column('cvv2', transform=CarteVirtuelle.mask_cvv),
+        column('dateExpiration'),
+        column('dateCreation'),
+        column('utilisateur_id'),
+        column('card_type'),
+        column('card_category'),
+        column('card_name'),
+        column('status'),
+        column('balance'),
+        column('credit_limit'),
+    ]),
+    'card_requests': ExportDataset('cards.CardRequest', [
+        column('id'),
+        column('user_id'),
+        column('card_type'),
+        column('card_name'),
+        column('requested_limit'),
+        column('status'),
+        column('created_at'),
+        column('reviewed_at'),
+        column('reviewed_by_id'),
+        column('approved_card_id'),
+        column('admin_comments'),
+    ]),
+    'notifications': ExportDataset('notifications.Notification', [
+        column('id'),
+        column('user_id'),
+        column('title'),
+        column('message'),
+        column('notification_type'),
+        column('category'),
+        column('is_read'),
+        column('is_important'),
+        column('related_card_id'),
+        column('related_request_id'),
+        column('created_at'),
+        column('read_at'),
+    ]),
+    'user_activities': ExportDataset('users.UserActivity', [
+        column('id'),
+        column('user_id'),
+        column('activity_type'),
+        column('description'),
+        column('ip_address'),
+        column('user_agent'),
+        column('timestamp'),
+    ]),
+}
+
+
+class CSVExportWriter:
+    """Gzip-compressed CSV with a header row"""
+
+    extension = 'csv.gz'
+    content_type = 'application/gzip'
+
+    def __init__(self, fileobj, dataset, compress_level=DEFAULT_COMPRESS_LEVEL):
+        self._gzip = gzip.GzipFile(fileobj=fileobj, mode='wb', compresslevel=compress_level)
+        self._text = io.TextIOWrapper(self._gzip, encoding='utf-8', newline='')
+        self._csv = csv.writer(self._text)
+        self._csv.writerow(dataset.column_names)
+
+    def write_rows(self, rows):
+        self._csv.writerows(rows)
+        self._text.flush()
+
+    def close(self):
+        # Writes the gzip trailer, the underlying file is left open
+        self._text.close()
+
+
+def _json_default(value):
+    # Dates in ISO 8601, decimals (and anything else) as strings
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return str(value)
+
+
+class JSONLinesExportWriter:
+    """Gzip-compressed JSON Lines, one object per row"""
+
+    extension = 'jsonl.gz'
+    content_type = 'application/gzip'
+
+    def __init__(self, fileobj, dataset, compress_level=DEFAULT_COMPRESS_LEVEL):
+        self._gzip = gzip.GzipFile(fileobj=fileobj, mode='wb', compresslevel=compress_level)
+        self._names = dataset.column_names
+        self._encoder = json.JSONEncoder(
+            default=_json_default, ensure_ascii=False, separators=(',', ':')
+        )
+
+    def write_rows(self, rows):
+        encode = self._encoder.encode
+        names = self._names
+        lines = [encode(dict(zip(names, row))) for row in rows]
+        lines.append('')
+        self._gzip.write('\n'.join(lines).encode('utf-8'))
+
+    def close(self):
+        self._gzip.close()
+
+
+class ParquetExportWriter:
+    """Columnar Parquet file, one row group per chunk (requires pyarrow)"""
+
+    extension = 'parquet'
+    content_type = 'application/vnd.apache.parquet'
+
+    def __init__(self, fileobj, dataset, compress_level=DEFAULT_COMPRESS_LEVEL):
+        self._schema = pa.schema([
+            (col.name, self.arrow_type(dataset, col)) for col in dataset.columns
+        ])
+        self._writer = pq.ParquetWriter(
+            fileobj,
+            self._schema,
+            compression='gzip',
+            compression_level=compress_level
+        )
+
+    @staticmethod
+    def arrow_type(dataset, col):
+        """Arrow type of an exported column, from its model field"""
+        if col.transform:
+            return pa.string()
+        field = dataset.get_field(col)
+        if field.is_relation:
+            field = field.target_field
+
+        internal_type = field.get_internal_type()
+        if internal_type in ('AutoField', 'BigAutoField', 'IntegerField', 'BigIntegerField',
+                             'SmallIntegerField', 'PositiveIntegerField'):
+            return pa.int64()
+        if internal_type == 'BooleanField':
+            return pa.bool_()
+        if internal_type == 'DateTimeField':
+            return pa.timestamp('us', tz='UTC')
+        if internal_type == 'DateField':
+            return pa.date32()
+        if internal_type == 'DecimalField':
+            return pa.decimal128(field.max_digits, field.decimal_places)
+        return pa.string()
+
+    def write_rows(self, rows):
+        columns = list(zip(*rows))
+        arrays = [
+            pa.array(values, type=self._schema.field(index).type)
+            for index, values in enumerate(columns)
+        ]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+FORMATS = {
+    'csv': CSVExportWriter,
+    'jsonl': JSONLinesExportWriter,
+}
+if pa is not None:
+    FORMATS['parquet'] = ParquetExportWriter
+
+
+def get_writer_class(export_format):
+    try:
+        return FORMATS[export_format]
+    except KeyError:
+        if export_format == 'parquet':
+            raise ValueError("The parquet format requires pyarrow to be installed")
+        raise ValueError(f"Unknown export format: {export_format}")
+
+
+def get_dataset(name):
+    try:
+        return DATASETS[name]
+    except KeyError:
+        raise ValueError(f"Unknown dataset: {name}")
+
+
+def export_to_file(name, export_format, fileobj, chunk_size=DEFAULT_CHUNK_SIZE,
+                   compress_level=DEFAULT_COMPRESS_LEVEL):
+    """Write a whole dataset to an open binary file, return the number of rows"""
+    dataset = get_dataset(name)
+    writer = get_writer_class(export_format)(fileobj, dataset, compress_level)
+    count = 0
+    for rows in dataset.iter_chunks(chunk_size):
+        writer.write_rows(rows)
+        count += len(rows)
+    writer.close()
+    return count
+
+
+class ExportBuffer(io.RawIOBase):
+    """Write-only file collecting the bytes written until they are drained"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def iter_export(name, export_format, chunk_size=DEFAULT_CHUNK_SIZE,
+                compress_level=DEFAULT_COMPRESS_LEVEL):
+    """Yield the bytes of a dataset export, one chunk of rows at a time"""
+    dataset = get_dataset(name)
+    buffer = ExportBuffer()
+    writer = get_writer_class(export_format)(buffer, dataset, compress_level)
+    for rows in dataset.iter_chunks(chunk_size):
+        writer.write_rows(rows)
+        data = buffer.drain()
+        if data:
+            yield data
+    writer.close()
+    yield buffer.drain()
@@ -0,0 +1,117 @@
+"""
+Luhn (mod 10) check digit computation and validation for card numbers.
+
+Single numbers are handled with a table-driven single pass. The batch
+functions use NumPy when it is installed and fall back to the pure-Python
+implementation otherwise.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Value of a digit once doubled and its two digits summed (e.g. 7 -> 14 -> 5)
+DOUBLED_DIGITS = (0, 2, 4, 6, 8, 1, 3, 5, 7, 9)
+
+_ZERO = ord('0')
+
+
+def _luhn_sum(number, double_rightmost):
+    """Sum the digits of ``number`` from the right, doubling every other one"""
+    total = 0
+    double = double_rightmost
+    for char in reversed(number):
+        digit = ord(char) - _ZERO
+        if not 0 <= digit <= 9:
+            raise ValueError(f"Card number must only contain digits: {number!r}")
+        total += DOUBLED_DIGITS[digit] if double else digit
+        double = not double
+    return total
+
+
+def calculate_check_digit(partial_number):
+    """Return the check digit that makes ``partial_number`` Luhn-valid"""
+    return (10 - _luhn_sum(partial_number, True) % 10) % 10
+
+
+def is_valid(number):
+    """Return True if ``number`` is a digit string with a valid Luhn checksum"""
+    if not number:
+        return False
+    try:
+        return _luhn_sum(number, False) % 10 == 0
+    except ValueError:
+        return False
+
+
+def complete(partial_number):
+    """Append the Luhn check digit to ``partial_number``"""
+    return partial_number + str(calculate_check_digit(partial_number))
+
+
+def _group_by_length(numbers):
+    """Map each string length to the indexes of the numbers having it"""
+    groups = {}
+    for index, number in enumerate(numbers):
+        groups.setdefault(len(number), []).append(index)
+    return groups
+
+
+def _numpy_sums(numbers, length, double_rightmost):
+    """Luhn sums of equal-length strings and a mask of the all-digit rows"""
+    buffer = ''.join(numbers).encode('ascii', 'replace')
+    digits = np.frombuffer(buffer, dtype=np.uint8).reshape(len(numbers), length) - _ZERO
+
+    # Characters below '0' wrap around, so a single bound check is enough
+    valid_rows = (digits <= 9).all(axis=1)
+    digits = np.where(digits <= 9, digits, 0)
+
+    # Position 0 is the rightmost digit
+    last_doubled = length - 1 if double_rightmost else length - 2
+    doubled_columns = np.zeros(length, dtype=bool)
+    if last_doubled >= 0:
+        doubled_columns[last_doubled::-2] = True
+
+    table = np.array(DOUBLED_DIGITS, dtype=np.uint8)
+    values = np.where(doubled_columns, table[digits], digits)
+    return values.sum(axis=1, dtype=np.int64), valid_rows
+
+
+def validate_batch(numbers):
+    """Return a list of booleans telling which numbers are Luhn-valid"""
+    numbers = list(numbers)
+    if np is None:
+        return [is_valid(number) for number in numbers]
+
+    results = [False] * len(numbers)
+    for length, indexes in _group_by_length(numbers).items():
+        if length == 0:
+            continue
+        sums, valid_rows = _numpy_sums([numbers[i] for i in indexes], length, False)
+        checks = (sums % 10 == 0) & valid_rows
+        for index, check in zip(indexes, checks.tolist()):
+            results[index] = check
+    return results
+
+
+def complete_batch(partial_numbers):
+    """Append the Luhn check digit to every partial number"""
+    partial_numbers = list(partial_numbers)
+    if np is None:
+        return [complete(number) for number in partial_numbers]
+
+    results = [None] * len(partial_numbers)
+    for length, indexes in _group_by_length(partial_numbers).items():
+        group = [partial_numbers[i] for i in indexes]
+        if length == 0:
+            sums, valid_rows = np.zeros(len(group), dtype=np.int64), np.ones(len(group), dtype=bool)
+        else:
+            sums, valid_rows = _numpy_sums(group, length, True)
+        if not valid_rows.all():
+            bad = group[int(np.argmin(valid_rows))]
+            raise ValueError(f"Card number must only contain digits: {bad!r}")
+        check_digits = ((10 - sums % 10) % 10).tolist()
+        for index, number, check_digit in zip(indexes, group, check_digits):
+            results[index] = number + str(check_digit)
+    return results
@@ -0,0 +1,73 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from cards import luhn
+
+
+def legacy_check_digit(partial_number):
+    """Original implementation: one full checksum pass per candidate digit"""
+    def luhn_checksum(card_num):
+        def digits_of(n):
+            return [int(d) for d in str(n)]
+        digits = digits_of(card_num)
+        odd_digits = digits[-1::-2]
+        even_digits = digits[-2::-2]
+        checksum = sum(odd_digits)
+        for d in even_digits:
+            checksum += sum(digits_of(d*2))
+        return checksum % 10
+
+    for i in range(10):
+        if luhn_checksum(partial_number + str(i)) == 0:
+            return i
+    return 0
+
+
+class Command(BaseCommand):
+    help = 'Benchmark Luhn check digit computation and validation'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=100000,
+            help='Number of card numbers to process',
+        )
+
+    def handle(self, *args, **options):
+        count = options['count']
+        partials = ['4' + '%014d' % random.randrange(10 ** 14) for _ in range(count)]
+
+        self.stdout.write("⏱️  Luhn Benchmark")
+        self.stdout.write("=" * 50)
+        self.stdout.write(f"Numbers: {count:,} | NumPy: {'yes' if luhn.np is not None else 'no'}")
+
+        legacy = self.measure(lambda: [p + str(legacy_check_digit(p)) for p in partials])
+        single = self.measure(lambda: [luhn.complete(p) for p in partials])
+        batch = self.measure(lambda: luhn.complete_batch(partials))
+
+        self.report("Legacy check digit", legacy[0], count)
+        self.report("Single-pass check digit", single[0], count)
+        self.report("Batch check digit", batch[0], count)
+
+        if not legacy[1] == single[1] == batch[1]:
+            self.stderr.write(self.style.ERROR("❌ Implementations disagree!"))
+            return
+
+        numbers = batch[1]
+        single_validation = self.measure(lambda: [luhn.is_valid(n) for n in numbers])
+        batch_validation = self.measure(lambda: luhn.validate_batch(numbers))
+
+        self.report("Single validation", single_validation[0], count)
+        self.report("Batch validation", batch_validation[0], count)
+
+        self.stdout.write(f"\n✅ Speedup (batch vs legacy): {legacy[0] / batch[0]:.1f}x")
+
+    def measure(self, func):
+        start = time.perf_counter()
+        result = func()
+        return time.perf_counter() - start, result
+
+    def report(self, label, elapsed, count):
+        self.stdout.write(f"{label:<28} {elapsed * 1000:>9.1f} ms  {count / elapsed:>14,.0f} /s")
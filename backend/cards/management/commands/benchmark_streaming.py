@@ -0,0 +1,143 @@
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from cards.models import CarteVirtuelle, CardRequest
+from cards.serializers import CardRequestSerializer
+from cards import views as card_views
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the peak memory of the streaming list endpoints against a '
+        'fully materialized response (all data is rolled back)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=100000,
+            help='Number of rows returned by each endpoint',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of rows inserted per batch while seeding',
+        )
+
+    def handle(self, *args, **options):
+        self.factory = APIRequestFactory()
+        self.rows = options['rows']
+        self.batch_size = options['batch_size']
+        self.failures = []
+
+        try:
+            with transaction.atomic():
+                self.run()
+                raise Rollback
+        except Rollback:
+            pass
+
+        if self.failures:
+            raise CommandError(f"Memory grows with the number of rows: {', '.join(self.failures)}")
+        self.stdout.write(self.style.SUCCESS("✅ Streaming memory does not depend on the number of rows"))
+
+    def run(self):
+        User = get_user_model()
+        owner = User.objects.create(
+            username='streaming-benchmark', email='streaming-benchmark@example.com',
+            first_name='Streaming', last_name='Benchmark'
+        )
+        small = max(self.rows // 10, 1)
+        endpoints = [
+            ('my-requests', card_views.UserCardRequestsView.as_view(), self.seed_requests),
+            ('card stats', card_views.card_stats, self.seed_cards),
+        ]
+
+        for label, view, seed in endpoints:
+            self.stdout.write(f"📦 {label}: seeding {self.rows:,} rows...")
+            seed(owner, small)
+            small_peak, _, _ = self.measure_stream(view, owner)
+            seed(owner, self.rows - small)
+            peak, size, elapsed = self.measure_stream(view, owner)
+
+            self.stdout.write(
+                f"   streaming {small:,} rows: {small_peak / 1024 / 1024:.1f} MiB peak"
+            )
+            self.stdout.write(
+                f"   streaming {self.rows:,} rows: {peak / 1024 / 1024:.1f} MiB peak, "
+                f"{size / 1024 / 1024:.1f} MiB sent in {elapsed:.2f}s"
+            )
+
+            # Allow for noise, but not for growth with the number of rows
+            if peak > small_peak * 2 + 1024 * 1024:
+                self.failures.append(label)
+                self.stdout.write(self.style.ERROR(f"❌ {label}: peak memory grows with the number of rows"))
+            else:
+                self.stdout.write(f"✅ {label}: constant memory")
+
+        materialized_peak = self.measure_materialized(owner)
+        self.stdout.write(
+            f"📊 materialized my-requests ({self.rows:,} rows): "
+            f"{materialized_peak / 1024 / 1024:.1f} MiB peak"
+        )
+
+    def measure_stream(self, view, user):
+        request = self.factory.get('/')
+        force_authenticate(request, user=user)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        response = view(request)
+        if response.status_code != 200 or not response.streaming:
+            tracemalloc.stop()
+            raise CommandError(f"Expected a streaming 200 response from {view}")
+        size = sum(len(chunk) for chunk in response)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak, size, elapsed
+
+    def measure_materialized(self, user):
+        queryset = CardRequestSerializer.setup_eager_loading(CardRequest.objects.filter(user=user))
+
+        tracemalloc.start()
+        data = CardRequestSerializer(queryset, many=True).data
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del data
+        return peak
+
+    def seed_requests(self, owner, count):
+        for start in range(0, count, self.batch_size):
+            CardRequest.objects.bulk_create([
+                CardRequest(user=owner, card_type='personal', card_name='Benchmark', reason='Streaming benchmark')
+                for _ in range(min(self.batch_size, count - start))
+            ])
+
+    def seed_cards(self, owner, count):
+        for start in range(0, count, self.batch_size):
+            numbers = CarteVirtuelle.generate_unique_card_numbers(
+                ['personal'] * min(self.batch_size, count - start)
+            )
+            CarteVirtuelle.objects.bulk_create([
+                CarteVirtuelle(
+                    numeroCart=number,
+                    cvv2='123',
+                    dateExpiration='2030-01-01',
+                    utilisateur=owner,
+                    card_name='Benchmark',
+                    status='active'
+                )
+                for number in numbers
+            ])
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from cards import luhn
+from cards.models import CarteVirtuelle
+
+
+class Command(BaseCommand):
+    help = 'Scan stored card numbers and report the ones failing the Luhn check'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=10000,
+            help='Number of cards validated per batch',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        rows = CarteVirtuelle.objects.order_by().values_list('id', 'numeroCart').iterator(
+            chunk_size=chunk_size
+        )
+
+        scanned = 0
+        invalid = []
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                invalid.extend(self.check_chunk(chunk))
+                scanned += len(chunk)
+                chunk = []
+        if chunk:
+            invalid.extend(self.check_chunk(chunk))
+            scanned += len(chunk)
+
+        for card_id, numero in invalid:
+            self.stdout.write(f"❌ Card {card_id}: invalid number ending in {numero[-4:]}")
+
+        if invalid:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️  {len(invalid)} invalid card number(s) out of {scanned:,}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"✅ All {scanned:,} card numbers are valid"))
+
+    def check_chunk(self, chunk):
+        checks = luhn.validate_batch(numero for _, numero in chunk)
+        return [row for row, valid in zip(chunk, checks) if not valid]
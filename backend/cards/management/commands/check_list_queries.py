@@ -0,0 +1,157 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from cards.models import CarteVirtuelle, CardRequest
+from cards import views as card_views
+from notifications.models import Notification
+from notifications import views as notification_views
+from users.models import UserActivity
+from users import views as user_views
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Check that every list and stats endpoint runs its expected, constant number '
+        'of queries whatever the number of rows (all data is rolled back)'
+    )
+
+    # Number of rows seeded before each measurement (within one page)
+    ROW_COUNTS = (2, 8, 16)
+
+    def handle(self, *args, **options):
+        self.factory = APIRequestFactory()
+        self.failures = []
+
+        try:
+            # Pagination links are absolute: accept the factory's host
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                with transaction.atomic():
+                    self.check_views()
+                    raise Rollback
+        except Rollback:
+            pass
+
+        if self.failures:
+            raise CommandError(
+                f"{len(self.failures)} view(s) do not run their expected number of queries: {', '.join(self.failures)}"
+            )
+        self.stdout.write(self.style.SUCCESS("✅ All list and stats views run their expected number of queries"))
+
+    def check_views(self):
+        User = get_user_model()
+        admin = User.objects.create(
+            username='query-check-admin', email='query-check-admin@example.com',
+            first_name='Query', last_name='Admin', user_type='admin'
+        )
+        owner = User.objects.create(
+            username='query-check-user', email='query-check-user@example.com',
+            first_name='Query', last_name='User'
+        )
+        # (label, view, requesting user, seed function, expected queries)
+        cases = [
+            ('cards: my-cards', card_views.UserCardsListView.as_view(), owner, self.seed_cards, 2),
+            ('cards: my-requests', card_views.UserCardRequestsView.as_view(), owner, self.seed_requests, 1),
+            ('cards: admin/requests', card_views.AdminCardRequestsView.as_view(), admin, self.seed_requests, 1),
+            ('cards: admin/cards', card_views.AdminAllCardsView.as_view(), admin, self.seed_cards, 1),
+            ('cards: stats', card_views.card_stats, owner, self.seed_cards, 2),
+            ('cards: admin/stats', card_views.admin_stats, admin, self.seed_requests, 2),
+            ('users: admin/users', user_views.AdminUserListView.as_view(), admin, self.seed_users, 1),
+            ('users: activities', user_views.UserActivityListView.as_view(), admin, self.seed_activities, 1),
+            ('users: dashboard', user_views.dashboard_stats, owner, self.seed_activities, 2),
+            ('users: admin dashboard', user_views.dashboard_stats, admin, self.seed_activities, 3),
+            ('notifications: list', notification_views.UserNotificationsView.as_view(), owner, self.seed_notifications, 2),
+            ('notifications: recent', notification_views.recent_notifications, owner, self.seed_notifications, 1),
+        ]
+
+        for label, view, user, seed, expected in cases:
+            # Warm-up request so that caches (e.g. unread counts) are filled
+            self.count_queries(view, user)
+            counts = []
+            seeded = 0
+            for rows in self.ROW_COUNTS:
+                seed(owner, rows - seeded)
+                seeded = rows
+                counts.append(self.count_queries(view, user))
+
+            counts_text = ' / '.join(str(count) for count in counts)
+            if set(counts) == {expected}:
+                self.stdout.write(f"✅ {label:<24} {expected} queries")
+            elif len(set(counts)) == 1:
+                self.failures.append(label)
+                self.stdout.write(self.style.ERROR(
+                    f"❌ {label:<24} {counts[0]} queries, expected {expected}"
+                ))
+            else:
+                self.failures.append(label)
+                self.stdout.write(self.style.ERROR(
+                    f"❌ {label:<24} {counts_text} queries for {' / '.join(map(str, self.ROW_COUNTS))} rows"
+                ))
+
+    def count_queries(self, view, user):
+        request = self.factory.get('/')
+        force_authenticate(request, user=user)
+        with CaptureQueriesContext(connection) as context:
+            response = view(request)
+            if response.streaming:
+                # Streamed lists run their queries while being consumed
+                b''.join(response.streaming_content)
+            else:
+                response.render()
+        if response.status_code != 200:
+            raise CommandError(f"Unexpected status {response.status_code} from {view}")
+        return len(context)
+
+    def seed_cards(self, owner, count):
+        CarteVirtuelle.objects.bulk_create([
+            CarteVirtuelle(
+                numeroCart=number,
+                cvv2='123',
+                dateExpiration='2030-01-01',
+                utilisateur=owner,
+                card_name='Query check',
+                status='active'
+            )
+            for number in CarteVirtuelle.generate_unique_card_numbers(['personal'] * count)
+        ])
+
+    def seed_requests(self, owner, count):
+        CardRequest.objects.bulk_create([
+            CardRequest(user=owner, card_type='personal', card_name='Query check', reason='Query count check')
+            for _ in range(count)
+        ])
+
+    def seed_users(self, owner, count):
+        User = get_user_model()
+        start = User.objects.filter(username__startswith='query-check-extra-').count()
+        User.objects.bulk_create([
+            User(
+                username=f'query-check-extra-{index}',
+                email=f'query-check-extra-{index}@example.com',
+                first_name='Query',
+                last_name=str(index)
+            )
+            for index in range(start, start + count)
+        ])
+
+    def seed_activities(self, owner, count):
+        UserActivity.objects.bulk_create([
+            UserActivity(user=owner, activity_type='login', description='Query check')
+            for _ in range(count)
+        ])
+
+    def seed_notifications(self, owner, count):
+        Notification.objects.bulk_create([
+            Notification(
+                user=owner, title='Query check', message='Query check',
+                notification_type='info', category='system'
+            )
+            for _ in range(count)
+        ])
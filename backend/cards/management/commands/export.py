@@ -0,0 +1,77 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from cards import export
+
+
+class Command(BaseCommand):
+    help = 'Export cards, card requests, notifications or user activities to compressed files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'datasets',
+            nargs='+',
+            choices=sorted(export.DATASETS) + ['all'],
+            help='Datasets to export',
+        )
+        parser.add_argument(
+            '--format',
+            dest='export_format',
+            default='csv',
+            choices=['csv', 'jsonl', 'parquet'],
+            help='Output format (parquet requires pyarrow)',
+        )
+        parser.add_argument(
+            '--output-dir',
+            default='.',
+            help='Directory where the files are written',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=export.DEFAULT_CHUNK_SIZE,
+            help='Number of rows read and written per batch',
+        )
+        parser.add_argument(
+            '--compress-level',
+            type=int,
+            default=export.DEFAULT_COMPRESS_LEVEL,
+            help='Compression level, from 1 (fastest) to 9 (smallest)',
+        )
+
+    def handle(self, *args, **options):
+        datasets = options['datasets']
+        if 'all' in datasets:
+            datasets = list(export.DATASETS)
+
+        try:
+            writer_class = export.get_writer_class(options['export_format'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        os.makedirs(options['output_dir'], exist_ok=True)
+        stamp = timezone.now().strftime('%Y%m%d-%H%M%S')
+
+        for name in dict.fromkeys(datasets):
+            path = os.path.join(options['output_dir'], f"{name}-{stamp}.{writer_class.extension}")
+            self.stdout.write(f"📤 Exporting {name} to {path}...")
+
+            start = time.perf_counter()
+            with open(path, 'wb') as fileobj:
+                count = export.export_to_file(
+                    name,
+                    options['export_format'],
+                    fileobj,
+                    chunk_size=options['chunk_size'],
+                    compress_level=options['compress_level']
+                )
+            elapsed = time.perf_counter() - start
+
+            rate = count / elapsed if elapsed else 0
+            size = os.path.getsize(path)
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {count:,} row(s) in {elapsed:.2f}s ({rate:,.0f} rows/s, {size / 1024 / 1024:.1f} MiB)"
+            ))
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from cards import previews, uploads
+from cards.models import CardRequest
+
+
+class Command(BaseCommand):
+    help = 'Generate the missing document previews of the card requests with a pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=2,
+            help='Number of worker processes',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of requests submitted to the workers at a time',
+        )
+
+    def handle(self, *args, **options):
+        with_documents = CardRequest.objects.exclude(
+            Q(identity_document__isnull=True) | Q(identity_document=''),
+            Q(income_proof__isnull=True) | Q(income_proof=''),
+        ).only('id', 'document_previews', *previews.DOCUMENT_FIELDS).order_by('pk')
+
+        self.stdout.write("🖼️ Generating document previews...")
+        start = time.perf_counter()
+        pool = uploads.DocumentProcessingPool(options['workers'])
+        generated = 0
+        try:
+            batch = []
+            for card_request in with_documents.iterator(chunk_size=options['batch_size']):
+                if previews.needs_previews(card_request):
+                    batch.append(pool.run(previews.generate_previews, card_request.pk))
+                if len(batch) >= options['batch_size']:
+                    generated += sum(1 for future in batch if future.result() is not None)
+                    batch = []
+            generated += sum(1 for future in batch if future.result() is not None)
+        finally:
+            pool.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Previews generated for {generated} request(s) in {time.perf_counter() - start:.2f}s"
+        ))
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cards.bulk_import import import_card_requests
+from users.bulk_import import format_errors
+
+
+class Command(BaseCommand):
+    help = (
+        'Import card requests from a CSV file with the columns user_email, card_type, '
+        'card_name, date_of_birth, reason and optionally requested_limit, phone_number, '
+        'emergency_contact, profession, monthly_income'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of rows validated and inserted per batch (one admin notification each)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only validate the rows',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"📥 Importing card requests from {options['path']}...")
+
+        start = time.perf_counter()
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as fileobj:
+                result = import_card_requests(
+                    fileobj,
+                    chunk_size=options['chunk_size'],
+                    dry_run=options['dry_run']
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - start
+
+        for line, errors in sorted(result.errors, key=lambda error: error[0]):
+            self.stdout.write(self.style.ERROR(f"❌ line {line}: {format_errors(errors)}"))
+
+        action = 'validated' if options['dry_run'] else 'imported'
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {result.created} card request(s) {action}, {result.failed} row(s) rejected in {elapsed:.2f}s"
+        ))
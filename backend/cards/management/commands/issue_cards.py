@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from cards.models import CarteVirtuelle, CardRequest
+
+
+class Command(BaseCommand):
+    help = 'Issue cards in bulk for approved card requests that have no card yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--admin',
+            help='Email of the admin issuing the cards',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of cards generated and inserted per batch',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Maximum number of requests to process',
+        )
+
+    def handle(self, *args, **options):
+        approved_by = None
+        if options['admin']:
+            User = get_user_model()
+            try:
+                approved_by = User.objects.get(email=options['admin'])
+            except User.DoesNotExist:
+                raise CommandError(f"No user with email {options['admin']}")
+            if not approved_by.is_admin:
+                raise CommandError(f"{approved_by.email} is not an admin")
+
+        card_requests = CardRequest.objects.filter(
+            status='approved',
+            approved_card__isnull=True
+        ).order_by('created_at')
+
+        if options['limit']:
+            card_requests = card_requests[:options['limit']]
+
+        card_requests = list(card_requests)
+        if not card_requests:
+            self.stdout.write("ℹ️  No approved requests waiting for a card")
+            return
+
+        self.stdout.write(f"🏭 Issuing {len(card_requests)} card(s)...")
+
+        start = time.perf_counter()
+        cards = CarteVirtuelle.bulk_create_from_requests(
+            card_requests,
+            approved_by,
+            batch_size=options['batch_size']
+        )
+        elapsed = time.perf_counter() - start
+
+        rate = len(cards) / elapsed * 60 if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Issued {len(cards)} card(s) in {elapsed:.2f}s ({rate:,.0f} cards/min)"
+        ))
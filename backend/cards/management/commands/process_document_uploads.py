@@ -0,0 +1,81 @@
+import signal
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from cards import uploads
+
+
+class Command(BaseCommand):
+    help = (
+        'Process the assembled document uploads (type check, image normalization, '
+        'storage) with a pool of worker processes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=2,
+            help='Number of worker processes',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of uploads picked up per batch',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait when no upload is pending',
+        )
+        parser.add_argument(
+            '--expire-hours',
+            type=float,
+            default=24.0,
+            help='Delete the uploads still incomplete after this many hours (0: never)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process every pending upload, then exit',
+        )
+
+    def handle(self, *args, **options):
+        pool = uploads.DocumentProcessingPool(options['workers'])
+        stopped = threading.Event()
+        if not options['once']:
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *args: stopped.set())
+            self.stdout.write(f"📄 Document upload worker started with {options['workers']} process(es)")
+
+        try:
+            while not stopped.is_set():
+                if options['expire_hours']:
+                    expired = uploads.expire_uploads(timedelta(hours=options['expire_hours']))
+                    if expired:
+                        self.stdout.write(f"🗑️ Deleted {expired} abandoned upload(s)")
+
+                start = time.perf_counter()
+                upload_ids = uploads.pending_upload_ids(options['batch_size'])
+                futures = [pool.submit(upload_id) for upload_id in upload_ids]
+                statuses = [future.result() for future in futures]
+                if upload_ids:
+                    ready = statuses.count('ready')
+                    failed = statuses.count('failed')
+                    self.stdout.write(self.style.SUCCESS(
+                        f"✅ {ready} upload(s) ready, {failed} rejected in {time.perf_counter() - start:.2f}s"
+                    ))
+
+                if options['once'] and len(upload_ids) < options['batch_size']:
+                    break
+                if not upload_ids:
+                    stopped.wait(options['interval'])
+        finally:
+            if not options['once']:
+                self.stdout.write("🛑 Stopping document upload worker...")
+            pool.close()
@@ -0,0 +1,94 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from cards import retention
+
+
+class Command(BaseCommand):
+    help = (
+        'Archive then delete the user activities and notifications older than '
+        'their retention policy (RETENTION_POLICIES)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'tables',
+            nargs='*',
+            help=f"Tables to prune: {', '.join(sorted(retention.TABLES))} or all (default: all)",
+        )
+        parser.add_argument(
+            '--archive-dir',
+            help='Directory of the archives (default: RETENTION_ARCHIVE_DIR)',
+        )
+        parser.add_argument(
+            '--no-archive',
+            action='store_true',
+            help='Delete the expired rows without archiving them',
+        )
+        parser.add_argument(
+            '--format',
+            dest='archive_format',
+            default=retention.DEFAULT_ARCHIVE_FORMAT,
+            choices=['csv', 'jsonl', 'parquet'],
+            help='Archive format (parquet requires pyarrow)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=retention.DEFAULT_CHUNK_SIZE,
+            help='Number of rows archived and deleted per statement',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.0,
+            help='Seconds to wait between two DELETE statements',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the expired rows of each bucket',
+        )
+
+    def handle(self, *args, **options):
+        tables = options['tables']
+        if not tables or 'all' in tables:
+            tables = list(retention.TABLES)
+        unknown = [name for name in tables if name not in retention.TABLES]
+        if unknown:
+            raise CommandError(f"Unknown table(s): {', '.join(unknown)}")
+
+        if options['no_archive']:
+            archive_dir = None
+        else:
+            archive_dir = options['archive_dir'] or getattr(settings, 'RETENTION_ARCHIVE_DIR', None)
+            if not archive_dir:
+                raise CommandError("No archive directory: set RETENTION_ARCHIVE_DIR or use --no-archive")
+
+        for name in dict.fromkeys(tables):
+            self.stdout.write(f"🧹 Pruning {name}...")
+
+            start = time.perf_counter()
+            try:
+                result = retention.prune(
+                    name,
+                    dry_run=options['dry_run'],
+                    archive_dir=archive_dir,
+                    archive_format=options['archive_format'],
+                    chunk_size=options['chunk_size'],
+                    pause=options['pause']
+                )
+            except ValueError as e:
+                raise CommandError(str(e))
+            elapsed = time.perf_counter() - start
+
+            for rule_label, bucket_label, rows, path in result.buckets:
+                target = f" -> {path}" if path else ''
+                self.stdout.write(f"   📦 {bucket_label} ({rule_label}): {rows:,} row(s){target}")
+
+            action = 'expired' if options['dry_run'] else 'pruned'
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {result.rows:,} row(s) {action} in {len(result.buckets)} bucket(s) in {elapsed:.2f}s"
+            ))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from cards.models import CardStatistics
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized per-user and system card statistics from the cards table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='Only rebuild the statistics of this user id (can be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+
+        start = time.perf_counter()
+        rebuilt = CardStatistics.rebuild(user_ids=user_ids)
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Rebuilt card statistics for {rebuilt} user(s) in {elapsed:.2f}s"
+        ))
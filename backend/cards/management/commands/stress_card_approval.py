@@ -0,0 +1,146 @@
+import threading
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from cards.models import CarteVirtuelle, CardRequest
+from cards.views import AdminCardRequestDetailView
+from notifications.models import NotificationEvent
+
+
+class Command(BaseCommand):
+    help = (
+        'Approve the same card request from many threads at once and check that '
+        'exactly one card and one set of notifications are created (data is deleted afterwards)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=16,
+            help='Number of concurrent approvals of each request',
+        )
+        parser.add_argument(
+            '--rounds',
+            type=int,
+            default=5,
+            help='Number of requests approved per scenario',
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        tag = uuid.uuid4().hex[:8]
+        self.factory = APIRequestFactory()
+        self.view = AdminCardRequestDetailView.as_view()
+        self.admins = [
+            User.objects.create(
+                username=f'stress-admin-{tag}-{index}', email=f'stress-admin-{tag}-{index}@example.com',
+                first_name='Stress', last_name='Admin', user_type='admin'
+            )
+            for index in range(2)
+        ]
+        self.owner = User.objects.create(
+            username=f'stress-user-{tag}', email=f'stress-user-{tag}@example.com',
+            first_name='Stress', last_name='User'
+        )
+        self.failures = []
+
+        self.stdout.write(f"🧪 Approving each request from {options['threads']} threads")
+        self.stdout.write("=" * 50)
+        scenarios = [
+            # Several admins approving at the same time, without a key
+            ('concurrent admins', lambda index: None),
+            # Retries of one approval by the frontend
+            ('retries, same key', lambda index: 'retry-key'),
+            # Distinct approvals, each with its own key
+            ('distinct keys', lambda index: f'key-{index}'),
+        ]
+        request_ids = []
+        try:
+            for label, get_key in scenarios:
+                start = time.perf_counter()
+                for _ in range(options['rounds']):
+                    card_request = CardRequest.objects.create(
+                        user=self.owner, card_type='personal', card_name='Stress test',
+                        reason='Concurrent approval stress test'
+                    )
+                    request_ids.append(card_request.pk)
+                    self.approve_concurrently(label, card_request.pk, options['threads'], get_key)
+                self.stdout.write(
+                    f"✅ {label:<20} {options['rounds']} request(s) in {time.perf_counter() - start:.2f}s"
+                )
+        finally:
+            card_ids = list(CarteVirtuelle.objects.filter(utilisateur=self.owner).values_list('id', flat=True))
+            NotificationEvent.objects.filter(
+                event_type__in=['card_request_created', 'card_request_approved'], object_id__in=request_ids
+            ).delete()
+            NotificationEvent.objects.filter(event_type='card_created', object_id__in=card_ids).delete()
+            User.objects.filter(pk__in=[self.owner.pk] + [admin.pk for admin in self.admins]).delete()
+
+        if self.failures:
+            for failure in self.failures:
+                self.stdout.write(self.style.ERROR(f"❌ {failure}"))
+            raise CommandError(f"{len(self.failures)} concurrent approval check(s) failed")
+        self.stdout.write(self.style.SUCCESS("✅ Every request was approved exactly once"))
+
+    def approve_concurrently(self, label, request_id, thread_count, get_key):
+        barrier = threading.Barrier(thread_count)
+        responses = [None] * thread_count
+
+        def approve(index):
+            try:
+                headers = {}
+                key = get_key(index)
+                if key is not None:
+                    headers['HTTP_IDEMPOTENCY_KEY'] = key
+                request = self.factory.patch(
+                    f'/api/cards/admin/requests/{request_id}/',
+                    {'status': 'approved', 'admin_comments': f'Approved by thread {index}'},
+                    format='json', **headers
+                )
+                force_authenticate(request, user=self.admins[index % len(self.admins)])
+                barrier.wait()
+                responses[index] = self.view(request, pk=request_id)
+            except Exception as e:
+                responses[index] = e
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=approve, args=(index,)) for index in range(thread_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        prefix = f"{label}, request {request_id}"
+        errors = [response for response in responses if getattr(response, 'status_code', None) != 200]
+        if errors:
+            self.failures.append(f"{prefix}: {len(errors)} failed approval(s), e.g. {errors[0]!r}")
+
+        card_request = CardRequest.objects.get(pk=request_id)
+        cards = list(CarteVirtuelle.objects.filter(utilisateur=self.owner, cardrequest=card_request))
+        if card_request.status != 'approved' or card_request.approved_card_id is None:
+            self.failures.append(f"{prefix}: not approved")
+        orphans = CarteVirtuelle.objects.filter(utilisateur=self.owner, cardrequest__isnull=True).count()
+        if len(cards) != 1 or orphans:
+            self.failures.append(f"{prefix}: {len(cards)} linked card(s) and {orphans} orphan card(s) issued")
+
+        approvals = NotificationEvent.objects.filter(event_type='card_request_approved', object_id=request_id).count()
+        if approvals != 1:
+            self.failures.append(f"{prefix}: {approvals} approval notification(s) queued")
+        if cards:
+            created = NotificationEvent.objects.filter(event_type='card_created', object_id=cards[0].pk).count()
+            if created != 1:
+                self.failures.append(f"{prefix}: {created} card creation notification(s) queued")
+
+        replayed = sum(
+            1 for response in responses
+            if getattr(response, 'get', None) and response.get('Idempotent-Replayed') == 'true'
+        )
+        if label.startswith('retries') and replayed != thread_count - 1:
+            self.failures.append(f"{prefix}: {replayed} replayed response(s), expected {thread_count - 1}")
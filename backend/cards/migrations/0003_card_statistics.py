@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:09
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0002_add_card_category'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CardStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pending_cards', models.IntegerField(default=0)),
+                ('active_cards', models.IntegerField(default=0)),
+                ('blocked_cards', models.IntegerField(default=0)),
+                ('expired_cards', models.IntegerField(default=0)),
+                ('rejected_cards', models.IntegerField(default=0)),
+                ('classic_cards', models.IntegerField(default=0)),
+                ('gold_cards', models.IntegerField(default=0)),
+                ('platinum_cards', models.IntegerField(default=0)),
+                ('diamond_cards', models.IntegerField(default=0)),
+                ('total_balance', models.DecimalField(decimal_places=2, default=0.0, max_digits=15)),
+                ('expired_balance', models.DecimalField(decimal_places=2, default=0.0, max_digits=15)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='card_statistics', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Card Statistics',
+                'verbose_name_plural': 'Card Statistics',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0003_card_statistics'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cardrequest',
+            index=models.Index(fields=['created_at', 'id'], name='cards_cardr_created_0da450_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cartevirtuelle',
+            index=models.Index(fields=['dateCreation', 'id'], name='cards_carte_dateCre_badfc4_idx'),
+        ),
+    ]
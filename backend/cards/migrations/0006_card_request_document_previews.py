@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0005_document_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cardrequest',
+            name='document_previews',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
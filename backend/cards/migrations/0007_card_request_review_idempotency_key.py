@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0006_card_request_document_previews'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cardrequest',
+            name='review_idempotency_key',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:54
+
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+def delete_duplicate_system_rows(apps, schema_editor):
+    """Keep the first system row, the counters are rebuilt on demand anyway"""
+    CardStatistics = apps.get_model('cards', 'CardStatistics')
+    system_rows = CardStatistics.objects.filter(user__isnull=True).order_by('pk')
+    first = system_rows.first()
+    if first is not None:
+        system_rows.exclude(pk=first.pk).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0007_card_request_review_idempotency_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_system_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cardstatistics',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Coalesce('user', models.Value(0)), name='card_statistics_single_system_row'),
+        ),
+    ]
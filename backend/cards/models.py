@@ -1,13 +1,57 @@
-from django.db import models
+from django.db import connections, models, transaction, IntegrityError
+from django.db.models import Count, Sum, Q, F, Value, DecimalField
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 from datetime import datetime, timedelta
+from decimal import Decimal
 from django.utils import timezone
 import string
 import random
 import hashlib
 
-class CarteVirtuelle(models.Model):
+from backend.tracking import TrackedFieldsModel
+from . import luhn
+
+
+class CarteVirtuelleQuerySet(models.QuerySet):
+    
+    def update_status(self, status):
+        """Change the status of every matching card with a single UPDATE.
+        
+        Statistics are kept in sync and ``card_status_bulk_changed`` is sent
+        once with all the transitions. Returns the number of cards changed.
+        """
+        from .signals import card_status_bulk_changed
+        
+        with transaction.atomic():
+            rows = list(
+                self.exclude(status=status)
+                .select_for_update()
+                .order_by()
+                .values('id', *CarteVirtuelle.TRACKED_FIELDS)
+            )
+            if not rows:
+                return 0
+            
+            card_ids = [row.pop('id') for row in rows]
+            self.model.objects.filter(id__in=card_ids).update(status=status)
+            
+            CardStatistics.record_bulk_changes(
+                [(row, dict(row, status=status)) for row in rows]
+            )
+            
+            transitions = [
+                (card_id, row['status'], status)
+                for card_id, row in zip(card_ids, rows)
+            ]
+            card_status_bulk_changed.send(sender=self.model, transitions=transitions)
+        
+        return len(card_ids)
+
+
+class CarteVirtuelle(TrackedFieldsModel):
     CARD_STATUS_CHOICES = [
         ('pending', 'Pending Approval'),
         ('active', 'Active'),
@@ -49,54 +93,99 @@ class CarteVirtuelle(models.Model):
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     credit_limit = models.DecimalField(max_digits=10, decimal_places=2, default=1000.00)
     
+    # Field values remembered when a card is loaded (statistics, status signals)
+    TRACKED_FIELDS = ('utilisateur_id', 'status', 'card_category', 'balance')
+    
+    objects = CarteVirtuelleQuerySet.as_manager()
+    
+    # MII (Major Industry Identifier) based on card type
+    CARD_MII_MAP = {
+        'personal': '4',      # Visa
+        'business': '5',      # Mastercard
+        'travel': '3',        # American Express (Travel & Entertainment)
+        'shopping': '6',      # Discover (Merchandising)
+    }
+    
+    # IIN (Issuer Identification Number) - fictional bank identifier
+    CARD_IIN = '53280'
+    
+    # Account number length (9 digits for 16-digit card)
+    CARD_ACCOUNT_DIGITS = 9
+    
     @staticmethod
-    def generate_card_number(card_type='personal'):
-        """Generate a valid credit card number using Luhn algorithm"""
-        # MII (Major Industry Identifier) based on card type
-        mii_map = {
-            'personal': '4',      # Visa
-            'business': '5',      # Mastercard
-            'travel': '3',        # American Express (Travel & Entertainment)
-            'shopping': '6',      # Discover (Merchandising)
-        }
-        
+    def generate_partial_card_number(card_type='personal'):
+        """Generate the first 15 digits of a card number (without check digit)"""
         # Start with MII
-        mii = mii_map.get(card_type, '4')
-        
-        # Generate IIN (Issuer Identification Number) - 5 digits
-        # Using a fictional bank identifier: 53280
-        iin = '53280'
+        mii = CarteVirtuelle.CARD_MII_MAP.get(card_type, '4')
         
-        # Generate account number (9 digits for 16-digit card)
-        account_digits = 9
-        account_number = ''.join([str(random.randint(0, 9)) for _ in range(account_digits)])
+        # Generate account number
+        account_number = '%0*d' % (
+            CarteVirtuelle.CARD_ACCOUNT_DIGITS,
+            random.randrange(10 ** CarteVirtuelle.CARD_ACCOUNT_DIGITS)
+        )
         
         # Combine MII + IIN + Account Number (15 digits total)
-        partial_number = mii + iin + account_number
-        
-        # Calculate check digit using Luhn algorithm
-        check_digit = CarteVirtuelle.calculate_luhn_check_digit(partial_number)
-        
-        return partial_number + str(check_digit)
+        return mii + CarteVirtuelle.CARD_IIN + account_number
+    
+    @staticmethod
+    def generate_card_number(card_type='personal'):
+        """Generate a valid credit card number using Luhn algorithm"""
+        partial_number = CarteVirtuelle.generate_partial_card_number(card_type)
+        return luhn.complete(partial_number)
     
     @staticmethod
     def calculate_luhn_check_digit(partial_number):
         """Calculate Luhn check digit for credit card validation"""
-        def luhn_checksum(card_num):
-            def digits_of(n):
-                return [int(d) for d in str(n)]
-            digits = digits_of(card_num)
-            odd_digits = digits[-1::-2]
-            even_digits = digits[-2::-2]
-            checksum = sum(odd_digits)
-            for d in even_digits:
-                checksum += sum(digits_of(d*2))
-            return checksum % 10
-        
-        for i in range(10):
-            if luhn_checksum(partial_number + str(i)) == 0:
-                return i
-        return 0
+        return luhn.calculate_check_digit(partial_number)
+    
+    @classmethod
+    def generate_unique_card_numbers(cls, card_types, max_attempts=10):
+        """Generate one unused card number per card type.
+        
+        Candidates are deduplicated in memory and checked against the
+        existing numbers with a single query per attempt; only the
+        colliding ones are regenerated.
+        """
+        numbers = [None] * len(card_types)
+        taken = set()
+        pending = list(range(len(card_types)))
+        
+        for _ in range(max_attempts):
+            partials = {}
+            for index in pending:
+                partial = cls.generate_partial_card_number(card_types[index])
+                while partial in partials:
+                    partial = cls.generate_partial_card_number(card_types[index])
+                partials[partial] = index
+            
+            # Numbers already accepted in a previous attempt are retried
+            candidates = {}
+            pending = []
+            for number, index in zip(luhn.complete_batch(partials), partials.values()):
+                if number in taken:
+                    pending.append(index)
+                else:
+                    candidates[number] = index
+            
+            existing = set(
+                cls.objects.filter(numeroCart__in=list(candidates))
+                .values_list('numeroCart', flat=True)
+            )
+            
+            for number, index in candidates.items():
+                if number in existing:
+                    pending.append(index)
+                else:
+                    numbers[index] = number
+                    taken.add(number)
+            
+            if not pending:
+                return numbers
+        
+        raise RuntimeError(
+            f"Could not generate {len(pending)} unique card number(s) "
+            f"after {max_attempts} attempts"
+        )
     
     @staticmethod
     def generate_cvv(card_number, expiry_date):
@@ -149,7 +238,7 @@ class CarteVirtuelle(models.Model):
         card_category = cls.determine_card_category(card_request.requested_limit)
         
         # Generate card number
-        card_number = cls.generate_card_number(card_request.card_type)
+        card_number = cls.generate_unique_card_numbers([card_request.card_type])[0]
         
         # Calculate expiry date
         creation_date = timezone.now().date()
@@ -174,6 +263,74 @@ class CarteVirtuelle(models.Model):
         
         return card
     
+    @classmethod
+    def bulk_create_from_requests(cls, card_requests, approved_by, batch_size=500):
+        """Create cards for many approved card requests in batches.
+        
+        Each batch generates its card numbers in memory, checks them with
+        one query, inserts the cards with ``bulk_create`` and links them to
+        their requests with ``bulk_update``. Model signals are not sent.
+        Returns the list of created cards.
+        """
+        card_requests = list(card_requests)
+        cards = []
+        
+        for start in range(0, len(card_requests), batch_size):
+            chunk = card_requests[start:start + batch_size]
+            cards.extend(cls._bulk_create_chunk(chunk))
+        
+        return cards
+    
+    @classmethod
+    def _bulk_create_chunk(cls, card_requests, max_attempts=3):
+        """Create and link the cards of one batch of requests"""
+        creation_date = timezone.now().date()
+        
+        for attempt in range(max_attempts):
+            card_numbers = cls.generate_unique_card_numbers(
+                [card_request.card_type for card_request in card_requests]
+            )
+            
+            cards = []
+            for card_request, card_number in zip(card_requests, card_numbers):
+                card_category = cls.determine_card_category(card_request.requested_limit)
+                expiry_date = cls.calculate_expiry_date(card_category, creation_date)
+                cards.append(cls(
+                    numeroCart=card_number,
+                    cvv2=cls.generate_cvv(card_number, expiry_date),
+                    dateExpiration=expiry_date,
+                    utilisateur_id=card_request.user_id,
+                    card_type=card_request.card_type,
+                    card_category=card_category,
+                    card_name=card_request.card_name,
+                    status='active',  # Automatically activate approved cards
+                    credit_limit=card_request.requested_limit,
+                    balance=0.00
+                ))
+            
+            try:
+                with transaction.atomic():
+                    cls.objects.bulk_create(cards)
+                    
+                    # Not every backend returns primary keys from bulk inserts
+                    card_ids = dict(
+                        cls.objects.filter(numeroCart__in=card_numbers)
+                        .values_list('numeroCart', 'id')
+                    )
+                    for card_request, card in zip(card_requests, cards):
+                        card.pk = card_ids[card.numeroCart]
+                        card_request.approved_card = card
+                    
+                    CardRequest.objects.bulk_update(card_requests, ['approved_card'])
+                    CardStatistics.record_bulk_creation(cards)
+            except IntegrityError:
+                # A concurrent insert took one of the numbers, try again
+                if attempt == max_attempts - 1:
+                    raise
+                continue
+            
+            return cards
+    
     # Methods from UML
     def activerCarte(self):
         """Activate the card"""
@@ -215,6 +372,18 @@ class CarteVirtuelle(models.Model):
         """Generate random CVV"""
         return ''.join(random.choices(string.digits, k=3))
     
+    @staticmethod
+    def mask_card_number(numero):
+        """Return masked card number (only last 4 digits visible)"""
+        if numero:
+            return f"**** **** **** {numero[-4:]}"
+        return "****"
+    
+    @staticmethod
+    def mask_cvv(cvv):
+        """Return masked CVV (no digit visible)"""
+        return "***" if cvv else ""
+    
     def validerTransaction(self, montant):
         """Validate if transaction is possible"""
         return self.status == 'active' and self.balance >= montant
@@ -228,7 +397,11 @@ class CarteVirtuelle(models.Model):
         if not self.dateExpiration:
             self.dateExpiration = self.calculerDateExpiration()
         
-        super().save(*args, **kwargs)
+        old_values = None if self._state.adding else self.get_loaded_values()
+        
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            CardStatistics.record_change(old_values, self.get_loaded_values())
     
     def __str__(self):
         return f"{self.card_name} - {self.numeroCart[-4:]}"
@@ -237,9 +410,68 @@ class CarteVirtuelle(models.Model):
         verbose_name = "Carte Virtuelle"
         verbose_name_plural = "Cartes Virtuelles"
         ordering = ['-dateCreation']
+        indexes = [
+            # Keyset pagination of the admin card list
+            models.Index(fields=['dateCreation', 'id']),
+        ]
 
 
-class CardRequest(models.Model):
+class CardRequestQuerySet(models.QuerySet):
+    
+    def review(self, status, reviewed_by, admin_comments=''):
+        """Approve or reject every pending matching request at once.
+        
+        The requests are locked with a single query, the review is written
+        with a single UPDATE and, on approval, the cards are issued with
+        ``CarteVirtuelle.bulk_create_from_requests``. Model signals are not
+        sent; ``card_requests_bulk_reviewed`` is sent once instead. Returns
+        the reviewed requests.
+        """
+        from .signals import card_requests_bulk_reviewed
+        
+        with transaction.atomic():
+            # In primary key order, so concurrent reviews cannot deadlock
+            card_requests = list(
+                self.filter(status='pending')
+                .select_for_update()
+                .order_by('pk')
+                .only('id', 'user', 'card_type', 'card_name', 'requested_limit', 'status', 'approved_card')
+            )
+            if not card_requests:
+                return []
+            
+            reviewed_at = timezone.now()
+            request_ids = [card_request.pk for card_request in card_requests]
+            # Same review for every request: one UPDATE rather than a bulk_update
+            self.model.objects.filter(id__in=request_ids).update(
+                status=status,
+                admin_comments=admin_comments,
+                reviewed_at=reviewed_at,
+                reviewed_by=reviewed_by
+            )
+            for card_request in card_requests:
+                card_request.status = status
+                card_request.admin_comments = admin_comments
+                card_request.reviewed_at = reviewed_at
+                card_request.reviewed_by = reviewed_by
+                card_request.remember_loaded_values()
+            
+            cards = []
+            if status == 'approved':
+                cards = CarteVirtuelle.bulk_create_from_requests(card_requests, reviewed_by)
+            
+            card_requests_bulk_reviewed.send(
+                sender=self.model,
+                status=status,
+                request_ids=request_ids,
+                card_ids=[card.pk for card in cards],
+                admin_comments=admin_comments
+            )
+        
+        return card_requests
+
+
+class CardRequest(TrackedFieldsModel):
     """Model to handle card creation requests that need admin approval"""
     
     REQUEST_STATUS_CHOICES = [
@@ -262,6 +494,8 @@ class CardRequest(models.Model):
     monthly_income = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     identity_document = models.FileField(upload_to='documents/', null=True, blank=True)
     income_proof = models.FileField(upload_to='documents/', null=True, blank=True)
+    # Content hash and generated preview images of each document (cards.previews)
+    document_previews = models.JSONField(default=dict, blank=True, editable=False)
     
     # Request details
     reason = models.TextField(help_text="Reason for requesting this card")
@@ -284,9 +518,380 @@ class CardRequest(models.Model):
         null=True, 
         blank=True
     )
+    # Idempotency-Key header of the last review, a retry with it is not applied again
+    review_idempotency_key = models.CharField(max_length=255, blank=True, editable=False)
+    
+    # Status remembered when loaded, used by the status change signals
+    TRACKED_FIELDS = ('status',)
+    
+    objects = CardRequestQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.user.username} - {self.card_type} Request"
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the admin request list
+            models.Index(fields=['created_at', 'id']),
+        ]
+
+
+class DocumentUpload(models.Model):
+    """A document uploaded in parts, then checked and stored by a background worker"""
+    
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('pending', 'Pending Processing'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='document_uploads')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveIntegerField(help_text="Announced size in bytes")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    
+    # Set by the processing worker
+    content_type = models.CharField(max_length=100, blank=True)
+    sha256 = models.CharField(max_length=64, blank=True)
+    file = models.FileField(upload_to='documents/', null=True, blank=True)
+    error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Uploads waiting for a worker, and abandoned ones
+            models.Index(fields=['status', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.filename} ({self.status})"
+
+
+class PendingSystemDeltas(dict):
+    """System counter changes of one transaction, applied once it commits"""
+    
+    def __call__(self):
+        CardStatistics.apply_deltas(None, self)
+
+
+class CardStatistics(models.Model):
+    """Materialized card counters for one user, or for the whole system when user is empty"""
+    
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='card_statistics'
+    )
+    
+    # Cards per status
+    pending_cards = models.IntegerField(default=0)
+    active_cards = models.IntegerField(default=0)
+    blocked_cards = models.IntegerField(default=0)
+    expired_cards = models.IntegerField(default=0)
+    rejected_cards = models.IntegerField(default=0)
+    
+    # Cards per category
+    classic_cards = models.IntegerField(default=0)
+    gold_cards = models.IntegerField(default=0)
+    platinum_cards = models.IntegerField(default=0)
+    diamond_cards = models.IntegerField(default=0)
+    
+    # Balance sums
+    total_balance = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
+    expired_balance = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
+    
+    updated_at = models.DateTimeField(default=timezone.now)
+    
+    STATUS_FIELDS = {status: f'{status}_cards' for status, _ in CarteVirtuelle.CARD_STATUS_CHOICES}
+    CATEGORY_FIELDS = {category: f'{category}_cards' for category, _ in CarteVirtuelle.CARD_CATEGORY_CHOICES}
+    COUNTER_FIELDS = (
+        list(STATUS_FIELDS.values()) + list(CATEGORY_FIELDS.values())
+        + ['total_balance', 'expired_balance']
+    )
+    
+    @property
+    def total_cards(self):
+        """All cards, including expired ones"""
+        return sum(getattr(self, field) for field in self.STATUS_FIELDS.values())
+    
+    @property
+    def current_cards(self):
+        """Cards that are not expired"""
+        return self.total_cards - self.expired_cards
+    
+    @property
+    def current_balance(self):
+        """Balance of the cards that are not expired"""
+        return Decimal(self.total_balance) - Decimal(self.expired_balance)
+    
+    def category_counts(self):
+        return {category: getattr(self, field) for category, field in self.CATEGORY_FIELDS.items()}
+    
+    @classmethod
+    def for_user(cls, user):
+        """Statistics row of a user, rebuilt from the cards table if missing"""
+        stats = cls.objects.filter(user=user).first()
+        if stats is None:
+            cls.rebuild(user_ids=[user.pk])
+            stats = cls.objects.get(user=user)
+        return stats
+    
+    @classmethod
+    def for_system(cls):
+        """System-wide statistics row, rebuilt from the cards table if missing"""
+        stats = cls.objects.filter(user__isnull=True).first()
+        if stats is None:
+            cls.rebuild(include_system=True, user_ids=[])
+            stats = cls.objects.get(user__isnull=True)
+        return stats
+    
+    @classmethod
+    def card_deltas(cls, values, sign):
+        """Counter changes for adding (sign=1) or removing (sign=-1) one card"""
+        deltas = {}
+        status_field = cls.STATUS_FIELDS.get(values['status'])
+        if status_field:
+            deltas[status_field] = sign
+        category_field = cls.CATEGORY_FIELDS.get(values['card_category'])
+        if category_field:
+            deltas[category_field] = sign
+        
+        balance = Decimal(str(values['balance'] or 0))
+        deltas['total_balance'] = sign * balance
+        if values['status'] == 'expired':
+            deltas['expired_balance'] = sign * balance
+        return deltas
+    
+    @classmethod
+    def record_change(cls, old_values, new_values, rebuild_missing=True):
+        """Apply the change of one card (None for creation/deletion) to the counters"""
+        per_user = {}
+        for values, sign in ((old_values, -1), (new_values, 1)):
+            if values is None:
+                continue
+            user_deltas = per_user.setdefault(values['utilisateur_id'], {})
+            for field, delta in cls.card_deltas(values, sign).items():
+                user_deltas[field] = user_deltas.get(field, 0) + delta
+        
+        system_deltas = {}
+        for user_id, deltas in per_user.items():
+            cls.apply_deltas(user_id, deltas, rebuild_missing)
+            for field, delta in deltas.items():
+                system_deltas[field] = system_deltas.get(field, 0) + delta
+        cls.defer_system_deltas(system_deltas)
+    
+    @classmethod
+    def record_bulk_creation(cls, cards):
+        """Account for cards inserted without save(), e.g. with bulk_create"""
+        cls.record_bulk_changes([
+            (None, {f: getattr(card, f) for f in CarteVirtuelle.TRACKED_FIELDS})
+            for card in cards
+        ])
+    
+    @classmethod
+    def record_bulk_changes(cls, changes):
+        """Apply many (old_values, new_values) card changes at once.
+        
+        The system row is incremented and the affected users are rebuilt
+        with a grouped aggregate instead of one update per user.
+        """
+        system_deltas = {}
+        user_ids = set()
+        for old_values, new_values in changes:
+            for values, sign in ((old_values, -1), (new_values, 1)):
+                if values is None:
+                    continue
+                user_ids.add(values['utilisateur_id'])
+                for field, delta in cls.card_deltas(values, sign).items():
+                    system_deltas[field] = system_deltas.get(field, 0) + delta
+        
+        cls.defer_system_deltas(system_deltas)
+        cls.rebuild(user_ids=user_ids)
+    
+    @classmethod
+    def defer_system_deltas(cls, deltas):
+        """Increment the system row once the current transaction commits.
+        
+        Every card change touches the system row: updating it inside the
+        transaction would hold its lock until the commit, and concurrent
+        approvals would run one after the other. The changes of a
+        transaction are summed instead and written by a single UPDATE after
+        the commit. If that UPDATE is lost (crash), or races with a rebuild
+        of the system row, ``reconcile_card_stats`` corrects the row.
+        """
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            cls.apply_deltas(None, deltas)
+            return
+        
+        # One sum per savepoint, discarded with it if it is rolled back
+        savepoint_ids = set(connection.savepoint_ids)
+        for callback_savepoint_ids, callback, robust in connection.run_on_commit:
+            if isinstance(callback, PendingSystemDeltas) and callback_savepoint_ids == savepoint_ids:
+                pending = callback
+                break
+        else:
+            pending = PendingSystemDeltas()
+            transaction.on_commit(pending)
+        
+        for field, delta in deltas.items():
+            pending[field] = pending.get(field, 0) + delta
+    
+    @classmethod
+    def apply_deltas(cls, user_id, deltas, rebuild_missing=True):
+        """Increment the counters of one row, rebuilding it if it does not exist yet.
+        
+        Must be called after the card change has been written, so that a
+        rebuild already includes it.
+        """
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        
+        updates = {field: F(field) + delta for field, delta in deltas.items()}
+        updates['updated_at'] = timezone.now()
+        
+        if user_id is None:
+            if not cls.objects.filter(user__isnull=True).update(**updates):
+                cls.rebuild(include_system=True, user_ids=[])
+            return
+        
+        if not cls.objects.filter(user_id=user_id).update(**updates):
+            if rebuild_missing:
+                cls.rebuild(user_ids=[user_id])
+            return
+        
+        # Keep the denormalized totals of the user in sync
+        card_delta = sum(
+            deltas.get(field, 0)
+            for status, field in cls.STATUS_FIELDS.items()
+            if status != 'expired'
+        )
+        balance_delta = deltas.get('total_balance', 0) - deltas.get('expired_balance', 0)
+        get_user_model().objects.filter(pk=user_id).update(
+            total_cards=F('total_cards') + card_delta,
+            total_balance=F('total_balance') + balance_delta
+        )
+    
+    @classmethod
+    def counter_aggregates(cls):
+        """Aggregate expressions computing every counter from the cards table"""
+        def balance_sum(**filters):
+            return Coalesce(
+                Sum('balance', filter=Q(**filters) if filters else None),
+                Value(Decimal('0.00')),
+                output_field=DecimalField(max_digits=15, decimal_places=2)
+            )
+        
+        aggregates = {
+            field: Count('id', filter=Q(status=status))
+            for status, field in cls.STATUS_FIELDS.items()
+        }
+        aggregates.update({
+            field: Count('id', filter=Q(card_category=category))
+            for category, field in cls.CATEGORY_FIELDS.items()
+        })
+        aggregates['total_balance'] = balance_sum()
+        aggregates['expired_balance'] = balance_sum(status='expired')
+        return aggregates
+    
+    @classmethod
+    def rebuild(cls, user_ids=None, include_system=None):
+        """Recompute counters from the cards table with grouped aggregates.
+        
+        Rebuilds the rows of ``user_ids`` (every user when None) and the
+        system row (by default only when rebuilding every user).
+        """
+        User = get_user_model()
+        if include_system is None:
+            include_system = user_ids is None
+        
+        cards = CarteVirtuelle.objects.order_by()
+        users = User.objects.all()
+        stats = cls.objects.filter(user__isnull=False)
+        if user_ids is not None:
+            user_ids = list(user_ids)
+            cards = cards.filter(utilisateur_id__in=user_ids)
+            users = users.filter(pk__in=user_ids)
+            stats = stats.filter(user_id__in=user_ids)
+        
+        now = timezone.now()
+        with transaction.atomic():
+            # Rows are locked before the cards are read: a concurrent
+            # apply_deltas() waits for the rebuilt values and adds to them
+            locked_user_ids = list(
+                stats.select_for_update().order_by('user_id').values_list('user_id', flat=True)
+            )
+            system = None
+            if include_system:
+                system = cls.objects.select_for_update().filter(user__isnull=True).first()
+            
+            rows = {}
+            if user_ids is None or user_ids:
+                for row in cards.values('utilisateur_id').annotate(**cls.counter_aggregates()):
+                    user_id = row.pop('utilisateur_id')
+                    rows[user_id] = cls(user_id=user_id, updated_at=now, **row)
+            
+            # Explicitly requested users, and users whose cards are all gone,
+            # get a row of zeros
+            for user_id in user_ids if user_ids is not None else locked_user_ids:
+                rows.setdefault(user_id, cls(user_id=user_id, updated_at=now))
+            
+            # Upsert: concurrent rebuilds of a missing row do not conflict
+            upsert = {'update_conflicts': True, 'update_fields': cls.COUNTER_FIELDS + ['updated_at']}
+            if connections[cls.objects.db].features.supports_update_conflicts_with_target:
+                upsert['unique_fields'] = ['user']
+            cls.objects.bulk_create(rows.values(), batch_size=1000, **upsert)
+            
+            users.update(total_cards=0, total_balance=Decimal('0.00'))
+            User.objects.bulk_update(
+                [
+                    User(pk=user_id, total_cards=row.current_cards, total_balance=row.current_balance)
+                    for user_id, row in rows.items()
+                    if row.total_cards
+                ],
+                ['total_cards', 'total_balance'],
+                batch_size=1000
+            )
+            
+            if include_system:
+                totals = CarteVirtuelle.objects.aggregate(**cls.counter_aggregates())
+                if system is None:
+                    try:
+                        with transaction.atomic():
+                            cls.objects.create(updated_at=now, **totals)
+                    except IntegrityError:
+                        # Created concurrently (one system row, see Meta)
+                        system = cls.objects.select_for_update().get(user__isnull=True)
+                if system is not None:
+                    for field, value in totals.items():
+                        setattr(system, field, value)
+                    system.updated_at = now
+                    system.save()
+        
+        return len(rows)
+    
+    def __str__(self):
+        owner = self.user.username if self.user_id else 'system'
+        return f"Card statistics ({owner})"
+    
+    class Meta:
+        verbose_name = "Card Statistics"
+        verbose_name_plural = "Card Statistics"
+        constraints = [
+            # A single system row (user is NULL); an expression rather than a
+            # condition, which MySQL does not support
+            models.UniqueConstraint(
+                Coalesce('user', Value(0)),
+                name='card_statistics_single_system_row'
+            ),
+        ]
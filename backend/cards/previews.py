@@ -0,0 +1,141 @@
+"""
+Preview images of the documents of card requests.
+
+Admins reviewing a request used to download the full-size scans. Each image
+document now gets downscaled JPEG renditions (``DOCUMENT_PREVIEW_SIZES``: a
+small thumbnail for lists and a larger preview for the detail page). They are
+generated by the document processing pool (``cards.uploads``) once a request
+with new documents is saved, never in the request, and by
+``manage.py generate_document_previews`` for existing requests.
+
+Renditions are stored under ``previews/`` and named after the SHA-256 of the
+document content, so a document uploaded several times is decoded once. The
+hash and the rendition names are recorded in ``CardRequest.document_previews``
+and serializers build the URLs from it, without any query or file access.
+PDF documents get no preview.
+"""
+import os
+import warnings
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+
+from . import uploads
+
+DOCUMENT_FIELDS = ('identity_document', 'income_proof')
+PREVIEW_DIR = 'previews'
+PREVIEW_QUALITY = 80
+
+
+def preview_sizes():
+    """Longest side in pixels of each rendition"""
+    return getattr(settings, 'DOCUMENT_PREVIEW_SIZES', {'thumbnail': 200, 'preview': 1024})
+
+
+def preview_name(sha256, size_name):
+    return f'{PREVIEW_DIR}/{sha256[:2]}/{sha256}-{size_name}.jpg'
+
+
+def needs_previews(card_request):
+    """Whether a document was added, replaced or removed since the last generation"""
+    for field in DOCUMENT_FIELDS:
+        recorded = card_request.document_previews.get(field) or {}
+        if (getattr(card_request, field).name or '') != recorded.get('name', ''):
+            return True
+    return False
+
+
+def render_previews(source_path, sha256):
+    """Write the missing renditions of an image; return their names, None if not an image"""
+    from PIL import Image, ImageOps
+
+    sizes = preview_sizes()
+    names = {size_name: preview_name(sha256, size_name) for size_name in sizes}
+    missing = [size_name for size_name, name in names.items() if not default_storage.exists(name)]
+    if not missing:
+        # Same content already rendered for another request
+        return names
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', Image.DecompressionBombWarning)
+        try:
+            with Image.open(source_path) as image:
+                # JPEGs are decoded directly at a reduced scale
+                largest = max(sizes.values())
+                image.draft('RGB', (largest, largest))
+                image = ImageOps.exif_transpose(image)
+                if image.mode not in ('RGB', 'L'):
+                    image = image.convert('RGB')
+
+                # Largest first, each rendition shrinks the previous one
+                for size_name in sorted(missing, key=lambda size_name: -sizes[size_name]):
+                    image.thumbnail((sizes[size_name], sizes[size_name]))
+                    path = default_storage.path(names[size_name])
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    image.save(f'{path}.tmp', 'JPEG', quality=PREVIEW_QUALITY, optimize=True)
+                    os.replace(f'{path}.tmp', path)
+        except (OSError, SyntaxError, ValueError, Image.DecompressionBombError,
+                Image.DecompressionBombWarning):
+            # PDF, or an image that cannot be decoded
+            return None
+    return names
+
+
+def generate_previews(request_id):
+    """Hash the documents of a card request and render their previews (worker side)"""
+    from .models import CardRequest
+
+    try:
+        card_request = CardRequest.objects.filter(pk=request_id).only(
+            'id', 'document_previews', *DOCUMENT_FIELDS
+        ).first()
+        if card_request is None:
+            return None
+
+        previews = {}
+        for field in DOCUMENT_FIELDS:
+            document = getattr(card_request, field)
+            if not document.name:
+                continue
+            recorded = card_request.document_previews.get(field) or {}
+            if recorded.get('name') == document.name:
+                previews[field] = recorded
+                continue
+
+            entry = {'name': document.name}
+            path = document.path
+            if os.path.exists(path):
+                entry['sha256'] = uploads.file_sha256(path)
+                entry['images'] = render_previews(path, entry['sha256']) or {}
+            previews[field] = entry
+
+        # update(): no signal, the request is not scheduled again
+        CardRequest.objects.filter(pk=request_id).update(document_previews=previews)
+        return previews
+    finally:
+        close_old_connections()
+
+
+def schedule(request_id):
+    """Queue the preview generation of a card request (call once committed)"""
+    pool = uploads.get_pool()
+    if pool is not None:
+        return pool.run(generate_previews, request_id)
+    return None
+
+
+def preview_urls(card_request, field, http_request=None):
+    """Signed URLs of the renditions of a document, None while they are not generated"""
+    from backend.media import signed_url
+    
+    entry = card_request.document_previews.get(field) or {}
+    images = entry.get('images')
+    if not images or entry.get('name') != getattr(card_request, field).name:
+        return None
+
+    urls = {}
+    for size_name, name in images.items():
+        url = signed_url(name)
+        urls[size_name] = http_request.build_absolute_uri(url) if http_request is not None else url
+    return urls
@@ -0,0 +1,261 @@
+"""
+Retention of user activities and notifications.
+
+Each table has a policy (``RETENTION_POLICIES``): rows older than ``days`` are
+archived then deleted, with per-category overrides (notification category,
+activity type). Expired rows are processed one time bucket (a UTC day or
+month) at a time, oldest first:
+
+* the rows of the bucket are written, in primary-key chunks, to one
+  compressed archive file per bucket with the writers of ``cards.export``;
+  the file is only renamed into place once complete;
+* the archived rows are then deleted one primary-key range (one chunk) per
+  statement, so no statement locks the table for long.
+
+An interrupted prune can simply be run again: a bucket is never deleted
+before its archive is complete, and archives are named after the first
+primary key they contain, so a re-run never overwrites rows it did not
+archive again.
+"""
+import datetime
+import os
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .export import DEFAULT_COMPRESS_LEVEL, get_dataset, get_writer_class
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_ARCHIVE_FORMAT = 'jsonl'
+BUCKETS = ('day', 'month')
+
+# dataset: export dataset of the table, date_field: age of a row,
+# category_field: field the per-category policies apply to
+RetentionTable = namedtuple('RetentionTable', ['dataset', 'date_field', 'category_field'])
+
+TABLES = {
+    'user_activities': RetentionTable('user_activities', 'timestamp', 'activity_type'),
+    'notifications': RetentionTable('notifications', 'created_at', 'category'),
+}
+
+# A set of rows expiring together: older than cutoff and matching condition
+RetentionRule = namedtuple('RetentionRule', ['label', 'cutoff', 'condition'])
+
+
+class RetentionPolicy:
+    """How long the rows of a table are kept"""
+
+    def __init__(self, table_name, days=None, categories=None, bucket='day'):
+        if table_name not in TABLES:
+            raise ValueError(f"Unknown table: {table_name}")
+        if bucket not in BUCKETS:
+            raise ValueError(f"Unknown bucket: {bucket}")
+        self.table_name = table_name
+        self.table = TABLES[table_name]
+        self.days = days
+        self.categories = categories or {}
+        self.bucket = bucket
+
+    @classmethod
+    def from_settings(cls, table_name):
+        policy = getattr(settings, 'RETENTION_POLICIES', {}).get(table_name, {})
+        return cls(table_name, **policy)
+
+    @property
+    def model(self):
+        return get_dataset(self.table.dataset).model
+
+    def rules(self, now=None):
+        """The rules of the policy, rows kept forever have none"""
+        now = now or timezone.now()
+        field = self.table.category_field
+        rules = []
+        if self.days is not None:
+            others = ~Q(**{f'{field}__in': list(self.categories)}) if self.categories else Q()
+            rules.append(RetentionRule('default', now - datetime.timedelta(days=self.days), others))
+        for category, days in sorted(self.categories.items()):
+            if days is not None:
+                rules.append(RetentionRule(
+                    category, now - datetime.timedelta(days=days), Q(**{field: category})
+                ))
+        return rules
+
+    def expired(self, rule):
+        """Queryset of the rows expired under ``rule``"""
+        return self.model._base_manager.filter(
+            rule.condition, **{f'{self.table.date_field}__lt': rule.cutoff}
+        )
+
+
+def bucket_bounds(value, bucket):
+    """The UTC day or month containing ``value``: (start, end, label)"""
+    if timezone.is_aware(value):
+        value = value.astimezone(datetime.timezone.utc)
+    start = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == 'day':
+        return start, start + datetime.timedelta(days=1), start.strftime('%Y-%m-%d')
+
+    start = start.replace(day=1)
+    if start.month == 12:
+        end = start.replace(year=start.year + 1, month=1)
+    else:
+        end = start.replace(month=start.month + 1)
+    return start, end, start.strftime('%Y-%m')
+
+
+class PruneResult:
+    """What a prune did, per bucket"""
+
+    def __init__(self, table_name):
+        self.table_name = table_name
+        # (rule label, bucket label, rows, archive path or None)
+        self.buckets = []
+
+    def add_bucket(self, rule_label, bucket_label, rows, path=None):
+        self.buckets.append((rule_label, bucket_label, rows, path))
+
+    @property
+    def rows(self):
+        return sum(bucket[2] for bucket in self.buckets)
+
+
+class Pruner:
+    """Archive and delete the expired rows of one table"""
+
+    def __init__(self, policy, archive_dir=None, archive_format=DEFAULT_ARCHIVE_FORMAT,
+                 chunk_size=DEFAULT_CHUNK_SIZE, pause=0.0, compress_level=DEFAULT_COMPRESS_LEVEL):
+        self.policy = policy
+        self.dataset = get_dataset(policy.table.dataset)
+        # archive_dir=None deletes without archiving
+        self.archive_dir = archive_dir
+        self.writer_class = get_writer_class(archive_format)
+        self.chunk_size = chunk_size
+        # Seconds between two DELETE statements, to let other writers through
+        self.pause = pause
+        self.compress_level = compress_level
+
+    def run(self, now=None, dry_run=False):
+        result = PruneResult(self.policy.table_name)
+        for rule in self.policy.rules(now):
+            for start, end, label in self.iter_buckets(rule):
+                rows = self.bucket_rows(rule, start, end)
+                if dry_run:
+                    result.add_bucket(rule.label, label, rows.count())
+                    continue
+                count, path = self.prune_bucket(rows, rule, label)
+                result.add_bucket(rule.label, label, count, path)
+        return result
+
+    def iter_buckets(self, rule):
+        """Buckets holding expired rows, oldest first"""
+        date_field = self.policy.table.date_field
+        expired = self.policy.expired(rule)
+        after = None
+        while True:
+            queryset = expired if after is None else expired.filter(**{f'{date_field}__gte': after})
+            oldest = queryset.order_by(date_field).values_list(date_field, flat=True).first()
+            if oldest is None:
+                return
+            start, end, label = bucket_bounds(oldest, self.policy.bucket)
+            # The bucket of the cutoff is only partly expired
+            yield start, min(end, rule.cutoff), label
+            after = end
+
+    def bucket_rows(self, rule, start, end):
+        date_field = self.policy.table.date_field
+        return self.policy.expired(rule).filter(**{
+            f'{date_field}__gte': start,
+            f'{date_field}__lt': end,
+        })
+
+    def prune_bucket(self, rows, rule, label):
+        """Archive then delete the rows of a bucket, return (count, archive path)"""
+        # Primary key range of each archived chunk, deleted afterwards
+        ranges = []
+        path = None
+        if self.archive_dir is None:
+            ranges.extend(self.iter_pk_ranges(rows))
+        else:
+            path = self.archive_bucket(rows, rule, label, ranges)
+
+        count = 0
+        for index, (first_pk, last_pk) in enumerate(ranges):
+            if index and self.pause:
+                time.sleep(self.pause)
+            count += self.delete_range(rows, first_pk, last_pk)
+        return count, path
+
+    def iter_pk_ranges(self, rows):
+        """First and last primary key of each chunk of rows"""
+        queryset = rows.order_by('pk').values_list('pk', flat=True)
+        last_pk = None
+        while True:
+            page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            pks = list(page[:self.chunk_size])
+            if not pks:
+                return
+            yield pks[0], pks[-1]
+            if len(pks) < self.chunk_size:
+                return
+            last_pk = pks[-1]
+
+    def archive_path(self, rule, label, first_pk):
+        name = f"{label}-{first_pk}.{self.writer_class.extension}"
+        if rule.label != 'default':
+            name = f"{rule.label}-{name}"
+        return os.path.join(self.archive_dir, self.policy.table_name, label[:4], name)
+
+    def archive_bucket(self, rows, rule, label, ranges):
+        path = None
+        partial_path = None
+        fileobj = None
+        writer = None
+        try:
+            for chunk in self.dataset.iter_chunks(self.chunk_size, queryset=rows):
+                if writer is None:
+                    path = self.archive_path(rule, label, chunk[0][0])
+                    partial_path = path + '.part'
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    fileobj = open(partial_path, 'wb')
+                    writer = self.writer_class(fileobj, self.dataset, self.compress_level)
+                writer.write_rows(chunk)
+                ranges.append((chunk[0][0], chunk[-1][0]))
+
+            if writer is not None:
+                writer.close()
+                fileobj.flush()
+                os.fsync(fileobj.fileno())
+                fileobj.close()
+                os.replace(partial_path, path)
+        except BaseException:
+            if fileobj is not None:
+                fileobj.close()
+                os.remove(partial_path)
+            # Nothing is deleted without a complete archive
+            ranges.clear()
+            raise
+        return path
+
+    def delete_range(self, rows, first_pk, last_pk):
+        """Delete the rows of a primary key range in one statement"""
+        chunk = rows.filter(pk__gte=first_pk, pk__lte=last_pk)
+        if self.policy.table_name == 'notifications':
+            return self._delete_notifications(chunk)
+        return chunk.delete()[0]
+
+    @staticmethod
+    def _delete_notifications(chunk):
+        from notifications.services import NotificationService
+
+        # Keeps the cached unread counters of the owners consistent
+        return NotificationService.bulk_delete(chunk)
+
+
+def prune(table_name, dry_run=False, now=None, **options):
+    """Apply the configured retention policy of a table"""
+    options.setdefault('archive_dir', getattr(settings, 'RETENTION_ARCHIVE_DIR', None))
+    pruner = Pruner(RetentionPolicy.from_settings(table_name), **options)
+    return pruner.run(now=now, dry_run=dry_run)
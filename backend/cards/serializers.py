@@ -1,6 +1,7 @@
 from rest_framework import serializers
-from .models import CarteVirtuelle, CardRequest
+from .models import CarteVirtuelle, CardRequest, DocumentUpload
 from users.serializers import UserProfileSerializer
+from backend.media import SignedFileField
 from datetime import date, timedelta
 
 class CarteVirtuelleSerializer(serializers.ModelSerializer):
@@ -14,24 +15,43 @@ class CarteVirtuelleSerializer(serializers.ModelSerializer):
                  'card_category', 'card_name', 'status', 'balance', 'credit_limit']
         read_only_fields = ['id', 'numeroCart', 'cvv2', 'dateExpiration', 'dateCreation', 'card_category']
     
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Load the card owner in the same query, with only the columns displayed"""
+        card_fields = [f.name for f in CarteVirtuelle._meta.concrete_fields]
+        return queryset.select_related('utilisateur').only(
+            *card_fields, 'utilisateur__first_name', 'utilisateur__last_name'
+        )
+    
     def get_masked_numero(self, obj):
         """Return masked card number (only last 4 digits visible)"""
-        if obj.numeroCart:
-            return f"**** **** **** {obj.numeroCart[-4:]}"
-        return "****"
+        return CarteVirtuelle.mask_card_number(obj.numeroCart)
 
 class CardRequestSerializer(serializers.ModelSerializer):
     user_details = serializers.SerializerMethodField()
+    identity_document = SignedFileField(max_length=100, required=False, allow_null=True)
+    income_proof = SignedFileField(max_length=100, required=False, allow_null=True)
+    document_previews = serializers.SerializerMethodField()
     
     class Meta:
         model = CardRequest
         fields = ['id', 'user', 'user_details', 'card_type', 
                  'card_name', 'requested_limit', 'age_verified', 'date_of_birth',
                  'phone_number', 'emergency_contact', 'profession', 'monthly_income',
-                 'identity_document', 'income_proof', 'reason', 'status', 
+                 'identity_document', 'income_proof', 'document_previews', 'reason', 'status', 
                  'created_at', 'reviewed_at', 'reviewed_by', 'admin_comments', 'approved_card']
         read_only_fields = ['id', 'created_at', 'reviewed_at', 'reviewed_by', 'approved_card']
     
+    # User columns shown in user_details
+    USER_DETAIL_FIELDS = ('id', 'first_name', 'last_name', 'email', 'phone_number')
+    
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Load the requesting user in the same query, with only the columns displayed"""
+        request_fields = [f.name for f in CardRequest._meta.concrete_fields]
+        user_fields = [f"user__{name}" for name in CardRequestSerializer.USER_DETAIL_FIELDS]
+        return queryset.select_related('user').only(*request_fields, *user_fields)
+    
     def get_user_details(self, obj):
         """Get user details for display"""
         return {
@@ -42,6 +62,16 @@ class CardRequestSerializer(serializers.ModelSerializer):
             'phone_number': getattr(obj.user, 'phone_number', ''),
         }
     
+    def get_document_previews(self, obj):
+        """Thumbnail and preview URLs of each document, null until generated"""
+        from . import previews
+        
+        http_request = self.context.get('request')
+        return {
+            field: previews.preview_urls(obj, field, http_request)
+            for field in previews.DOCUMENT_FIELDS
+        }
+    
     def validate(self, attrs):
         """Validate card request data"""
         user = self.context['request'].user
@@ -66,14 +96,77 @@ class CardRequestSerializer(serializers.ModelSerializer):
         
         return attrs
 
+class DocumentUploadSerializer(serializers.ModelSerializer):
+    """Chunked document upload, created with its file name and size"""
+    
+    class Meta:
+        model = DocumentUpload
+        fields = ['id', 'filename', 'size', 'status', 'content_type', 'sha256',
+                 'file', 'error', 'created_at', 'completed_at']
+        read_only_fields = ['id', 'status', 'content_type', 'sha256', 'file', 'error',
+                           'created_at', 'completed_at']
+    
+    def validate_filename(self, value):
+        from . import uploads
+        
+        if uploads.stored_name(value) is None:
+            raise serializers.ValidationError("Invalid file name.")
+        return value
+    
+    def validate_size(self, value):
+        from . import uploads
+        
+        if value <= 0:
+            raise serializers.ValidationError("The document is empty.")
+        if value > uploads.max_size():
+            raise serializers.ValidationError(f"Documents are limited to {uploads.max_size()} bytes.")
+        return value
+
+
 class CardRequestCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating card requests with age validation"""
     
+    # Documents sent beforehand through the chunked upload endpoints
+    identity_document_upload = serializers.PrimaryKeyRelatedField(
+        queryset=DocumentUpload.objects.all(), required=False, write_only=True
+    )
+    income_proof_upload = serializers.PrimaryKeyRelatedField(
+        queryset=DocumentUpload.objects.all(), required=False, write_only=True
+    )
+    
+    # Request field set from each upload
+    UPLOAD_FIELDS = {
+        'identity_document_upload': 'identity_document',
+        'income_proof_upload': 'income_proof',
+    }
+    
     class Meta:
         model = CardRequest
         fields = ['card_type', 'card_name', 'requested_limit', 'date_of_birth',
                  'phone_number', 'emergency_contact', 'profession', 'monthly_income',
-                 'identity_document', 'income_proof', 'reason']
+                 'identity_document', 'income_proof', 'identity_document_upload',
+                 'income_proof_upload', 'reason']
+    
+    def get_user(self):
+        """The requesting user, or ``context['user']`` outside a request (bulk import)"""
+        if 'user' in self.context:
+            return self.context['user']
+        return self.context['request'].user
+    
+    def _validate_upload(self, upload):
+        """The upload must belong to the user and be processed"""
+        user = self.get_user()
+        if user is None or upload.user_id != user.pk:
+            raise serializers.ValidationError("Unknown upload.")
+        if upload.status != 'ready':
+            raise serializers.ValidationError(f"The upload is not ready (status: {upload.status}).")
+        return upload
+    
+    def validate_identity_document_upload(self, value):
+        return self._validate_upload(value)
+    
+    def validate_income_proof_upload(self, value):
+        return self._validate_upload(value)
     
     def validate_date_of_birth(self, value):
         """Validate that user is at least 18 years old"""
@@ -108,17 +201,27 @@ class CardRequestCreateSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         """Create card request with age verification"""
+        return super().create(self.get_model_data(validated_data))
+    
+    def get_model_data(self, validated_data):
+        """Field values of the card request to create from ``validated_data``"""
+        validated_data = dict(validated_data)
         date_of_birth = validated_data.get('date_of_birth')
-        user = self.context['request'].user
         
         # Calculate age and set age_verified
         today = date.today()
         age = today.year - date_of_birth.year - ((today.month, today.day) < (date_of_birth.month, date_of_birth.day))
         
         validated_data['age_verified'] = (age >= 18)
-        validated_data['user'] = user
+        validated_data['user'] = self.get_user()
+        
+        # The request points to the stored file of each upload
+        for upload_field, document_field in self.UPLOAD_FIELDS.items():
+            upload = validated_data.pop(upload_field, None)
+            if upload is not None:
+                validated_data[document_field] = upload.file.name
         
-        return super().create(validated_data)
+        return validated_data
 
 class CardApprovalSerializer(serializers.ModelSerializer):
     """Serializer for admin to approve/reject card requests"""
@@ -134,7 +237,11 @@ class CardApprovalSerializer(serializers.ModelSerializer):
         return value
     
     def update(self, instance, validated_data):
-        """Update request and create card if approved"""
+        """Update request and create card if approved.
+        
+        The instance must be locked (``select_for_update``) by the caller,
+        within the transaction, so a card is issued at most once.
+        """
         from django.utils import timezone
         
         instance.status = validated_data.get('status', instance.status)
@@ -143,7 +250,7 @@ class CardApprovalSerializer(serializers.ModelSerializer):
         instance.reviewed_by = self.context['request'].user
         
         # If approved, create the actual card with proper generation
-        if instance.status == 'approved' and not instance.approved_card:
+        if instance.status == 'approved' and instance.approved_card_id is None:
             # Use the new card generation method
             card = CarteVirtuelle.create_from_request(instance, self.context['request'].user)
             instance.approved_card = card
@@ -157,3 +264,24 @@ class CardApprovalSerializer(serializers.ModelSerializer):
         
         instance.save()
         return instance
+
+
+class CardBulkReviewSerializer(serializers.Serializer):
+    """Serializer for admin to approve/reject many card requests at once"""
+    
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False
+    )
+    status = serializers.ChoiceField(choices=['approved', 'rejected'])
+    admin_comments = serializers.CharField(required=False, allow_blank=True, default='')
+    
+    def validate_ids(self, value):
+        """Drop duplicates (keeping the order) and enforce the batch limit"""
+        from django.conf import settings
+        
+        max_ids = getattr(settings, 'CARD_BULK_REVIEW_MAX_IDS', 5000)
+        ids = list(dict.fromkeys(value))
+        if len(ids) > max_ids:
+            raise serializers.ValidationError(f"At most {max_ids} requests can be reviewed at once")
+        return ids
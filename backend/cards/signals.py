@@ -0,0 +1,34 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver, Signal
+from .models import CarteVirtuelle, CardRequest, CardStatistics
+from . import previews
+
+# Sent once by CarteVirtuelle.objects.update_status() with the list of
+# (card_id, old_status, new_status) transitions it applied
+card_status_bulk_changed = Signal()
+
+# Sent once by CardRequest.objects.review() with the reviewed request ids, the
+# new status, the ids of the issued cards and the admin comments
+card_requests_bulk_reviewed = Signal()
+
+
+@receiver(post_delete, sender=CarteVirtuelle)
+def card_deleted_handler(sender, instance, **kwargs):
+    """
+    Remove deleted cards from the statistics, including cascaded deletions
+    """
+    values = {f: instance.__dict__.get(f) for f in CarteVirtuelle.TRACKED_FIELDS}
+    values.update(getattr(instance, '_loaded_values', {}))
+    
+    # The owner may be deleted in the same operation, never recreate its row
+    CardStatistics.record_change(values, None, rebuild_missing=False)
+
+
+@receiver(post_save, sender=CardRequest)
+def card_request_documents_handler(sender, instance, **kwargs):
+    """
+    Generate the previews of new or replaced documents, off the request
+    """
+    if previews.needs_previews(instance):
+        transaction.on_commit(lambda: previews.schedule(instance.pk))
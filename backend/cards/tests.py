@@ -0,0 +1,353 @@
+import json
+import threading
+import tracemalloc
+from io import StringIO
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import views
+from .models import CarteVirtuelle, CardRequest, CardStatistics
+from backend.streaming import STREAM_CHUNK_SIZE
+
+
+class ListQueryCountTests(TestCase):
+    """Card list and stats views run the same number of queries for any number of rows"""
+
+    # Rows seeded before each measurement (within one page)
+    ROW_COUNTS = (2, 16)
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.admin = User.objects.create(
+            username='admin', email='admin@example.com',
+            first_name='Query', last_name='Admin', user_type='admin'
+        )
+        cls.owner = User.objects.create(
+            username='owner', email='owner@example.com',
+            first_name='Query', last_name='Owner'
+        )
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+
+    def get(self, view, user):
+        request = self.factory.get('/')
+        force_authenticate(request, user=user)
+        response = view(request)
+        if response.streaming:
+            # Streamed lists run their queries while being consumed
+            b''.join(response.streaming_content)
+        else:
+            response.render()
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def assertConstantQueries(self, view, user, seed, expected):
+        seeded = 0
+        for rows in self.ROW_COUNTS:
+            seed(rows - seeded)
+            seeded = rows
+            with self.subTest(rows=rows), self.assertNumQueries(expected):
+                self.get(view, user)
+
+    def seed_cards(self, count):
+        CarteVirtuelle.objects.bulk_create([
+            CarteVirtuelle(
+                numeroCart=number,
+                cvv2='123',
+                dateExpiration='2030-01-01',
+                utilisateur=self.owner,
+                card_name='Query check',
+                status='active'
+            )
+            for number in CarteVirtuelle.generate_unique_card_numbers(['personal'] * count)
+        ])
+
+    def seed_requests(self, count):
+        CardRequest.objects.bulk_create([
+            CardRequest(user=self.owner, card_type='personal', card_name='Query check', reason='Query count check')
+            for _ in range(count)
+        ])
+
+    def test_user_cards(self):
+        self.assertConstantQueries(views.UserCardsListView.as_view(), self.owner, self.seed_cards, 2)
+
+    def test_user_card_requests(self):
+        self.assertConstantQueries(views.UserCardRequestsView.as_view(), self.owner, self.seed_requests, 1)
+
+    def test_admin_card_requests(self):
+        self.assertConstantQueries(views.AdminCardRequestsView.as_view(), self.admin, self.seed_requests, 1)
+
+    def test_admin_cards(self):
+        self.assertConstantQueries(views.AdminAllCardsView.as_view(), self.admin, self.seed_cards, 1)
+
+    def test_card_stats(self):
+        # The statistics row is created by the first request
+        self.get(views.card_stats, self.owner)
+        self.assertConstantQueries(views.card_stats, self.owner, self.seed_cards, 2)
+
+    def test_admin_stats(self):
+        self.get(views.admin_stats, self.admin)
+        self.assertConstantQueries(views.admin_stats, self.admin, self.seed_requests, 2)
+
+
+# Unread counters in the cache of the test process
+@override_settings(NOTIFICATION_UNREAD_CACHE='default')
+class CheckListQueriesCommandTests(TestCase):
+    """The query count harness of every app passes"""
+
+    def test_check_list_queries(self):
+        stdout = StringIO()
+        call_command('check_list_queries', stdout=stdout)
+        self.assertNotIn('❌', stdout.getvalue())
+
+
+class StreamingTests(TestCase):
+    """Unpaginated lists are streamed as valid JSON in bounded memory"""
+
+    # Several pages each, small enough for CI
+    SMALL_ROWS = STREAM_CHUNK_SIZE * 2
+    LARGE_ROWS = STREAM_CHUNK_SIZE * 10
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create(
+            username='owner', email='owner@example.com',
+            first_name='Streaming', last_name='Owner'
+        )
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+
+    def request(self, view):
+        request = self.factory.get('/')
+        force_authenticate(request, user=self.owner)
+        response = view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response
+
+    def measure(self, view):
+        """Peak memory while streaming the response, and the number of bytes sent"""
+        tracemalloc.start()
+        try:
+            response = self.request(view)
+            size = 0
+            for chunk in response:
+                size += len(chunk)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak, size
+
+    def seed_cards(self, count):
+        for start in range(0, count, 1000):
+            numbers = CarteVirtuelle.generate_unique_card_numbers(['personal'] * min(1000, count - start))
+            CarteVirtuelle.objects.bulk_create([
+                CarteVirtuelle(
+                    numeroCart=number,
+                    cvv2='123',
+                    dateExpiration='2030-01-01',
+                    utilisateur=self.owner,
+                    card_name='Streaming',
+                    status='active'
+                )
+                for number in numbers
+            ])
+
+    def seed_requests(self, count):
+        CardRequest.objects.bulk_create([
+            CardRequest(user=self.owner, card_type='personal', card_name='Streaming', reason='Streaming test')
+            for _ in range(count)
+        ], batch_size=1000)
+
+    def test_stream_object_is_valid_json(self):
+        self.seed_cards(self.LARGE_ROWS)
+        data = json.loads(b''.join(self.request(views.card_stats)))
+
+        self.assertEqual(data['total_cards'], self.LARGE_ROWS)
+        self.assertEqual(len(data['cards']), self.LARGE_ROWS)
+        card_ids = [card['id'] for card in data['cards']]
+        self.assertEqual(len(set(card_ids)), self.LARGE_ROWS)
+
+    def test_stream_list_is_valid_json(self):
+        self.seed_requests(self.LARGE_ROWS)
+        data = json.loads(b''.join(self.request(views.UserCardRequestsView.as_view())))
+
+        self.assertEqual(len(data), self.LARGE_ROWS)
+        # Newest first, as the paginated lists
+        self.assertEqual([row['id'] for row in data], sorted((row['id'] for row in data), reverse=True))
+
+    def test_empty_stream(self):
+        self.assertEqual(json.loads(b''.join(self.request(views.UserCardRequestsView.as_view()))), [])
+
+    def test_asgi_iteration(self):
+        self.seed_requests(self.SMALL_ROWS)
+        view = views.UserCardRequestsView.as_view()
+
+        async def consume(response):
+            return b''.join([chunk async for chunk in response])
+
+        self.assertEqual(
+            async_to_sync(consume)(self.request(view)),
+            b''.join(self.request(view))
+        )
+
+    def test_peak_memory_does_not_grow_with_rows(self):
+        for label, view, seed in (
+            ('card stats', views.card_stats, self.seed_cards),
+            ('my-requests', views.UserCardRequestsView.as_view(), self.seed_requests),
+        ):
+            with self.subTest(label):
+                seed(self.SMALL_ROWS)
+                small_peak, small_size = self.measure(view)
+                seed(self.LARGE_ROWS - self.SMALL_ROWS)
+                large_peak, large_size = self.measure(view)
+
+                self.assertGreater(large_size, small_size * 4)
+                # Allow for noise, but not for growth with the number of rows
+                self.assertLess(large_peak, small_peak * 2 + 1024 * 1024)
+
+
+@override_settings(NOTIFICATION_UNREAD_CACHE='default')
+class ConcurrentReviewTests(TransactionTestCase):
+    """Concurrent reviews of the same requests issue one card each and keep the statistics right"""
+
+    THREADS = 8
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Concurrent connections to an in-memory SQLite database fail on table locks")
+
+        User = get_user_model()
+        self.admins = [
+            User.objects.create(
+                username=f'admin-{index}', email=f'admin-{index}@example.com',
+                first_name='Review', last_name='Admin', user_type='admin'
+            )
+            for index in range(2)
+        ]
+        self.owner = User.objects.create(
+            username='owner', email='owner@example.com',
+            first_name='Review', last_name='Owner'
+        )
+        self.factory = APIRequestFactory()
+
+    def create_requests(self, count):
+        return [
+            CardRequest.objects.create(
+                user=self.owner, card_type='personal', card_name='Review test',
+                reason='Concurrent review test'
+            ).pk
+            for _ in range(count)
+        ]
+
+    def approve(self, index, request_id, key=None):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        request = self.factory.patch(
+            f'/api/cards/admin/requests/{request_id}/',
+            {'status': 'approved', 'admin_comments': f'Approved by thread {index}'},
+            format='json', **headers
+        )
+        force_authenticate(request, user=self.admins[index % len(self.admins)])
+        return lambda: views.AdminCardRequestDetailView.as_view()(request, pk=request_id)
+
+    def bulk_approve(self, index, request_ids):
+        request = self.factory.post(
+            '/api/cards/admin/requests/review/',
+            {'ids': request_ids, 'status': 'approved', 'admin_comments': f'Bulk approved by thread {index}'},
+            format='json'
+        )
+        force_authenticate(request, user=self.admins[index % len(self.admins)])
+        return lambda: views.bulk_review_card_requests(request)
+
+    def run_concurrently(self, calls):
+        """Start every call at the same time, each on its own connection"""
+        barrier = threading.Barrier(len(calls))
+        responses = [None] * len(calls)
+
+        def run(index, call):
+            try:
+                barrier.wait()
+                responses[index] = call()
+            except Exception as e:
+                responses[index] = e
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(index, call)) for index, call in enumerate(calls)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for response in responses:
+            self.assertEqual(getattr(response, 'status_code', response), 200)
+        return responses
+
+    def assertOneCardPerRequest(self, request_ids):
+        for card_request in CardRequest.objects.filter(pk__in=request_ids):
+            self.assertEqual(card_request.status, 'approved')
+            cards = CarteVirtuelle.objects.filter(cardrequest=card_request)
+            self.assertEqual([card.pk for card in cards], [card_request.approved_card_id])
+        self.assertEqual(CarteVirtuelle.objects.filter(utilisateur=self.owner).count(), len(request_ids))
+
+    def assertStatisticsMatchCards(self):
+        aggregates = CardStatistics.counter_aggregates()
+        for stats, cards in (
+            (CardStatistics.for_user(self.owner), CarteVirtuelle.objects.filter(utilisateur=self.owner)),
+            (CardStatistics.for_system(), CarteVirtuelle.objects.all()),
+        ):
+            with self.subTest(stats=str(stats)):
+                expected = cards.aggregate(**aggregates)
+                self.assertEqual({field: getattr(stats, field) for field in expected}, expected)
+
+    def test_concurrent_detail_and_bulk_approvals(self):
+        request_ids = self.create_requests(4)
+        calls = []
+        for index in range(self.THREADS):
+            if index % 2:
+                calls.append(self.bulk_approve(index, request_ids))
+            else:
+                calls.append(self.approve(index, request_ids[index // 2 % len(request_ids)]))
+        responses = self.run_concurrently(calls)
+
+        self.assertOneCardPerRequest(request_ids)
+        # A request is approved by a single bulk review at most
+        bulk_approvals = [
+            result['id']
+            for response in responses if 'results' in response.data
+            for result in response.data['results'] if result['result'] == 'approved'
+        ]
+        self.assertEqual(len(bulk_approvals), len(set(bulk_approvals)))
+        self.assertStatisticsMatchCards()
+
+    def test_concurrent_approvals_of_one_request(self):
+        request_ids = self.create_requests(1)
+        self.run_concurrently([self.approve(index, request_ids[0]) for index in range(self.THREADS)])
+
+        self.assertOneCardPerRequest(request_ids)
+        self.assertStatisticsMatchCards()
+
+    def test_idempotency_key_replay(self):
+        request_id, = self.create_requests(1)
+        self.assertEqual(self.approve(0, request_id, key='review-key')().status_code, 200)
+        reviewed = CardRequest.objects.get(pk=request_id)
+
+        responses = self.run_concurrently([
+            self.approve(index, request_id, key='review-key') for index in range(1, self.THREADS + 1)
+        ])
+
+        for response in responses:
+            self.assertEqual(response['Idempotent-Replayed'], 'true')
+        card_request = CardRequest.objects.get(pk=request_id)
+        self.assertEqual(card_request.admin_comments, reviewed.admin_comments)
+        self.assertEqual(card_request.reviewed_at, reviewed.reviewed_at)
+        self.assertOneCardPerRequest([request_id])
+        self.assertStatisticsMatchCards()
@@ -0,0 +1,369 @@
+"""
+Resumable, chunked upload of identity and income documents.
+
+A client creates a ``DocumentUpload`` announcing the file name and size, sends
+the file in parts of at most ``DOCUMENT_UPLOAD_CHUNK_SIZE`` bytes (in any
+order, re-sending a part replaces it), then completes the upload:
+
+* each part is streamed from the request body straight to a temporary file
+  under ``DOCUMENT_UPLOAD_TEMP_DIR``, nothing is buffered in memory;
+* completing concatenates the parts in the kernel (``copy_file_range``, or
+  ``sendfile``) and queues the upload for processing;
+* processing runs in a pool of worker processes, off the request: the type is
+  sniffed from the content (PDF, JPEG or PNG), images are decoded, rotated
+  upright, stripped of their metadata and downscaled, and the result is
+  hashed and saved to the media storage.
+
+Card requests then reference the ready upload by id. Uploads are processed
+by the pool of the web process when ``DOCUMENT_PROCESSING_WORKERS`` is set,
+and by ``manage.py process_document_uploads``, which also picks up uploads
+abandoned by a stopped worker.
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the request or a file at a time
+BLOCK_SIZE = 64 * 1024
+
+# Delay after which an upload claimed by a stopped worker is processed again
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+# Leading bytes of the accepted document types
+SIGNATURES = [
+    (b'%PDF-', 'application/pdf', '.pdf'),
+    (b'\xff\xd8\xff', 'image/jpeg', '.jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png', '.png'),
+]
+
+
+class UploadError(Exception):
+    """A part or an upload that cannot be accepted"""
+
+
+class DocumentRejected(Exception):
+    """A document whose content is not accepted"""
+
+
+def max_size():
+    return getattr(settings, 'DOCUMENT_UPLOAD_MAX_SIZE', 10 * 1024 * 1024)
+
+
+def chunk_size():
+    return getattr(settings, 'DOCUMENT_UPLOAD_CHUNK_SIZE', 1024 * 1024)
+
+
+def upload_dir(upload_id):
+    return os.path.join(settings.DOCUMENT_UPLOAD_TEMP_DIR, str(upload_id))
+
+
+def part_path(upload_id, index):
+    return os.path.join(upload_dir(upload_id), f'part-{index:05d}')
+
+
+def assembled_path(upload_id):
+    return os.path.join(upload_dir(upload_id), 'document')
+
+
+def received_parts(upload_id):
+    """Sizes of the parts received so far, by index"""
+    directory = upload_dir(upload_id)
+    if not os.path.isdir(directory):
+        return {}
+    parts = {}
+    for name in os.listdir(directory):
+        if name.startswith('part-') and name[5:].isdigit():
+            parts[int(name[5:])] = os.path.getsize(os.path.join(directory, name))
+    return parts
+
+
+def write_part(upload, index, stream):
+    """Stream one part of ``upload`` from ``stream`` to its temporary file"""
+    if upload.status != 'uploading':
+        raise UploadError("This upload is already complete.")
+    limit = chunk_size()
+    if index < 0 or index * limit >= upload.size:
+        raise UploadError("Part index out of range.")
+
+    path = part_path(upload.pk, index)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial_path = f'{path}.{threading.get_ident()}.tmp'
+    written = 0
+    try:
+        with open(partial_path, 'wb') as part:
+            while True:
+                block = stream.read(BLOCK_SIZE) if stream is not None else b''
+                if not block:
+                    break
+                written += len(block)
+                if written > limit:
+                    raise UploadError(f"Parts are limited to {limit} bytes.")
+                part.write(block)
+        if not written:
+            raise UploadError("Empty part.")
+        # A re-sent part replaces the previous one atomically
+        os.replace(partial_path, path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    return written
+
+
+def _concatenate(source, target):
+    """Append ``source`` to ``target`` (raw files) without copying through Python"""
+    remaining = os.fstat(source.fileno()).st_size
+    try:
+        while remaining:
+            copied = os.copy_file_range(source.fileno(), target.fileno(), remaining)
+            if not copied:
+                break
+            remaining -= copied
+        return
+    except (AttributeError, OSError):
+        # Not supported by the platform or across these file systems
+        pass
+    try:
+        while remaining:
+            offset = source.tell()
+            copied = os.sendfile(target.fileno(), source.fileno(), offset, remaining)
+            if not copied:
+                break
+            source.seek(offset + copied)
+            target.seek(0, os.SEEK_END)
+            remaining -= copied
+        return
+    except (AttributeError, OSError):
+        pass
+    shutil.copyfileobj(source, target, BLOCK_SIZE)
+
+
+def assemble(upload):
+    """Concatenate the parts of an upload in index order, return the assembled size"""
+    parts = received_parts(upload.pk)
+    if not parts:
+        raise UploadError("No part received.")
+    part_count = max(parts) + 1
+    missing = [index for index in range(part_count) if index not in parts]
+    if missing:
+        raise UploadError(f"Missing part(s): {', '.join(map(str, missing))}.")
+    total = sum(parts[index] for index in range(part_count))
+    if total != upload.size:
+        raise UploadError(f"Received {total} bytes in {len(parts)} part(s), expected {upload.size} bytes.")
+
+    path = assembled_path(upload.pk)
+    with open(path, 'wb', buffering=0) as target:
+        for index in range(part_count):
+            with open(part_path(upload.pk, index), 'rb', buffering=0) as source:
+                _concatenate(source, target)
+    for index in range(part_count):
+        os.remove(part_path(upload.pk, index))
+    return total
+
+
+def sniff_content_type(path):
+    """Content type and extension of a document, from its first bytes"""
+    with open(path, 'rb') as document:
+        head = document.read(16)
+    for signature, content_type, extension in SIGNATURES:
+        if head.startswith(signature):
+            return content_type, extension
+    raise DocumentRejected("Unsupported document type: only PDF, JPEG and PNG files are accepted.")
+
+
+def normalize_image(path, content_type):
+    """Decode an image, rotate it upright, drop its metadata and downscale it, in place"""
+    from PIL import Image, ImageOps
+
+    max_dimension = getattr(settings, 'DOCUMENT_IMAGE_MAX_DIMENSION', 3000)
+    with warnings.catch_warnings():
+        # Images of absurd dimensions are rejected instead of decoded
+        warnings.simplefilter('error', Image.DecompressionBombWarning)
+        try:
+            with Image.open(path) as image:
+                image.verify()
+            with Image.open(path) as image:
+                image = ImageOps.exif_transpose(image)
+                image.thumbnail((max_dimension, max_dimension))
+                normalized_path = f'{path}.normalized'
+                if content_type == 'image/jpeg':
+                    if image.mode not in ('RGB', 'L'):
+                        image = image.convert('RGB')
+                    image.save(normalized_path, 'JPEG', quality=90)
+                else:
+                    image.save(normalized_path, 'PNG')
+        except (OSError, SyntaxError, ValueError, Image.DecompressionBombError,
+                Image.DecompressionBombWarning) as e:
+            raise DocumentRejected(f"Invalid image: {e}")
+    os.replace(normalized_path, path)
+
+
+def stored_name(filename):
+    """Name to store a document under, without extension, or None if nothing usable is left"""
+    try:
+        name = get_valid_filename(os.path.basename(filename))
+    except SuspiciousFileOperation:
+        # Names such as "?", "." or "dir/"
+        return None
+    return os.path.splitext(name)[0] or None
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as document:
+        for block in iter(lambda: document.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def claim(upload_id):
+    """Reserve a pending (or abandoned) upload for processing"""
+    from .models import DocumentUpload
+
+    now = timezone.now()
+    pending = DocumentUpload.objects.filter(pk=upload_id, status='pending')
+    abandoned = DocumentUpload.objects.filter(
+        pk=upload_id, status='processing', claimed_at__lt=now - CLAIM_TIMEOUT
+    )
+    return bool((pending | abandoned).update(status='processing', claimed_at=now))
+
+
+def process_upload(upload_id):
+    """Check, normalize, hash and store an assembled upload; return its final status"""
+    from .models import DocumentUpload
+
+    try:
+        if not claim(upload_id):
+            return None
+        upload = DocumentUpload.objects.get(pk=upload_id)
+        path = assembled_path(upload_id)
+        try:
+            if os.path.getsize(path) > max_size():
+                raise DocumentRejected(f"Documents are limited to {max_size()} bytes.")
+            content_type, extension = sniff_content_type(path)
+            if content_type.startswith('image/'):
+                normalize_image(path, content_type)
+
+            upload.content_type = content_type
+            upload.sha256 = file_sha256(path)
+            name = (stored_name(upload.filename) or 'document') + extension
+            with open(path, 'rb') as document:
+                upload.file.save(name, File(document), save=False)
+            upload.status = 'ready'
+        except DocumentRejected as e:
+            upload.status = 'failed'
+            upload.error = str(e)
+
+        upload.completed_at = timezone.now()
+        upload.save(update_fields=['content_type', 'sha256', 'file', 'status', 'error', 'completed_at'])
+        shutil.rmtree(upload_dir(upload_id), ignore_errors=True)
+        return upload.status
+    finally:
+        close_old_connections()
+
+
+def pending_upload_ids(limit=100):
+    """Uploads waiting for a worker, and uploads abandoned by a stopped one"""
+    from .models import DocumentUpload
+
+    stale = timezone.now() - CLAIM_TIMEOUT
+    pending = DocumentUpload.objects.filter(status='pending')
+    abandoned = DocumentUpload.objects.filter(status='processing', claimed_at__lt=stale)
+    return list((pending | abandoned).order_by('id').values_list('id', flat=True)[:limit])
+
+
+def expire_uploads(max_age):
+    """Delete the uploads still incomplete after ``max_age``, with their parts"""
+    from .models import DocumentUpload
+
+    expired = DocumentUpload.objects.filter(
+        status='uploading', created_at__lt=timezone.now() - max_age
+    )
+    upload_ids = list(expired.values_list('id', flat=True))
+    for upload_id in upload_ids:
+        shutil.rmtree(upload_dir(upload_id), ignore_errors=True)
+    DocumentUpload.objects.filter(id__in=upload_ids).delete()
+    return len(upload_ids)
+
+
+def _setup_worker():
+    # Spawned workers start from a fresh interpreter
+    django.setup()
+
+
+def _log_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Document processing failed", exc_info=future.exception())
+
+
+class DocumentProcessingPool:
+    """Process uploads, and other document work, in worker processes"""
+
+    def __init__(self, workers=1):
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_setup_worker
+                )
+            return self._executor
+
+    def run(self, func, *args):
+        """Run ``func(*args)`` (a module-level function) in a worker"""
+        future = self._get_executor().submit(func, *args)
+        future.add_done_callback(_log_failure)
+        return future
+
+    def submit(self, upload_id):
+        return self.run(process_upload, upload_id)
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """The pool of the web process, None when uploads are left to the command"""
+    global _pool
+    workers = getattr(settings, 'DOCUMENT_PROCESSING_WORKERS', 0)
+    if not workers:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = DocumentProcessingPool(workers)
+        return _pool
+
+
+def schedule(upload_id):
+    """Queue an assembled upload for processing (call once committed)"""
+    pool = get_pool()
+    if pool is not None:
+        pool.submit(upload_id)
@@ -16,9 +16,17 @@ urlpatterns = [
     path('request/', views.CardRequestCreateView.as_view(), name='create-card-request'),
     path('my-requests/', views.UserCardRequestsView.as_view(), name='user-card-requests'),
     
+    # Chunked document uploads
+    path('uploads/', views.create_document_upload, name='create-document-upload'),
+    path('uploads/<int:pk>/', views.document_upload_detail, name='document-upload-detail'),
+    path('uploads/<int:pk>/parts/<int:index>/', views.upload_document_part, name='upload-document-part'),
+    path('uploads/<int:pk>/complete/', views.complete_document_upload, name='complete-document-upload'),
+    
     # Admin views
     path('admin/requests/', views.AdminCardRequestsView.as_view(), name='admin-card-requests'),
+    path('admin/requests/review/', views.bulk_review_card_requests, name='admin-bulk-review-card-requests'),
     path('admin/requests/<int:pk>/', views.AdminCardRequestDetailView.as_view(), name='admin-card-request-detail'),
     path('admin/cards/', views.AdminAllCardsView.as_view(), name='admin-all-cards'),
     path('admin/stats/', views.admin_stats, name='admin-card-stats'),
+    path('admin/export/<str:dataset>/', views.admin_export, name='admin-export'),
 ]
@@ -2,14 +2,22 @@ from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from .models import CarteVirtuelle, CardRequest
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from .models import CarteVirtuelle, CardRequest, CardStatistics, DocumentUpload
 from .serializers import (
     CarteVirtuelleSerializer, 
     CardRequestSerializer, 
     CardRequestCreateSerializer,
-    CardApprovalSerializer
+    CardApprovalSerializer,
+    CardBulkReviewSerializer,
+    DocumentUploadSerializer
 )
 from .permissions import IsAdminUser, IsOwnerOrAdmin, IsOwnerOnly
+from backend.pagination import KeysetPagination
+from backend.streaming import SyncStreamingResponse, stream_list, stream_object
+from . import export, uploads
 
 # Vue de test pour l'authentification
 @api_view(['GET'])
@@ -29,7 +37,9 @@ class UserCardsListView(generics.ListAPIView):
     permission_classes = [IsOwnerOrAdmin]
     
     def get_queryset(self):
-        return CarteVirtuelle.objects.filter(utilisateur=self.request.user).exclude(status='expired')
+        return CarteVirtuelleSerializer.setup_eager_loading(
+            CarteVirtuelle.objects.filter(utilisateur=self.request.user).exclude(status='expired')
+        )
 
 class CardDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update or delete a specific card"""
@@ -106,6 +116,64 @@ class CardRequestCreateView(generics.CreateAPIView):
             traceback.print_exc()
             raise
 
+# Chunked document uploads (see cards.uploads)
+def _upload_response(upload, status_code=status.HTTP_200_OK):
+    data = DocumentUploadSerializer(upload).data
+    data['chunk_size'] = uploads.chunk_size()
+    data['parts'] = uploads.received_parts(upload.pk) if upload.status == 'uploading' else {}
+    return Response(data, status=status_code)
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def create_document_upload(request):
+    """Start a chunked upload: announce the file name and size"""
+    serializer = DocumentUploadSerializer(data=request.data)
+    if serializer.is_valid():
+        upload = serializer.save(user=request.user)
+        return _upload_response(upload, status.HTTP_201_CREATED)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def document_upload_detail(request, pk):
+    """Status of an upload, with the parts received so far to resume it"""
+    upload = get_object_or_404(DocumentUpload, pk=pk, user=request.user)
+    return _upload_response(upload)
+
+@api_view(['PUT'])
+@permission_classes([permissions.IsAuthenticated])
+def upload_document_part(request, pk, index):
+    """Receive one part as the raw request body, streamed to a temporary file"""
+    upload = get_object_or_404(DocumentUpload, pk=pk, user=request.user)
+    try:
+        # request.data is never read: the body is not parsed nor buffered
+        size = uploads.write_part(upload, index, request.stream)
+    except uploads.UploadError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'index': index, 'size': size})
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def complete_document_upload(request, pk):
+    """Assemble the parts and queue the document for processing"""
+    with transaction.atomic():
+        upload = get_object_or_404(
+            DocumentUpload.objects.select_for_update(), pk=pk, user=request.user
+        )
+        if upload.status != 'uploading':
+            # Already completed: a retried request gets the current state
+            return _upload_response(upload)
+        try:
+            uploads.assemble(upload)
+        except uploads.UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        upload.status = 'pending'
+        upload.save(update_fields=['status'])
+        transaction.on_commit(lambda: uploads.schedule(upload.pk))
+    
+    return _upload_response(upload, status.HTTP_202_ACCEPTED)
+
 class UserCardRequestsView(generics.ListAPIView):
     """List all card requests for the authenticated user"""
     serializer_class = CardRequestSerializer
@@ -113,13 +181,25 @@ class UserCardRequestsView(generics.ListAPIView):
     pagination_class = None  # Désactiver la pagination
     
     def get_queryset(self):
-        return CardRequest.objects.filter(user=self.request.user).order_by('-created_at')
+        return CardRequestSerializer.setup_eager_loading(
+            CardRequest.objects.filter(user=self.request.user).order_by('-created_at')
+        )
+    
+    def list(self, request, *args, **kwargs):
+        # Unpaginated: stream the rows instead of building the whole list
+        return stream_list(
+            self.filter_queryset(self.get_queryset()),
+            self.get_serializer_class(),
+            context=self.get_serializer_context()
+        )
 
 # Admin Views
 class AdminCardRequestsView(generics.ListAPIView):
     """List all card requests for admin review"""
     serializer_class = CardRequestSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    ordering = ('-created_at', '-id')
     
     def get_queryset(self):
         # Only allow admin users
@@ -128,34 +208,114 @@ class AdminCardRequestsView(generics.ListAPIView):
         
         # Return ALL requests, not just pending ones
         # Frontend will handle filtering
-        return CardRequest.objects.all().order_by('-created_at')
+        return CardRequestSerializer.setup_eager_loading(
+            CardRequest.objects.all()
+        )
 
 class AdminCardRequestDetailView(generics.RetrieveUpdateAPIView):
-    """Admin view to review and approve/reject card requests"""
+    """Admin view to review and approve/reject card requests.
+    
+    A review locks the request row for its whole transaction: concurrent
+    reviews of the same request run one after the other, and each sees the
+    card issued by the previous one. A review sent with an ``Idempotency-Key``
+    header is applied once; a retry with the same key returns the stored
+    review without doing anything.
+    """
     serializer_class = CardApprovalSerializer
     permission_classes = [permissions.IsAuthenticated]
     
+    IDEMPOTENCY_KEY_MAX_LENGTH = CardRequest._meta.get_field('review_idempotency_key').max_length
+    
     def get_queryset(self):
         # Only allow admin users
         if not self.request.user.is_admin:
             return CardRequest.objects.none()
+        if self.request.method in ('PUT', 'PATCH'):
+            # Called within the review transaction (see update)
+            return CardRequest.objects.select_for_update()
         return CardRequest.objects.all()
     
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return CardRequestSerializer
         return CardApprovalSerializer
+    
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop('partial', False)
+        idempotency_key = request.headers.get('Idempotency-Key', '').strip()
+        if len(idempotency_key) > self.IDEMPOTENCY_KEY_MAX_LENGTH:
+            return Response(
+                {'error': f'Idempotency-Key is limited to {self.IDEMPOTENCY_KEY_MAX_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        with transaction.atomic():
+            # Waits for any review of the same request in progress
+            instance = self.get_object()
+            if idempotency_key and instance.review_idempotency_key == idempotency_key:
+                # Retry of an applied review: same result, no new card or notification
+                response = Response(self.get_serializer(instance).data)
+                response['Idempotent-Replayed'] = 'true'
+                return response
+            
+            serializer = self.get_serializer(instance, data=request.data, partial=partial)
+            serializer.is_valid(raise_exception=True)
+            instance.review_idempotency_key = idempotency_key
+            serializer.save()
+        return Response(serializer.data)
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def bulk_review_card_requests(request):
+    """Approve or reject many pending card requests in one transaction.
+    
+    Returns one result per id, in the order received: ``approved`` or
+    ``rejected`` (with the issued card), ``already_reviewed`` (with the
+    current status) or ``not_found``.
+    """
+    serializer = CardBulkReviewSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    ids = serializer.validated_data['ids']
+    decision = serializer.validated_data['status']
+    
+    with transaction.atomic():
+        reviewed = CardRequest.objects.filter(id__in=ids).review(
+            decision,
+            request.user,
+            serializer.validated_data['admin_comments']
+        )
+        results = {
+            card_request.pk: {
+                'id': card_request.pk,
+                'result': decision,
+                'card_id': card_request.approved_card_id
+            }
+            for card_request in reviewed
+        }
+        skipped = CardRequest.objects.filter(
+            id__in=[request_id for request_id in ids if request_id not in results]
+        ).values_list('id', 'status')
+        for request_id, current_status in skipped:
+            results[request_id] = {'id': request_id, 'result': 'already_reviewed', 'status': current_status}
+    
+    results = [results.get(request_id, {'id': request_id, 'result': 'not_found'}) for request_id in ids]
+    counts = {}
+    for result in results:
+        counts[result['result']] = counts.get(result['result'], 0) + 1
+    return Response({'counts': counts, 'results': results})
 
 class AdminAllCardsView(generics.ListAPIView):
     """Admin view to see all cards in the system"""
     serializer_class = CarteVirtuelleSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    ordering = ('-dateCreation', '-id')
     
     def get_queryset(self):
         # Only allow admin users
         if not self.request.user.is_admin:
             return CarteVirtuelle.objects.none()
-        return CarteVirtuelle.objects.all()
+        return CarteVirtuelleSerializer.setup_eager_loading(CarteVirtuelle.objects.all())
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
@@ -163,18 +323,23 @@ def card_stats(request):
     """Get card statistics for user dashboard"""
     user_cards = CarteVirtuelle.objects.filter(utilisateur=request.user).exclude(status='expired')
     
-    total_cards = user_cards.count()
-    active_cards = user_cards.filter(status='active').count()
-    total_balance = sum(float(card.balance) for card in user_cards)
+    # Counters are maintained incrementally, no scan of the cards table
+    stats = CardStatistics.for_user(request.user)
     
-    return Response({
-        'total_cards': total_cards,
-        'active_cards': active_cards,
-        'blocked_cards': user_cards.filter(status='blocked').count(),
-        'pending_cards': user_cards.filter(status='pending').count(),
-        'total_balance': total_balance,
-        'cards': CarteVirtuelleSerializer(user_cards, many=True).data
-    })
+    # The cards list is unbounded: it is streamed after the counters
+    return stream_object(
+        {
+            'total_cards': stats.current_cards,
+            'active_cards': stats.active_cards,
+            'blocked_cards': stats.blocked_cards,
+            'pending_cards': stats.pending_cards,
+            'total_balance': str(stats.current_balance),
+        },
+        'cards',
+        CarteVirtuelleSerializer.setup_eager_loading(user_cards),
+        CarteVirtuelleSerializer,
+        context={'request': request}
+    )
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
@@ -183,15 +348,43 @@ def admin_stats(request):
     if not request.user.is_admin:
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
     
-    all_cards = CarteVirtuelle.objects.all()
-    all_requests = CardRequest.objects.all()
+    card_totals = CardStatistics.for_system()
+    request_totals = CardRequest.objects.aggregate(
+        pending_requests=Count('id', filter=Q(status='pending')),
+        approved_requests=Count('id', filter=Q(status='approved')),
+        rejected_requests=Count('id', filter=Q(status='rejected')),
+    )
     
     return Response({
-        'total_cards': all_cards.count(),
-        'active_cards': all_cards.filter(status='active').count(),
-        'blocked_cards': all_cards.filter(status='blocked').count(),
-        'pending_requests': all_requests.filter(status='pending').count(),
-        'approved_requests': all_requests.filter(status='approved').count(),
-        'rejected_requests': all_requests.filter(status='rejected').count(),
-        'total_balance': sum(float(card.balance) for card in all_cards),
+        'total_cards': card_totals.total_cards,
+        'active_cards': card_totals.active_cards,
+        'blocked_cards': card_totals.blocked_cards,
+        'pending_requests': request_totals['pending_requests'],
+        'approved_requests': request_totals['approved_requests'],
+        'rejected_requests': request_totals['rejected_requests'],
+        'total_balance': str(card_totals.total_balance),
+        'cards_by_category': card_totals.category_counts(),
     })
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def admin_export(request, dataset):
+    """Stream a compressed export of a dataset (admin only)"""
+    if not request.user.is_admin:
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    # Not "format": DRF reserves it for content negotiation
+    export_format = request.query_params.get('export_format', 'csv')
+    try:
+        export.get_dataset(dataset)
+        writer_class = export.get_writer_class(export_format)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    filename = f"{dataset}-{timezone.now():%Y%m%d-%H%M%S}.{writer_class.extension}"
+    response = SyncStreamingResponse(
+        export.iter_export(dataset, export_format),
+        content_type=writer_class.content_type
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
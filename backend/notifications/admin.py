@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Notification, NotificationPreference
+from .services import NotificationService
 
 
 @admin.register(Notification)
@@ -33,12 +34,16 @@ class NotificationAdmin(admin.ModelAdmin):
     )
     
     def mark_as_read(self, request, queryset):
-        updated = queryset.update(is_read=True)
+        updated = NotificationService.bulk_mark_as_read(queryset)
         self.message_user(request, f'{updated} notification(s) marquée(s) comme lue(s).')
     
     mark_as_read.short_description = "Marquer comme lues"
     
     actions = ['mark_as_read']
+    
+    def delete_queryset(self, request, queryset):
+        """Action « supprimer la sélection » : suppression en masse"""
+        NotificationService.bulk_delete(queryset)
 
 
 @admin.register(NotificationPreference)
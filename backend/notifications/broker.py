@@ -0,0 +1,132 @@
+"""
+Pub/sub en mémoire pour les flux de notifications (SSE et long-poll).
+
+``NotificationService`` publie l'identifiant des utilisateurs concernés après
+chaque création ; les abonnés, qui attendent dans la boucle asyncio du
+serveur ASGI, sont réveillés et ne lisent la base que lorsqu'il y a du
+nouveau. Le broker est propre au processus : pour les notifications créées
+par un autre processus (``manage.py run_notification_worker``), un thread
+de surveillance lit les nouvelles notifications toutes les
+``NOTIFICATION_STREAM_POLL_INTERVAL`` secondes, une seule requête pour tous
+les flux ouverts du processus, et uniquement tant qu'il y en a.
+"""
+import asyncio
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationBroker:
+    """Réveille les abonnés d'un utilisateur lorsqu'il reçoit des notifications"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._watcher = None
+
+    def subscribe(self, user_id):
+        """Créer un abonnement ; à utiliser dans une boucle asyncio"""
+        subscription = Subscription(self, user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+            if self._watcher is None:
+                # Démarré au premier abonnement, dans le processus des flux
+                self._watcher = threading.Thread(
+                    target=self._watch, name='notification-watcher', daemon=True
+                )
+                self._watcher.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscribers.get(subscription.user_id)
+            if subscriptions:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscribers[subscription.user_id]
+
+    def has_subscribers(self, user_id):
+        return user_id in self._subscribers
+
+    def publish(self, user_ids):
+        """Réveiller les abonnés des utilisateurs donnés (appelable depuis n'importe quel thread)"""
+        with self._lock:
+            subscriptions = [
+                subscription
+                for user_id in user_ids
+                for subscription in self._subscribers.get(user_id, ())
+            ]
+        for subscription in subscriptions:
+            subscription.notify()
+
+    def _watch(self):
+        """Publier les notifications créées par les autres processus"""
+        from .models import Notification
+        
+        interval = getattr(settings, 'NOTIFICATION_STREAM_POLL_INTERVAL', 1.0)
+        last_id = None
+        while True:
+            time.sleep(interval)
+            if not self._subscribers:
+                # Aucun flux ouvert : aucune requête
+                last_id = None
+                continue
+            try:
+                if last_id is None:
+                    last_id = Notification.objects.order_by('-id').values_list('id', flat=True).first() or 0
+                    continue
+                rows = list(
+                    Notification.objects.filter(id__gt=last_id)
+                    .order_by('id')
+                    .values_list('id', 'user_id')[:1000]
+                )
+                if rows:
+                    last_id = rows[-1][0]
+                    self.publish({user_id for notification_id, user_id in rows})
+            except Exception:
+                logger.exception("Notification watcher error")
+            finally:
+                close_old_connections()
+
+
+class Subscription:
+    """Abonnement d'un client aux notifications d'un utilisateur"""
+
+    def __init__(self, broker, user_id, loop):
+        self.broker = broker
+        self.user_id = user_id
+        self._loop = loop
+        self._event = asyncio.Event()
+
+    def notify(self):
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            # La boucle du client est fermée
+            pass
+
+    async def wait(self, timeout):
+        """Attendre une publication ; retourne False à l'expiration du délai"""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._event.clear()
+        return True
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+broker = NotificationBroker()
@@ -0,0 +1,110 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from notifications.models import Notification
+from notifications.services import NotificationService
+
+
+def legacy_stats(user):
+    """Original implementation: 3 COUNTs plus one COUNT per notification type"""
+    total_count = Notification.objects.filter(user=user).count()
+    unread_count = Notification.objects.filter(user=user, is_read=False).count()
+    important_unread = Notification.objects.filter(
+        user=user, is_read=False, is_important=True
+    ).count()
+    type_counts = {}
+    for type_key, _ in Notification.TYPE_CHOICES:
+        type_counts[type_key] = Notification.objects.filter(
+            user=user, notification_type=type_key, is_read=False
+        ).count()
+    return total_count, unread_count, important_unread, type_counts
+
+
+def aggregated_stats(user):
+    """Single conditional aggregation, as used by notification_stats"""
+    stats = NotificationService.get_notification_stats(user)
+    return stats['total_count'], stats['unread_count'], stats['important_unread'], stats['type_counts']
+
+
+class Command(BaseCommand):
+    help = 'Seed notifications and benchmark notification_stats (legacy vs aggregated)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help='Notifications to seed')
+        parser.add_argument('--users', type=int, default=100, help='Users the rows are spread over')
+        parser.add_argument('--iterations', type=int, default=200, help='Measured calls per implementation')
+        parser.add_argument('--no-seed', action='store_true', help='Reuse previously seeded data')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the benchmark users afterwards')
+
+    def handle(self, *args, **options):
+        users = self.get_users(options['users'])
+        if not options['no_seed']:
+            self.seed(users, options['rows'])
+
+        self.stdout.write("⏱️  notification_stats Benchmark")
+        self.stdout.write("=" * 50)
+
+        if legacy_stats(users[0]) != aggregated_stats(users[0]):
+            self.stderr.write(self.style.ERROR("❌ Implementations disagree!"))
+            return
+
+        for label, func in (("Legacy (8 queries)", legacy_stats), ("Aggregated (1 query)", aggregated_stats)):
+            timings = []
+            for _ in range(options['iterations']):
+                user = random.choice(users)
+                start = time.perf_counter()
+                func(user)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+            self.stdout.write(
+                f"{label:<22} p50 {statistics.median(timings):>8.2f} ms   p99 {p99:>8.2f} ms"
+            )
+
+        if options['cleanup']:
+            get_user_model().objects.filter(pk__in=[u.pk for u in users]).delete()
+            self.stdout.write("🧹 Benchmark data deleted")
+
+    def get_users(self, count):
+        User = get_user_model()
+        users = []
+        for index in range(count):
+            user, _ = User.objects.get_or_create(
+                email=f"bench-notifications-{index}@example.com",
+                defaults={
+                    'username': f"bench-notifications-{index}",
+                    'first_name': 'Bench',
+                    'last_name': str(index),
+                }
+            )
+            users.append(user)
+        return users
+
+    def seed(self, users, rows):
+        self.stdout.write(f"🌱 Seeding {rows:,} notifications...")
+        types = [key for key, _ in Notification.TYPE_CHOICES]
+        categories = [key for key, _ in Notification.CATEGORY_CHOICES]
+        now = timezone.now()
+
+        batch = []
+        for index in range(rows):
+            batch.append(Notification(
+                user_id=users[index % len(users)].pk,
+                title="Benchmark",
+                message="Benchmark notification",
+                notification_type=random.choice(types),
+                category=random.choice(categories),
+                is_read=random.random() < 0.7,
+                is_important=random.random() < 0.1,
+                created_at=now - timedelta(minutes=index),
+            ))
+            if len(batch) >= 10000:
+                Notification.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Notification.objects.bulk_create(batch)
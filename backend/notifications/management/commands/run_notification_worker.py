@@ -0,0 +1,57 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from notifications import outbox
+
+
+class Command(BaseCommand):
+    help = 'Process the notification outbox with a pool of worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=2,
+            help='Number of worker threads',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of events claimed per batch',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds to wait when the outbox is empty',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process every pending event in this process, then exit',
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            processed = outbox.drain(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"✅ Processed {processed} event(s)"))
+            return
+
+        pool = outbox.OutboxWorkerPool(
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            interval=options['interval']
+        )
+
+        stopped = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stopped.set())
+
+        self.stdout.write(f"📬 Notification worker started with {options['workers']} thread(s)")
+        pool.start()
+        stopped.wait()
+
+        self.stdout.write("🛑 Stopping notification worker...")
+        pool.stop()
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('card_request_created', 'Card Request Created'), ('card_request_approved', 'Card Request Approved'), ('card_request_rejected', 'Card Request Rejected'), ('card_created', 'Card Created'), ('card_activated', 'Card Activated'), ('card_deactivated', 'Card Deactivated')], max_length=30)),
+                ('object_id', models.IntegerField()),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'id'], name='notificatio_status_9cf502_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_notification_event'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read', 'notification_type'], name='notificatio_user_id_98fa48_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='notificatio_user_id_427e4b_idx',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_notification_stats_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificationevent',
+            name='event_type',
+            field=models.CharField(choices=[('card_request_created', 'Card Request Created'), ('card_request_approved', 'Card Request Approved'), ('card_request_rejected', 'Card Request Rejected'), ('card_request_batch_imported', 'Card Request Batch Imported'), ('card_created', 'Card Created'), ('card_activated', 'Card Activated'), ('card_deactivated', 'Card Deactivated')], max_length=30),
+        ),
+    ]
@@ -46,7 +46,8 @@ class Notification(models.Model):
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['user', 'is_read']),
+            # Couvre aussi les filtres (user) et (user, is_read)
+            models.Index(fields=['user', 'is_read', 'notification_type']),
             models.Index(fields=['created_at']),
             models.Index(fields=['category']),
         ]
@@ -56,10 +57,18 @@ class Notification(models.Model):
     
     def mark_as_read(self):
         """Marquer la notification comme lue"""
+        from .services import NotificationService
+        
         if not self.is_read:
             self.is_read = True
             self.read_at = timezone.now()
-            self.save()
+            # Un seul UPDATE des deux champs, compté une fois même si une
+            # autre requête marque la notification au même moment
+            updated = Notification.objects.filter(pk=self.pk, is_read=False).update(
+                is_read=True,
+                read_at=self.read_at
+            )
+            NotificationService.adjust_unread_count(self.user_id, -updated)
     
     def get_icon(self):
         """Retourne l'icône appropriée selon le type"""
@@ -109,3 +118,42 @@ class NotificationPreference(models.Model):
     
     def __str__(self):
         return f"Preferences for {self.user.username}"
+
+
+class NotificationEvent(models.Model):
+    """Événement en attente (outbox) transformé en notifications par le worker"""
+    
+    EVENT_TYPE_CHOICES = [
+        ('card_request_created', 'Card Request Created'),
+        ('card_request_approved', 'Card Request Approved'),
+        ('card_request_rejected', 'Card Request Rejected'),
+        ('card_request_batch_imported', 'Card Request Batch Imported'),
+        ('card_created', 'Card Created'),
+        ('card_activated', 'Card Activated'),
+        ('card_deactivated', 'Card Deactivated'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('failed', 'Failed'),
+    ]
+    
+    event_type = models.CharField(max_length=30, choices=EVENT_TYPE_CHOICES)
+    object_id = models.IntegerField()
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} #{self.object_id} ({self.status})"
@@ -0,0 +1,243 @@
+"""
+Outbox des notifications.
+
+Les signaux enregistrent un événement compact dans la même transaction que
+la modification ; un worker (``manage.py run_notification_worker``) les
+traite ensuite par lots via ``NotificationService`` : les notifications d'un
+lot destinées chacune à un utilisateur (approbations et rejets d'une revue
+groupée, cartes créées...) sont enregistrées ensemble par
+``create_notifications``. ``drain()`` permet de tout traiter dans le
+processus courant, sans broker externe.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction, close_old_connections
+from django.utils import timezone
+
+from .models import Notification, NotificationEvent
+from .services import NotificationService
+
+logger = logging.getLogger(__name__)
+
+# Nombre de tentatives avant de marquer un événement comme échoué
+MAX_ATTEMPTS = 5
+
+# Délai après lequel un événement réservé par un worker arrêté est repris
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+
+def enqueue(event_type, object_id, **payload):
+    """Enregistrer un événement dans l'outbox"""
+    event = NotificationEvent.objects.create(
+        event_type=event_type,
+        object_id=object_id,
+        payload=payload
+    )
+    
+    if getattr(settings, 'NOTIFICATION_OUTBOX_EAGER', False):
+        # Traitement dans le processus, une fois la transaction validée
+        transaction.on_commit(lambda: process_events([event.pk]))
+    
+    return event
+
+
+def enqueue_many(event_type, object_ids, **payload):
+    """Enregistrer le même type d'événement pour plusieurs objets en une requête"""
+    events = NotificationEvent.objects.bulk_create([
+        NotificationEvent(event_type=event_type, object_id=object_id, payload=payload)
+        for object_id in object_ids
+    ], batch_size=1000)
+    
+    if getattr(settings, 'NOTIFICATION_OUTBOX_EAGER', False):
+        transaction.on_commit(drain)
+    
+    return len(events)
+
+
+def claim_events(batch_size=100):
+    """Réserver un lot d'événements en attente, sans bloquer les autres workers"""
+    stale = timezone.now() - CLAIM_TIMEOUT
+    
+    with transaction.atomic():
+        pending = NotificationEvent.objects.filter(status='pending')
+        abandoned = NotificationEvent.objects.filter(status='processing', claimed_at__lt=stale)
+        
+        event_ids = list(
+            (pending | abandoned)
+            .select_for_update(skip_locked=True)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if event_ids:
+            NotificationEvent.objects.filter(id__in=event_ids).update(
+                status='processing',
+                claimed_at=timezone.now()
+            )
+    
+    return event_ids
+
+
+def process_events(event_ids):
+    """Transformer des événements en notifications puis les retirer de l'outbox"""
+    events = list(NotificationEvent.objects.filter(id__in=event_ids).order_by('id'))
+    objects = _load_objects(events)
+    
+    processed = []
+    # Une notification par événement : créées ensemble, en un bulk_create
+    batched = []
+    for event in events:
+        instance = objects.get((event.event_type, event.object_id))
+        builder = NOTIFICATION_BUILDERS.get(event.event_type)
+        if builder is not None:
+            if instance is None:
+                processed.append(event.pk)
+            else:
+                batched.append((event, Notification(**builder(instance, event.payload))))
+            continue
+        
+        handler = EVENT_HANDLERS.get(event.event_type)
+        try:
+            if handler and (instance is not None or event.event_type in EVENTS_WITHOUT_OBJECT):
+                handler(instance, event.payload)
+            processed.append(event.pk)
+        except Exception as e:
+            logger.exception("Notification event %s failed", event.pk)
+            _record_failure(event, e)
+    
+    if batched:
+        try:
+            NotificationService.create_notifications([notification for event, notification in batched])
+            processed.extend(event.pk for event, notification in batched)
+        except Exception:
+            logger.exception("Notification batch failed, retrying its events one at a time")
+            # Seuls les événements en échec sont remis en attente
+            for event, notification in batched:
+                try:
+                    NotificationService.create_notifications([notification])
+                    processed.append(event.pk)
+                except Exception as e:
+                    logger.exception("Notification event %s failed", event.pk)
+                    _record_failure(event, e)
+    
+    NotificationEvent.objects.filter(id__in=processed).delete()
+    return len(processed)
+
+
+def _record_failure(event, error):
+    event.attempts += 1
+    event.last_error = str(error)
+    event.status = 'failed' if event.attempts >= MAX_ATTEMPTS else 'pending'
+    event.save(update_fields=['attempts', 'last_error', 'status'])
+
+
+def process_batch(batch_size=100):
+    """Réserver et traiter un lot ; retourne le nombre d'événements traités"""
+    event_ids = claim_events(batch_size)
+    if not event_ids:
+        return 0
+    return process_events(event_ids)
+
+
+def drain(batch_size=100):
+    """Traiter tous les événements en attente dans le processus courant"""
+    total = 0
+    while True:
+        processed = process_batch(batch_size)
+        if not processed and not NotificationEvent.objects.filter(status='pending').exists():
+            return total
+        total += processed
+
+
+class OutboxWorkerPool:
+    """Pool de threads qui vident l'outbox en continu"""
+    
+    def __init__(self, workers=2, batch_size=100, interval=1.0):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.interval = interval
+        self._stop = threading.Event()
+        self._threads = []
+    
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._run,
+                name=f"notification-worker-{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+    
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                processed = process_batch(self.batch_size)
+            except Exception:
+                logger.exception("Notification worker error")
+                processed = 0
+            finally:
+                close_old_connections()
+            
+            if not processed:
+                self._stop.wait(self.interval)
+
+
+def _load_objects(events):
+    """Charger en une requête par modèle les objets référencés par les événements"""
+    from cards.models import CardRequest, CarteVirtuelle
+    
+    request_ids = set()
+    card_ids = set()
+    for event in events:
+        if event.event_type in EVENTS_WITHOUT_OBJECT:
+            continue
+        if event.event_type.startswith('card_request_'):
+            request_ids.add(event.object_id)
+        else:
+            card_ids.add(event.object_id)
+    
+    requests = CardRequest.objects.select_related('user').in_bulk(request_ids)
+    cards = CarteVirtuelle.objects.select_related('utilisateur').in_bulk(card_ids)
+    
+    objects = {}
+    for event in events:
+        if event.event_type in EVENTS_WITHOUT_OBJECT:
+            continue
+        source = requests if event.event_type.startswith('card_request_') else cards
+        objects[(event.event_type, event.object_id)] = source.get(event.object_id)
+    return objects
+
+
+EVENT_HANDLERS = {
+    'card_request_created': lambda request, payload: NotificationService.notify_admin_new_request(request),
+    'card_request_batch_imported': lambda instance, payload: NotificationService.notify_admin_imported_requests(
+        payload['count']
+    ),
+}
+
+# Événements sans objet associé (object_id vaut 0), traités avec leur seul payload
+EVENTS_WITHOUT_OBJECT = {'card_request_batch_imported'}
+
+# Événements donnant une notification à un utilisateur : champs de la notification
+NOTIFICATION_BUILDERS = {
+    'card_request_approved': lambda request, payload: NotificationService.card_approval_notification(
+        request.user, request
+    ),
+    'card_request_rejected': lambda request, payload: NotificationService.card_rejection_notification(
+        request.user, request, payload.get('reason', '')
+    ),
+    'card_created': lambda card, payload: NotificationService.card_creation_notification(card.utilisateur, card),
+    'card_activated': lambda card, payload: NotificationService.card_activation_notification(card.utilisateur, card),
+    'card_deactivated': lambda card, payload: NotificationService.card_deactivation_notification(
+        card.utilisateur, card
+    ),
+}
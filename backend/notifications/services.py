@@ -1,6 +1,11 @@
 from .models import Notification, NotificationPreference
+from .broker import broker
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.exceptions import FieldDoesNotExist
 from django.db import transaction
+from django.db.models import QuerySet, Count, Q
 from django.utils import timezone
 
 User = get_user_model()
@@ -34,13 +39,117 @@ class NotificationService:
                 action_url=action_url,
                 is_important=is_important
             )
+            
+            # Mettre à jour le compteur et réveiller les flux ouverts
+            # une fois la notification visible
+            transaction.on_commit(lambda: NotificationService.adjust_unread_count(user.pk, 1))
+            transaction.on_commit(lambda: broker.publish([user.pk]))
         
         return notification
     
     @staticmethod
-    def notify_card_creation(user, card):
-        """Notification lors de la création d'une carte"""
-        return NotificationService.create_notification(
+    def category_preference_field(category):
+        """Nom du champ de préférence d'une catégorie, ou None si elle n'en a pas"""
+        field_name = f"{category}_enabled"
+        try:
+            NotificationPreference._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            return None
+        return field_name
+    
+    @staticmethod
+    def create_notifications_for_users(users, title, message, notification_type, category,
+                                       related_card_id=None, related_request_id=None,
+                                       action_url=None, is_important=False, batch_size=1000):
+        """Créer la même notification pour un ensemble d'utilisateurs.
+        
+        Les destinataires sont traités par lots : une requête pour les
+        préférences et un ``bulk_create`` par lot. ``users`` peut être un
+        queryset, une liste d'utilisateurs ou une liste d'identifiants.
+        Retourne le nombre de notifications créées.
+        """
+        if isinstance(users, QuerySet):
+            user_ids = users.order_by().values_list('pk', flat=True).iterator(chunk_size=batch_size)
+        else:
+            user_ids = (getattr(user, 'pk', user) for user in users)
+        
+        notifications = (
+            Notification(
+                user_id=user_id,
+                title=title,
+                message=message,
+                notification_type=notification_type,
+                category=category,
+                related_card_id=related_card_id,
+                related_request_id=related_request_id,
+                action_url=action_url,
+                is_important=is_important
+            )
+            for user_id in user_ids
+        )
+        return NotificationService.create_notifications(notifications, batch_size=batch_size)
+    
+    @staticmethod
+    def create_notifications(notifications, batch_size=1000):
+        """Enregistrer des notifications (non sauvegardées) par lots.
+        
+        Les notifications peuvent concerner des utilisateurs et des catégories
+        différents : par lot, une requête de préférences par catégorie et un
+        ``bulk_create``. Les catégories désactivées par l'utilisateur sont
+        ignorées. Retourne le nombre de notifications créées.
+        """
+        now = timezone.now()
+        created_count = 0
+        
+        for chunk in NotificationService._chunks(notifications, batch_size):
+            # Les utilisateurs sans préférences reçoivent toutes les catégories
+            recipients = {}
+            for notification in chunk:
+                recipients.setdefault(notification.category, set()).add(notification.user_id)
+            disabled = set()
+            for category, user_ids in recipients.items():
+                preference_field = NotificationService.category_preference_field(category)
+                if preference_field:
+                    disabled.update(
+                        (category, user_id)
+                        for user_id in NotificationPreference.objects.filter(
+                            user_id__in=user_ids, **{preference_field: False}
+                        ).values_list('user_id', flat=True)
+                    )
+            chunk = [
+                notification for notification in chunk
+                if (notification.category, notification.user_id) not in disabled
+            ]
+            if not chunk:
+                continue
+            
+            for notification in chunk:
+                notification.created_at = now
+            user_ids = list({notification.user_id for notification in chunk})
+            with transaction.atomic():
+                Notification.objects.bulk_create(chunk, batch_size=batch_size)
+                transaction.on_commit(lambda user_ids=user_ids: NotificationService.invalidate_unread_counts(user_ids))
+                transaction.on_commit(lambda user_ids=user_ids: broker.publish(user_ids))
+            created_count += len(chunk)
+        
+        return created_count
+    
+    @staticmethod
+    def _chunks(iterable, size):
+        """Découper un itérable en listes de taille ``size``"""
+        chunk = []
+        for item in iterable:
+            chunk.append(item)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    
+    @staticmethod
+    def card_creation_notification(user, card):
+        """Champs de la notification de création d'une carte"""
+        return dict(
             user=user,
             title="🎉 Nouvelle carte virtuelle créée",
             message=f"Votre carte virtuelle '{card.card_name}' a été créée avec succès.",
@@ -51,9 +160,16 @@ class NotificationService:
         )
     
     @staticmethod
-    def notify_card_approval(user, card):
-        """Notification lors de l'approbation d'une carte"""
+    def notify_card_creation(user, card):
+        """Notification lors de la création d'une carte"""
         return NotificationService.create_notification(
+            **NotificationService.card_creation_notification(user, card)
+        )
+    
+    @staticmethod
+    def card_approval_notification(user, card):
+        """Champs de la notification d'approbation d'une carte"""
+        return dict(
             user=user,
             title="✅ Demande de carte approuvée",
             message=f"Félicitations ! Votre demande pour la carte '{card.card_name}' a été approuvée. Votre carte virtuelle est maintenant active.",
@@ -65,13 +181,20 @@ class NotificationService:
         )
     
     @staticmethod
-    def notify_card_rejection(user, request, reason=""):
-        """Notification lors du rejet d'une carte"""
+    def notify_card_approval(user, card):
+        """Notification lors de l'approbation d'une carte"""
+        return NotificationService.create_notification(
+            **NotificationService.card_approval_notification(user, card)
+        )
+    
+    @staticmethod
+    def card_rejection_notification(user, request, reason=""):
+        """Champs de la notification de rejet d'une carte"""
         message = f"Votre demande pour la carte '{request.card_name}' a été rejetée."
         if reason:
             message += f" Raison: {reason}"
         
-        return NotificationService.create_notification(
+        return dict(
             user=user,
             title="❌ Demande de carte rejetée",
             message=message,
@@ -83,9 +206,16 @@ class NotificationService:
         )
     
     @staticmethod
-    def notify_card_activation(user, card):
-        """Notification lors de l'activation d'une carte"""
+    def notify_card_rejection(user, request, reason=""):
+        """Notification lors du rejet d'une carte"""
         return NotificationService.create_notification(
+            **NotificationService.card_rejection_notification(user, request, reason)
+        )
+    
+    @staticmethod
+    def card_activation_notification(user, card):
+        """Champs de la notification d'activation d'une carte"""
+        return dict(
             user=user,
             title="🟢 Carte activée",
             message=f"Votre carte '{card.card_name}' a été activée avec succès.",
@@ -96,9 +226,16 @@ class NotificationService:
         )
     
     @staticmethod
-    def notify_card_deactivation(user, card):
-        """Notification lors de la désactivation d'une carte"""
+    def notify_card_activation(user, card):
+        """Notification lors de l'activation d'une carte"""
         return NotificationService.create_notification(
+            **NotificationService.card_activation_notification(user, card)
+        )
+    
+    @staticmethod
+    def card_deactivation_notification(user, card):
+        """Champs de la notification de désactivation d'une carte"""
+        return dict(
             user=user,
             title="🔴 Carte désactivée",
             message=f"Votre carte '{card.card_name}' a été désactivée.",
@@ -108,6 +245,13 @@ class NotificationService:
             action_url="/user-dashboard"
         )
     
+    @staticmethod
+    def notify_card_deactivation(user, card):
+        """Notification lors de la désactivation d'une carte"""
+        return NotificationService.create_notification(
+            **NotificationService.card_deactivation_notification(user, card)
+        )
+    
     @staticmethod
     def notify_document_upload(user, document_type):
         """Notification lors du téléchargement de documents"""
@@ -127,22 +271,31 @@ class NotificationService:
         """Notifier les admins d'une nouvelle demande"""
         admins = User.objects.filter(user_type='admin')
         
-        notifications = []
-        for admin in admins:
-            notification = NotificationService.create_notification(
-                user=admin,
-                title="🆕 Nouvelle demande de carte",
-                message=f"Une nouvelle demande de carte '{request.card_name}' a été soumise par {request.user.get_full_name() or request.user.username}.",
-                notification_type="info",
-                category="new_request",
-                related_request_id=request.id,
-                action_url="/card-management",
-                is_important=True
-            )
-            if notification:
-                notifications.append(notification)
+        return NotificationService.create_notifications_for_users(
+            admins,
+            title="🆕 Nouvelle demande de carte",
+            message=f"Une nouvelle demande de carte '{request.card_name}' a été soumise par {request.user.get_full_name() or request.user.username}.",
+            notification_type="info",
+            category="new_request",
+            related_request_id=request.id,
+            action_url="/card-management",
+            is_important=True
+        )
+    
+    @staticmethod
+    def notify_admin_imported_requests(count):
+        """Notifier les admins d'un lot de demandes importées (une notification par lot)"""
+        admins = User.objects.filter(user_type='admin')
         
-        return notifications
+        return NotificationService.create_notifications_for_users(
+            admins,
+            title="🆕 Nouvelles demandes de carte",
+            message=f"{count} nouvelle(s) demande(s) de carte ont été importées.",
+            notification_type="info",
+            category="new_request",
+            action_url="/card-management",
+            is_important=True
+        )
     
     @staticmethod
     def notify_admin_card_action(admin_user, action, card, user):
@@ -176,15 +329,204 @@ class NotificationService:
             action_url="/card-management"
         )
     
+    @staticmethod
+    def notify_system_announcement(title, message, notification_type="info",
+                                   users=None, is_important=False):
+        """Diffuser une annonce système (à tous les utilisateurs actifs par défaut)"""
+        if users is None:
+            users = User.objects.filter(is_active=True)
+        
+        return NotificationService.create_notifications_for_users(
+            users,
+            title=title,
+            message=message,
+            notification_type=notification_type,
+            category="system",
+            is_important=is_important
+        )
+    
+    @staticmethod
+    def get_notification_stats(user):
+        """Totaux, non lues, importantes non lues et non lues par type en une seule requête.
+        
+        Agrégation conditionnelle servie par l'index (user, is_read, notification_type).
+        """
+        unread = Q(is_read=False)
+        type_aggregates = {
+            f"unread_{type_key}": Count('id', filter=unread & Q(notification_type=type_key))
+            for type_key, _ in Notification.TYPE_CHOICES
+        }
+        counts = Notification.objects.filter(user=user).aggregate(
+            total_count=Count('id'),
+            unread_count=Count('id', filter=unread),
+            important_unread=Count('id', filter=unread & Q(is_important=True)),
+            **type_aggregates
+        )
+        
+        return {
+            'total_count': counts['total_count'],
+            'unread_count': counts['unread_count'],
+            'important_unread': counts['important_unread'],
+            'type_counts': {
+                type_key: counts[f"unread_{type_key}"]
+                for type_key, _ in Notification.TYPE_CHOICES
+            },
+        }
+    
+    # Compteur de notifications non lues, mis en cache par utilisateur.
+    # Le COUNT en base reste la référence : il est refait à l'expiration
+    # de l'entrée ou lorsqu'elle a été invalidée. Le cache doit être partagé
+    # avec le worker de l'outbox, qui invalide les compteurs des destinataires
+    # depuis un autre processus (voir NOTIFICATION_UNREAD_CACHE).
+    
+    @staticmethod
+    def _unread_cache():
+        return caches[getattr(settings, 'NOTIFICATION_UNREAD_CACHE', 'default')]
+    
+    @staticmethod
+    def unread_cache_key(user_id):
+        return f"notifications:unread:{user_id}"
+    
     @staticmethod
     def get_unread_count(user):
         """Obtenir le nombre de notifications non lues"""
-        return Notification.objects.filter(user=user, is_read=False).count()
+        cache = NotificationService._unread_cache()
+        key = NotificationService.unread_cache_key(user.pk)
+        
+        count = cache.get(key)
+        if count is None:
+            count = NotificationService.refresh_unread_count(user)
+        return count
+    
+    @staticmethod
+    def refresh_unread_count(user):
+        """Recalculer le compteur depuis la base et le remettre en cache"""
+        count = Notification.objects.filter(user=user, is_read=False).count()
+        NotificationService.set_unread_count(user.pk, count)
+        return count
+    
+    @staticmethod
+    def set_unread_count(user_id, count):
+        NotificationService._unread_cache().set(
+            NotificationService.unread_cache_key(user_id),
+            count,
+            getattr(settings, 'NOTIFICATION_UNREAD_CACHE_TIMEOUT', 300)
+        )
+    
+    @staticmethod
+    def adjust_unread_count(user_id, delta):
+        """Incrémenter ou décrémenter le compteur s'il est en cache"""
+        if not delta:
+            return
+        cache = NotificationService._unread_cache()
+        key = NotificationService.unread_cache_key(user_id)
+        try:
+            count = cache.incr(key, delta)
+        except ValueError:
+            # Pas en cache : il sera recalculé à la prochaine lecture
+            return
+        if count < 0:
+            cache.delete(key)
+    
+    @staticmethod
+    def invalidate_unread_counts(user_ids):
+        NotificationService._unread_cache().delete_many(
+            [NotificationService.unread_cache_key(user_id) for user_id in user_ids]
+        )
     
     @staticmethod
     def mark_all_as_read(user):
         """Marquer toutes les notifications comme lues"""
-        return Notification.objects.filter(user=user, is_read=False).update(
-            is_read=True,
-            read_at=timezone.now()
-        )
+        return NotificationService.bulk_mark_as_read(Notification.objects.filter(user=user))
+    
+    # Opérations en masse : un UPDATE ou DELETE par tranche d'identifiants,
+    # sans charger d'instances ni passer par le collecteur de suppression.
+    # Le nombre retourné est celui des lignes réellement modifiées, et les
+    # compteurs de non lues en cache sont ajustés une fois la tranche validée.
+    
+    BULK_CHUNK_SIZE = 1000
+    
+    @staticmethod
+    def _lock_chunk(queryset, after_id, chunk_size, *fields):
+        """Verrouiller la tranche suivante du queryset (à appeler dans une transaction)
+        
+        Retourne au plus ``chunk_size`` tuples ``(pk, *fields)`` d'identifiant
+        supérieur à ``after_id``, par identifiant croissant.
+        """
+        rows = queryset.order_by('pk').values_list('pk', *fields)
+        if after_id is not None:
+            rows = rows.filter(pk__gt=after_id)
+        return list(rows.select_for_update()[:chunk_size])
+    
+    @staticmethod
+    def _update_unread_counts(user_ids, read_count):
+        """Après validation : ``read_count`` notifications non lues de ``user_ids`` ont disparu"""
+        if not read_count:
+            return
+        if len(user_ids) == 1:
+            # Un seul destinataire : le décompte exact suffit
+            NotificationService.adjust_unread_count(next(iter(user_ids)), -read_count)
+        else:
+            NotificationService.invalidate_unread_counts(user_ids)
+    
+    @staticmethod
+    def bulk_mark_as_read(queryset, chunk_size=None):
+        """Marquer comme lues les notifications du queryset, retourne le nombre modifié
+        
+        Deux requêtes par tranche : la lecture des identifiants et un UPDATE.
+        """
+        chunk_size = chunk_size or NotificationService.BULK_CHUNK_SIZE
+        now = timezone.now()
+        updated_count = 0
+        
+        unread = queryset.filter(is_read=False)
+        last_id = None
+        while True:
+            with transaction.atomic():
+                chunk = NotificationService._lock_chunk(unread, last_id, chunk_size, 'user_id')
+                if not chunk:
+                    break
+                user_ids = {user_id for pk, user_id in chunk}
+                count = Notification.objects.filter(
+                    pk__in=[pk for pk, user_id in chunk]
+                ).update(is_read=True, read_at=now)
+                transaction.on_commit(
+                    lambda user_ids=user_ids, count=count: NotificationService._update_unread_counts(user_ids, count)
+                )
+            updated_count += count
+            if len(chunk) < chunk_size:
+                break
+            last_id = chunk[-1][0]
+        
+        return updated_count
+    
+    @staticmethod
+    def bulk_delete(queryset, chunk_size=None):
+        """Supprimer les notifications du queryset, retourne le nombre supprimé
+        
+        Deux requêtes par tranche : la lecture des identifiants et un DELETE.
+        Aucun modèle ne dépend d'une notification et aucun signal de
+        suppression n'est connecté : ``delete()`` n'exécute qu'un DELETE.
+        """
+        chunk_size = chunk_size or NotificationService.BULK_CHUNK_SIZE
+        deleted_count = 0
+        
+        last_id = None
+        while True:
+            with transaction.atomic():
+                chunk = NotificationService._lock_chunk(queryset, last_id, chunk_size, 'user_id', 'is_read')
+                if not chunk:
+                    break
+                # Lignes verrouillées : le nombre de non lues reste exact
+                unread_user_ids = {user_id for pk, user_id, is_read in chunk if not is_read}
+                unread_count = sum(1 for pk, user_id, is_read in chunk if not is_read)
+                count, _ = Notification.objects.filter(pk__in=[row[0] for row in chunk]).delete()
+                transaction.on_commit(
+                    lambda user_ids=unread_user_ids, count=unread_count: NotificationService._update_unread_counts(user_ids, count)
+                )
+            deleted_count += count
+            if len(chunk) < chunk_size:
+                break
+            last_id = chunk[-1][0]
+        
+        return deleted_count
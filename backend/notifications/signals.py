@@ -1,56 +1,85 @@
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from cards.models import CardRequest, CarteVirtuelle
-from .services import NotificationService
+from cards.signals import card_requests_bulk_reviewed, card_status_bulk_changed
+from . import outbox
 
 
-@receiver(post_save, sender=CardRequest)
-def handle_card_request_created(sender, instance, created, **kwargs):
-    """Signal lors de la création d'une nouvelle demande de carte"""
-    if created:
-        # Notifier les administrateurs
-        NotificationService.notify_admin_new_request(instance)
+# Statuts de carte déclenchant une notification lorsqu'ils sont atteints
+CARD_STATUS_EVENTS = {
+    'active': 'card_activated',
+    'blocked': 'card_deactivated',
+}
 
 
 @receiver(pre_save, sender=CardRequest)
 def handle_card_request_status_change(sender, instance, **kwargs):
     """Signal lors du changement de statut d'une demande"""
-    if instance.pk:  # Si l'instance existe déjà
-        try:
-            old_instance = CardRequest.objects.get(pk=instance.pk)
-            
-            # Si le statut a changé
-            if old_instance.status != instance.status:
-                if instance.status == 'approved':
-                    NotificationService.notify_card_approval(instance.user, instance)
-                elif instance.status == 'rejected':
-                    reason = getattr(instance, 'admin_comments', '')
-                    NotificationService.notify_card_rejection(instance.user, instance, reason)
-        
-        except CardRequest.DoesNotExist:
-            pass
+    instance._notification_event = None
 
+    # Comparaison avec le statut chargé, sans requête supplémentaire
+    if instance.has_changed('status'):
+        if instance.status == 'approved':
+            instance._notification_event = ('card_request_approved', {})
+        elif instance.status == 'rejected':
+            reason = getattr(instance, 'admin_comments', '')
+            instance._notification_event = ('card_request_rejected', {'reason': reason})
 
-@receiver(post_save, sender=CarteVirtuelle)
-def handle_card_created(sender, instance, created, **kwargs):
-    """Signal lors de la création d'une carte virtuelle"""
+
+@receiver(post_save, sender=CardRequest)
+def handle_card_request_saved(sender, instance, created, **kwargs):
+    """Signal après l'enregistrement d'une demande : mise en file des notifications"""
     if created:
-        NotificationService.notify_card_creation(instance.utilisateur, instance)
+        # Notifier les administrateurs
+        outbox.enqueue('card_request_created', instance.pk)
+
+    event = getattr(instance, '_notification_event', None)
+    if event:
+        event_type, payload = event
+        outbox.enqueue(event_type, instance.pk, **payload)
+        instance._notification_event = None
 
 
 @receiver(pre_save, sender=CarteVirtuelle)
 def handle_card_status_change(sender, instance, **kwargs):
     """Signal lors du changement de statut d'une carte"""
-    if instance.pk:  # Si l'instance existe déjà
-        try:
-            old_instance = CarteVirtuelle.objects.get(pk=instance.pk)
-            
-            # Si le statut a changé
-            if old_instance.status != instance.status:
-                if instance.status == 'active' and old_instance.status != 'active':
-                    NotificationService.notify_card_activation(instance.utilisateur, instance)
-                elif instance.status == 'blocked' and old_instance.status != 'blocked':
-                    NotificationService.notify_card_deactivation(instance.utilisateur, instance)
-        
-        except CarteVirtuelle.DoesNotExist:
-            pass
+    instance._notification_event = None
+
+    # Comparaison avec le statut chargé, sans requête supplémentaire
+    if instance.has_changed('status'):
+        instance._notification_event = CARD_STATUS_EVENTS.get(instance.status)
+
+
+@receiver(post_save, sender=CarteVirtuelle)
+def handle_card_saved(sender, instance, created, **kwargs):
+    """Signal après l'enregistrement d'une carte : mise en file des notifications"""
+    if created:
+        outbox.enqueue('card_created', instance.pk)
+
+    event_type = getattr(instance, '_notification_event', None)
+    if event_type:
+        outbox.enqueue(event_type, instance.pk)
+        instance._notification_event = None
+
+
+@receiver(card_status_bulk_changed, sender=CarteVirtuelle)
+def handle_card_status_bulk_change(sender, transitions, **kwargs):
+    """Signal lors d'un changement de statut en masse : un lot d'événements"""
+    card_ids_by_event = {}
+    for card_id, old_status, new_status in transitions:
+        event_type = CARD_STATUS_EVENTS.get(new_status)
+        if event_type:
+            card_ids_by_event.setdefault(event_type, []).append(card_id)
+
+    for event_type, card_ids in card_ids_by_event.items():
+        outbox.enqueue_many(event_type, card_ids)
+
+
+@receiver(card_requests_bulk_reviewed, sender=CardRequest)
+def handle_card_requests_bulk_review(sender, status, request_ids, card_ids, admin_comments='', **kwargs):
+    """Signal lors d'une revue en masse : un lot d'événements par type"""
+    if status == 'approved':
+        outbox.enqueue_many('card_request_approved', request_ids)
+        outbox.enqueue_many('card_created', card_ids)
+    elif status == 'rejected':
+        outbox.enqueue_many('card_request_rejected', request_ids, reason=admin_comments)
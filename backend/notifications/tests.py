@@ -0,0 +1,88 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import views
+from .management.commands.benchmark_notification_stats import aggregated_stats, legacy_stats
+from .models import Notification
+
+
+# Compteurs de non lues dans le cache du processus de test, vidé à chaque test
+@override_settings(NOTIFICATION_UNREAD_CACHE='default')
+class NotificationQueryCountTests(TestCase):
+    """Nombre de requêtes des vues de notifications, quel que soit le nombre de lignes"""
+
+    # Lignes créées avant chaque mesure (dans une seule page)
+    ROW_COUNTS = (2, 16)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create(
+            username='owner', email='owner@example.com',
+            first_name='Query', last_name='Owner'
+        )
+
+    def setUp(self):
+        caches['default'].clear()
+        self.factory = APIRequestFactory()
+
+    def get(self, view, user):
+        request = self.factory.get('/')
+        force_authenticate(request, user=user)
+        response = view(request)
+        response.render()
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def assertConstantQueries(self, view, expected):
+        # Premier appel : remplit le compteur de non lues en cache
+        self.get(view, self.owner)
+        seeded = 0
+        for rows in self.ROW_COUNTS:
+            self.seed_notifications(rows - seeded)
+            seeded = rows
+            with self.subTest(rows=rows), self.assertNumQueries(expected):
+                self.get(view, self.owner)
+
+    def seed_notifications(self, count):
+        types = [key for key, _ in Notification.TYPE_CHOICES]
+        Notification.objects.bulk_create([
+            Notification(
+                user=self.owner, title='Query check', message='Query check',
+                notification_type=types[index % len(types)], category='system',
+                is_read=index % 3 == 0, is_important=index % 5 == 0
+            )
+            for index in range(count)
+        ])
+
+    def test_list(self):
+        self.assertConstantQueries(views.UserNotificationsView.as_view(), 2)
+
+    def test_recent(self):
+        self.assertConstantQueries(views.recent_notifications, 1)
+
+    def test_stats(self):
+        self.assertConstantQueries(views.notification_stats, 1)
+
+    def test_stats_match_legacy_counts(self):
+        self.seed_notifications(40)
+        self.assertEqual(aggregated_stats(self.owner), legacy_stats(self.owner))
+
+
+@override_settings(NOTIFICATION_UNREAD_CACHE='default')
+class BenchmarkNotificationStatsTests(TestCase):
+    """Le benchmark tourne sur un petit jeu de données"""
+
+    def test_benchmark(self):
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            'benchmark_notification_stats', rows=200, users=2, iterations=5, cleanup=True,
+            stdout=stdout, stderr=stderr
+        )
+        self.assertEqual(stderr.getvalue(), '')
+        self.assertIn('Aggregated (1 query)', stdout.getvalue())
+        self.assertFalse(Notification.objects.exists())
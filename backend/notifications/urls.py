@@ -7,6 +7,9 @@ urlpatterns = [
     path('stats/', views.notification_stats, name='notification-stats'),
     path('recent/', views.recent_notifications, name='recent-notifications'),
     path('polling/', views.notification_polling, name='notification-polling'),
+    path('stream/', views.notification_stream, name='notification-stream'),
+    path('stream/ticket/', views.stream_ticket, name='notification-stream-ticket'),
+    path('long-poll/', views.notification_long_poll, name='notification-long-poll'),
     
     # Actions sur les notifications
     path('mark-read/', views.mark_notifications_read, name='mark-notifications-read'),
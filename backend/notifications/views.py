@@ -1,9 +1,20 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models import Q
 from django.utils import timezone
+from users.authentication import get_token_user
 from .models import Notification, NotificationPreference
 from .serializers import (
     NotificationSerializer, 
@@ -11,6 +22,7 @@ from .serializers import (
     NotificationMarkReadSerializer
 )
 from .services import NotificationService
+from .broker import broker
 
 
 class NotificationPagination(PageNumberPagination):
@@ -56,27 +68,17 @@ def notification_stats(request):
     """Statistiques des notifications de l'utilisateur"""
     user = request.user
     
-    total_count = Notification.objects.filter(user=user).count()
-    unread_count = Notification.objects.filter(user=user, is_read=False).count()
-    important_unread = Notification.objects.filter(
-        user=user, is_read=False, is_important=True
-    ).count()
-    
-    # Notifications par type
-    type_counts = {}
-    for choice in Notification.TYPE_CHOICES:
-        type_key = choice[0]
-        count = Notification.objects.filter(
-            user=user, notification_type=type_key, is_read=False
-        ).count()
-        type_counts[type_key] = count
+    stats = NotificationService.get_notification_stats(user)
+    
+    # Le compte exact rafraîchit le compteur en cache
+    NotificationService.set_unread_count(user.pk, stats['unread_count'])
     
     return Response({
-        'total_count': total_count,
-        'unread_count': unread_count,
-        'important_unread': important_unread,
-        'type_counts': type_counts,
-        'has_notifications': unread_count > 0
+        'total_count': stats['total_count'],
+        'unread_count': stats['unread_count'],
+        'important_unread': stats['important_unread'],
+        'type_counts': stats['type_counts'],
+        'has_notifications': stats['unread_count'] > 0
     })
 
 
@@ -92,11 +94,9 @@ def mark_notifications_read(request):
         
         if notification_ids:
             # Marquer des notifications spécifiques
-            updated_count = Notification.objects.filter(
-                id__in=notification_ids,
-                user=user,
-                is_read=False
-            ).update(is_read=True, read_at=timezone.now())
+            updated_count = NotificationService.bulk_mark_as_read(
+                Notification.objects.filter(id__in=notification_ids, user=user)
+            )
         else:
             # Marquer toutes les notifications comme lues
             updated_count = NotificationService.mark_all_as_read(user)
@@ -113,29 +113,27 @@ def mark_notifications_read(request):
 @permission_classes([permissions.IsAuthenticated])
 def delete_notification(request, notification_id):
     """Supprimer une notification"""
-    try:
-        notification = Notification.objects.get(
-            id=notification_id,
-            user=request.user
-        )
-        notification.delete()
-        
-        return Response({
-            'message': 'Notification supprimée avec succès'
-        })
+    deleted_count = NotificationService.bulk_delete(
+        Notification.objects.filter(id=notification_id, user=request.user)
+    )
     
-    except Notification.DoesNotExist:
+    if not deleted_count:
         return Response({
             'error': 'Notification non trouvée'
         }, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response({
+        'message': 'Notification supprimée avec succès'
+    })
 
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def clear_all_notifications(request):
     """Supprimer toutes les notifications de l'utilisateur"""
-    deleted_count = Notification.objects.filter(user=request.user).count()
-    Notification.objects.filter(user=request.user).delete()
+    deleted_count = NotificationService.bulk_delete(
+        Notification.objects.filter(user=request.user)
+    )
     
     return Response({
         'message': f'{deleted_count} notification(s) supprimée(s)',
@@ -162,17 +160,18 @@ def recent_notifications(request):
     user = request.user
     limit = int(request.query_params.get('limit', 10))
     
-    notifications = Notification.objects.filter(
+    # Une ligne de plus pour savoir s'il en reste, sans COUNT
+    notifications = list(Notification.objects.filter(
         user=user
-    ).order_by('-created_at')[:limit]
+    ).order_by('-created_at')[:limit + 1])
     
-    serializer = NotificationSerializer(notifications, many=True)
+    serializer = NotificationSerializer(notifications[:limit], many=True)
     unread_count = NotificationService.get_unread_count(user)
     
     return Response({
         'notifications': serializer.data,
         'unread_count': unread_count,
-        'has_more': Notification.objects.filter(user=user).count() > limit
+        'has_more': len(notifications) > limit
     })
 
 
@@ -202,3 +201,189 @@ def notification_polling(request):
         'total_unread': NotificationService.get_unread_count(user),
         'timestamp': timezone.now().isoformat()
     })
+
+
+# Flux temps réel : le SSE n'est servi que sous ASGI ; le long-poll répond
+# aussi sous WSGI, en occupant un thread pendant l'attente
+
+# Durée maximale d'un flux SSE avant reconnexion du client
+STREAM_MAX_DURATION = 300
+
+# Intervalle des commentaires keepalive du flux SSE
+STREAM_HEARTBEAT = 15
+
+# Délai d'attente maximal d'un long-poll
+LONG_POLL_MAX_TIMEOUT = 60
+
+# Nombre maximal de notifications par envoi
+STREAM_BATCH_SIZE = 50
+
+STREAM_TICKET_SALT = 'notifications.stream'
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def stream_ticket(request):
+    """Ticket de courte durée pour ouvrir un flux SSE.
+    
+    EventSource ne peut pas envoyer d'en-tête Authorization : le ticket,
+    passé dans l'URL du flux, évite d'y exposer le jeton lui-même.
+    """
+    ticket = signing.TimestampSigner(salt=STREAM_TICKET_SALT).sign(str(request.user.pk))
+    return Response({
+        'ticket': ticket,
+        'expires_in': settings.NOTIFICATION_STREAM_TICKET_MAX_AGE,
+        # Sans ASGI le client reste sur le polling
+        'streaming': _served_over_asgi(request._request)
+    })
+
+
+def _served_over_asgi(request):
+    """Un serveur WSGI mettrait tout le flux en mémoire tampon avant de l'envoyer"""
+    return isinstance(request, ASGIRequest)
+
+
+def _ticket_user(ticket):
+    try:
+        user_id = signing.TimestampSigner(salt=STREAM_TICKET_SALT).unsign(
+            ticket, max_age=settings.NOTIFICATION_STREAM_TICKET_MAX_AGE
+        )
+    except signing.BadSignature:
+        # Aussi levée lorsque le ticket a expiré
+        return None
+    return get_user_model().objects.filter(pk=user_id).first()
+
+
+@sync_to_async
+def _authenticate(request):
+    """Authentifier par jeton (en-tête Authorization) ou par ticket de flux (EventSource)"""
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Token '):
+        # Même cache que l'authentification DRF
+        user = get_token_user(header[6:].strip())
+    elif request.GET.get('ticket'):
+        user = _ticket_user(request.GET['ticket'])
+    else:
+        return None
+    
+    if user is None or not user.is_active:
+        return None
+    return user
+
+
+def _parse_cursor(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@sync_to_async
+def _latest_notification_id(user):
+    return Notification.objects.filter(user=user).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+@sync_to_async
+def _notifications_since(user, cursor):
+    """Notifications postérieures au curseur (les plus récentes en premier) et nouveau curseur"""
+    notifications = list(
+        Notification.objects.filter(user=user, id__gt=cursor).order_by('id')[:STREAM_BATCH_SIZE]
+    )
+    if not notifications:
+        return None
+    
+    return {
+        'notifications': NotificationSerializer(reversed(notifications), many=True).data,
+        'unread_count': NotificationService.get_unread_count(user),
+        'cursor': notifications[-1].id,
+        'has_more': len(notifications) == STREAM_BATCH_SIZE,
+    }
+
+
+def _sse_message(batch):
+    data = json.dumps(batch, cls=DjangoJSONEncoder)
+    return f"id: {batch['cursor']}\nevent: notifications\ndata: {data}\n\n"
+
+
+async def _notification_events(user, cursor):
+    """Générateur SSE : aucune requête tant que l'utilisateur ne reçoit rien"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + STREAM_MAX_DURATION
+    
+    with broker.subscribe(user.pk) as subscription:
+        # Un curseur fourni (reconnexion) peut avoir manqué des notifications
+        check = cursor is not None
+        if cursor is None:
+            cursor = await _latest_notification_id(user)
+        
+        yield f"retry: 3000\nid: {cursor}\n\n"
+        
+        while True:
+            while check:
+                batch = await _notifications_since(user, cursor)
+                if batch is None:
+                    break
+                cursor = batch['cursor']
+                yield _sse_message(batch)
+                check = batch['has_more']
+            
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            
+            check = await subscription.wait(min(STREAM_HEARTBEAT, remaining))
+            if not check:
+                yield ": keepalive\n\n"
+
+
+async def notification_stream(request):
+    """Flux Server-Sent Events des nouvelles notifications.
+    
+    Le client reprend sans perte grâce à l'en-tête Last-Event-ID (ou au
+    paramètre cursor), qui contient l'identifiant de la dernière notification reçue.
+    """
+    if not _served_over_asgi(request):
+        # Réponse immédiate : le client passe au polling au lieu d'attendre la fin du flux
+        return JsonResponse({'detail': 'Flux disponible uniquement sous ASGI'}, status=503)
+    
+    user = await _authenticate(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentification requise'}, status=401)
+    
+    cursor = _parse_cursor(request.headers.get('Last-Event-ID') or request.GET.get('cursor'))
+    
+    response = StreamingHttpResponse(
+        _notification_events(user, cursor),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def notification_long_poll(request):
+    """Long-poll : répond dès qu'une notification arrive après le curseur, ou au bout du délai"""
+    user = await _authenticate(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentification requise'}, status=401)
+    
+    cursor = _parse_cursor(request.GET.get('cursor'))
+    try:
+        timeout = min(float(request.GET.get('timeout', 25)), LONG_POLL_MAX_TIMEOUT)
+    except ValueError:
+        timeout = 25
+    
+    with broker.subscribe(user.pk) as subscription:
+        batch = None
+        if cursor is None:
+            cursor = await _latest_notification_id(user)
+        else:
+            batch = await _notifications_since(user, cursor)
+        
+        if batch is None and await subscription.wait(timeout):
+            batch = await _notifications_since(user, cursor)
+    
+    if batch is None:
+        batch = {'notifications': [], 'cursor': cursor, 'has_more': False}
+    
+    return JsonResponse(batch)
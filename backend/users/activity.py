@@ -0,0 +1,130 @@
+"""
+Buffered user activity logging.
+
+Activities are recorded once the surrounding transaction commits and are
+kept in a per-process buffer. A background thread writes them with a single
+``bulk_create`` when ``USER_ACTIVITY_BUFFER_SIZE`` activities are waiting or
+every ``USER_ACTIVITY_FLUSH_INTERVAL`` seconds, and the buffer is flushed
+when the worker process exits. Activities therefore appear in the activity
+lists with a delay of at most the flush interval.
+
+With ``USER_ACTIVITY_BUFFER_SIZE = 0`` each activity is written as soon as
+its transaction commits.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction, close_old_connections, IntegrityError
+
+from .models import UserActivity
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityBuffer:
+    """Activities waiting to be written, flushed by size and by age"""
+
+    def __init__(self, max_size=100, flush_interval=2.0):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self._activities = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def add(self, activity):
+        if not self.max_size:
+            self._write([activity])
+            return
+
+        with self._lock:
+            self._activities.append(activity)
+            size = len(self._activities)
+        self._start_flusher()
+
+        if size >= self.max_size * 10:
+            # The flusher is not keeping up: write from this thread
+            self.flush()
+        elif size >= self.max_size:
+            self._wake.set()
+
+    def flush(self):
+        """Write every buffered activity, return how many were written"""
+        with self._flush_lock:
+            with self._lock:
+                activities, self._activities = self._activities, []
+            if activities:
+                self._write(activities)
+            return len(activities)
+
+    def _write(self, activities):
+        try:
+            with transaction.atomic():
+                UserActivity.objects.bulk_create(activities)
+            return
+        except IntegrityError:
+            # e.g. a user deleted meanwhile: keep the other activities
+            pass
+        except Exception:
+            logger.exception("Could not write %d user activities", len(activities))
+            return
+
+        for activity in activities:
+            try:
+                with transaction.atomic():
+                    UserActivity.objects.bulk_create([activity])
+            except IntegrityError:
+                logger.warning("Dropped activity %s of missing user %s", activity.activity_type, activity.user_id)
+
+    def _start_flusher(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='activity-flusher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("User activity flush failed")
+            finally:
+                # This thread has its own database connection
+                close_old_connections()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """The process-wide activity buffer"""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = ActivityBuffer(
+                max_size=getattr(settings, 'USER_ACTIVITY_BUFFER_SIZE', 100),
+                flush_interval=getattr(settings, 'USER_ACTIVITY_FLUSH_INTERVAL', 2.0)
+            )
+            # Nothing buffered is lost when the worker shuts down
+            atexit.register(_buffer.flush)
+        return _buffer
+
+
+def record_activity(user, activity_type, description='', ip_address=None, user_agent=''):
+    """Record an activity once the current transaction commits"""
+    activity = UserActivity(
+        user_id=user.pk,
+        activity_type=activity_type,
+        description=description,
+        ip_address=ip_address,
+        user_agent=user_agent
+    )
+    transaction.on_commit(lambda: get_buffer().add(activity))
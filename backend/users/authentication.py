@@ -0,0 +1,180 @@
+"""
+Token authentication with a cache of token -> user lookups.
+
+DRF's ``TokenAuthentication`` runs one ``SELECT`` (token joined to its user)
+per request. ``CachedTokenAuthentication`` keeps the result in a bounded LRU
+with a TTL, in-process by default, or in the Django cache named by
+``AUTH_TOKEN_CACHE`` so that all worker processes share it.
+
+Entries are invalidated by signals (see ``users.signals``) when a token is
+deleted (logout, password change) and when its user is deleted or saved with
+a change to one of its ``TRACKED_FIELDS``, the fields authentication and
+permissions depend on (e.g. an admin changing the user status). Other fields
+of a cached user, such as its name, may be stale until the entry expires.
+The in-process LRU is only invalidated in the process making the change;
+other processes drop their entry when it expires, after at most
+``AUTH_TOKEN_CACHE_TIMEOUT`` seconds. Deployments with several worker
+processes should use a shared cache.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class LRUCache:
+    """Thread-safe bounded mapping whose entries expire after ``timeout`` seconds"""
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TokenCache:
+    """Cache of the user of each token key, with hit/miss counters"""
+
+    KEY_PREFIX = 'auth-token:'
+
+    def __init__(self, cache_alias=None, max_size=10000, timeout=60):
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+        self._local = None if cache_alias else LRUCache(max_size, timeout)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            cache_alias=getattr(settings, 'AUTH_TOKEN_CACHE', None),
+            max_size=getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 10000),
+            timeout=getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', 60)
+        )
+
+    def _cache_key(self, key):
+        return self.KEY_PREFIX + key
+
+    def get(self, key):
+        """Return a private copy of the cached user of ``key``, or None"""
+        if self._local is not None:
+            user = self._local.get(key)
+            # Each request gets its own instance, the cached one is never mutated
+            user = copy.copy(user) if user is not None else None
+        else:
+            user = caches[self.cache_alias].get(self._cache_key(key))
+
+        with self._lock:
+            if user is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return user
+
+    def set(self, key, user):
+        if self._local is not None:
+            self._local.set(key, copy.copy(user))
+        else:
+            caches[self.cache_alias].set(self._cache_key(key), user, self.timeout)
+
+    def invalidate_token(self, key):
+        if self._local is not None:
+            self._local.delete(key)
+        else:
+            caches[self.cache_alias].delete(self._cache_key(key))
+        with self._lock:
+            self.invalidations += 1
+
+    def invalidate_user(self, user_id):
+        """Drop the entry of the token of a user (one token per user); return its key"""
+        key = Token.objects.filter(user_id=user_id).values_list('key', flat=True).first()
+        if key is not None:
+            self.invalidate_token(key)
+        return key
+
+    def clear(self):
+        if self._local is not None:
+            self._local.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': self.cache_alias or 'local',
+                'size': len(self._local) if self._local is not None else None,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'evictions': self._local.evictions if self._local is not None else None,
+            }
+
+
+token_cache = TokenCache.from_settings()
+
+
+def get_token_user(key):
+    """Return the user of a token key, or None; served from the cache when possible"""
+    user = token_cache.get(key)
+    if user is None:
+        token = Token.objects.select_related('user').filter(key=key).first()
+        if token is None:
+            return None
+        user = token.user
+        token_cache.set(key, user)
+    return user
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """``TokenAuthentication`` served from ``token_cache``"""
+
+    def authenticate_credentials(self, key):
+        user = get_token_user(key)
+        if user is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        # request.auth stays a Token, built without a query
+        return (user, Token(key=key, user=user))
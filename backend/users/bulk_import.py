@@ -0,0 +1,193 @@
+"""
+Bulk CSV import of users.
+
+The CSV is read in chunks. Each row is validated with the registration
+serializer rules; invalid rows are reported with their line number and do
+not stop the import. Valid rows of a chunk are inserted with ``bulk_create``
+in one transaction, along with their activity log entry and API token, and
+their passwords are hashed in a process pool.
+"""
+import csv
+from itertools import islice
+
+from django.db import transaction, IntegrityError
+from rest_framework.authtoken.models import Token
+from rest_framework.validators import UniqueValidator
+
+from .hashing import PasswordHasherPool
+from .models import CustomUser, UserActivity
+from .serializers import UserRegistrationSerializer
+
+
+class ImportResult:
+    """Number of rows created and errors of the rows that were rejected"""
+
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, line, errors):
+        self.errors.append((line, errors))
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+
+def iter_csv_chunks(fileobj, chunk_size):
+    """Yield lists of ``(line number, row)`` read from a CSV with a header row"""
+    reader = csv.DictReader(fileobj)
+
+    def rows():
+        for row in reader:
+            # Empty cells fall back to the field defaults
+            yield reader.line_num, {
+                key.strip(): value.strip()
+                for key, value in row.items()
+                if key and value not in ('', None)
+            }
+
+    iterator = rows()
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            break
+        yield chunk
+
+
+def format_errors(errors):
+    """Flatten serializer errors into one line"""
+    if isinstance(errors, dict):
+        return '; '.join(
+            f"{field}: {format_errors(messages)}" if field != 'non_field_errors' else format_errors(messages)
+            for field, messages in errors.items()
+        )
+    if isinstance(errors, (list, tuple)):
+        return ' '.join(format_errors(message) for message in errors)
+    return str(errors)
+
+
+def bulk_insert(model, objects, lines, result):
+    """Insert objects in bulk, or one by one to report the rows that fail"""
+    try:
+        with transaction.atomic():
+            created = model.objects.bulk_create(objects)
+        return created
+    except IntegrityError:
+        pass
+
+    created = []
+    for obj, line in zip(objects, lines):
+        try:
+            with transaction.atomic():
+                created.extend(model.objects.bulk_create([obj]))
+        except IntegrityError as e:
+            result.add_error(line, {'non_field_errors': [str(e)]})
+    return created
+
+
+class UserImportSerializer(UserRegistrationSerializer):
+    """Registration rules, with uniqueness checked once per chunk"""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for name in ('email', 'username'):
+            fields[name].validators = [
+                validator for validator in fields[name].validators
+                if not isinstance(validator, UniqueValidator)
+            ]
+        return fields
+
+    def to_internal_value(self, data):
+        # Imported rows give the password once
+        if 'password' in data and 'password_confirm' not in data:
+            data = dict(data, password_confirm=data['password'])
+        return super().to_internal_value(data)
+
+
+def import_users(fileobj, chunk_size=500, workers=None, dry_run=False):
+    """Import users from a CSV file object, return an ``ImportResult``"""
+    result = ImportResult()
+
+    with PasswordHasherPool(workers) as hasher:
+        for chunk in iter_csv_chunks(fileobj, chunk_size):
+            valid = _validate_users(chunk, result)
+            if not valid or dry_run:
+                result.created += len(valid)
+                continue
+
+            lines = [line for line, data in valid]
+            passwords = hasher.hash_many(data.pop('password') for line, data in valid)
+            users = [
+                CustomUser(password=password, **data)
+                for (line, data), password in zip(valid, passwords)
+            ]
+
+            with transaction.atomic():
+                users = bulk_insert(CustomUser, users, lines, result)
+                _create_user_extras(users)
+            result.created += len(users)
+
+    return result
+
+
+def _validate_users(chunk, result):
+    """Validate a chunk of rows, return ``(line, validated data)`` of the valid ones"""
+    valid = []
+    for line, row in chunk:
+        serializer = UserImportSerializer(data=row)
+        if not serializer.is_valid():
+            result.add_error(line, serializer.errors)
+            continue
+
+        data = serializer.validated_data
+        data.pop('password_confirm')
+        # Same normalization as create_user()
+        data['email'] = CustomUser.objects.normalize_email(data['email'])
+        data['username'] = CustomUser.normalize_username(data['username'])
+        valid.append((line, data))
+
+    # Uniqueness against the database and the rest of the chunk, in one query
+    emails = {data['email'] for line, data in valid}
+    usernames = {data['username'] for line, data in valid}
+    taken_emails = set(CustomUser.objects.filter(email__in=emails).values_list('email', flat=True))
+    taken_usernames = set(CustomUser.objects.filter(username__in=usernames).values_list('username', flat=True))
+
+    unique = []
+    for line, data in valid:
+        errors = {}
+        if data['email'] in taken_emails:
+            errors['email'] = ['user with this email already exists.']
+        if data['username'] in taken_usernames:
+            errors['username'] = ['A user with that username already exists.']
+        if errors:
+            result.add_error(line, errors)
+            continue
+        taken_emails.add(data['email'])
+        taken_usernames.add(data['username'])
+        unique.append((line, data))
+    return unique
+
+
+def _create_user_extras(users):
+    """Activity log entries and tokens of users created in bulk (no signals)"""
+    if not users:
+        return
+
+    if any(user.pk is None for user in users):
+        # Databases without RETURNING (MySQL) do not set the ids
+        ids = dict(CustomUser.objects.filter(
+            email__in=[user.email for user in users]
+        ).values_list('email', 'id'))
+        for user in users:
+            user.pk = ids[user.email]
+
+    # Same entry as the user_created_handler signal
+    UserActivity.objects.bulk_create([
+        UserActivity(user=user, activity_type='login', description='User account created')
+        for user in users
+    ])
+    Token.objects.bulk_create([
+        Token(user=user, key=Token.generate_key())
+        for user in users
+    ])
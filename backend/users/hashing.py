@@ -0,0 +1,216 @@
+"""
+Password hashing in a pool of worker processes.
+
+Password hashers are deliberately slow (hundreds of milliseconds per
+password) and hold the GIL, so hashing and checking run in worker processes
+instead of the request thread. Workers are spawned rather than forked so that
+they never share the parent's open database connections.
+
+``CustomUser.set_password`` and ``check_password`` use the process-wide pool
+returned by ``get_pool()``, sized by ``PASSWORD_HASHING_WORKERS``. At most
+``PASSWORD_HASHING_MAX_PENDING`` hashes are queued at once; callers beyond
+that wait, so a login storm queues up instead of piling up in the workers.
+Each pool keeps metrics of its hash times and queue depth.
+"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+def _setup_worker():
+    # Spawned workers start from a fresh interpreter
+    django.setup()
+
+
+def _timed_make_password(password):
+    start = time.perf_counter()
+    encoded = hashers.make_password(password)
+    return encoded, time.perf_counter() - start
+
+
+def _timed_verify_password(password, encoded):
+    start = time.perf_counter()
+    result = hashers.verify_password(password, encoded)
+    return result, time.perf_counter() - start
+
+
+class HashingMetrics:
+    """Counters of a hashing pool, for the current process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hashes = 0
+            self.checks = 0
+            self.rehashes = 0
+            self.pending = 0
+            self.max_pending = 0
+            self.hash_time = 0.0
+            self.max_hash_time = 0.0
+            self.wait_time = 0.0
+
+    def task_queued(self):
+        with self._lock:
+            self.pending += 1
+            self.max_pending = max(self.max_pending, self.pending)
+
+    def task_done(self, kind, hash_time, total_time):
+        with self._lock:
+            self.pending -= 1
+            if kind == 'check':
+                self.checks += 1
+            else:
+                self.hashes += 1
+            self.hash_time += hash_time
+            self.max_hash_time = max(self.max_hash_time, hash_time)
+            # Time spent queued and in transit, not hashing
+            self.wait_time += max(total_time - hash_time, 0.0)
+
+    def record_rehash(self):
+        with self._lock:
+            self.rehashes += 1
+
+    def snapshot(self):
+        with self._lock:
+            tasks = self.hashes + self.checks
+            return {
+                'hashes': self.hashes,
+                'checks': self.checks,
+                'rehashes': self.rehashes,
+                'queue_depth': self.pending,
+                'max_queue_depth': self.max_pending,
+                'avg_hash_ms': round(self.hash_time / tasks * 1000, 2) if tasks else 0.0,
+                'max_hash_ms': round(self.max_hash_time * 1000, 2),
+                'avg_wait_ms': round(self.wait_time / tasks * 1000, 2) if tasks else 0.0,
+            }
+
+
+class PasswordHasherPool:
+    """Hash and check passwords in worker processes"""
+
+    def __init__(self, workers=None, max_pending=None):
+        # workers=0 hashes in the current process (e.g. on a single CPU)
+        self.workers = workers
+        self.max_pending = max_pending
+        self.metrics = HashingMetrics()
+        self._slots = threading.BoundedSemaphore(max_pending) if max_pending else None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def inline(self):
+        return self.workers == 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_setup_worker
+                )
+            return self._executor
+
+    def _run(self, kind, func, *args):
+        start = time.perf_counter()
+        hash_time = 0.0
+        self.metrics.task_queued()
+        try:
+            if self.inline:
+                result, hash_time = func(*args)
+            else:
+                if self._slots:
+                    self._slots.acquire()
+                try:
+                    result, hash_time = self._get_executor().submit(func, *args).result()
+                finally:
+                    if self._slots:
+                        self._slots.release()
+            return result
+        finally:
+            self.metrics.task_done(kind, hash_time, time.perf_counter() - start)
+
+    def hash(self, password):
+        """Return the encoded hash of ``password``"""
+        if password is None:
+            # Unusable password: no hashing involved
+            return hashers.make_password(None)
+        return self._run('hash', _timed_make_password, password)
+
+    def verify(self, password, encoded):
+        """Return ``(is_correct, must_update)`` like Django's ``verify_password``"""
+        return self._run('check', _timed_verify_password, password, encoded)
+
+    def hash_many(self, passwords):
+        """Return the hashes of ``passwords``, in the same order"""
+        passwords = list(passwords)
+        if self.inline or len(passwords) < 2:
+            return [self.hash(password) for password in passwords]
+
+        futures = []
+        for password in passwords:
+            # Same bound on queued hashes as hash() and verify()
+            if self._slots:
+                self._slots.acquire()
+            start = time.perf_counter()
+            self.metrics.task_queued()
+            try:
+                future = self._get_executor().submit(_timed_make_password, password)
+            except BaseException:
+                self._task_finished(start)
+                raise
+            future.add_done_callback(lambda future, start=start: self._task_finished(start, future))
+            futures.append(future)
+        return [future.result()[0] for future in futures]
+
+    def _task_finished(self, start, future=None):
+        hash_time = 0.0
+        if future is not None and not future.cancelled() and future.exception() is None:
+            hash_time = future.result()[1]
+        self.metrics.task_done('hash', hash_time, time.perf_counter() - start)
+        if self._slots:
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """The process-wide pool used by the user model"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PasswordHasherPool(
+                workers=getattr(settings, 'PASSWORD_HASHING_WORKERS', 0),
+                max_pending=getattr(settings, 'PASSWORD_HASHING_MAX_PENDING', None)
+            )
+        return _pool
+
+
+def hash_password(password):
+    return get_pool().hash(password)
+
+
+def verify_password(password, encoded):
+    return get_pool().verify(password, encoded)
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.bulk_import import import_users, format_errors
+
+
+class Command(BaseCommand):
+    help = (
+        'Import users from a CSV file with the columns email, username, first_name, '
+        'last_name, password and optionally phone_number, user_type, status'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of rows validated and inserted per batch',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Number of password hashing processes (default: one per CPU, 0: no pool)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only validate the rows',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"📥 Importing users from {options['path']}...")
+
+        start = time.perf_counter()
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as fileobj:
+                result = import_users(
+                    fileobj,
+                    chunk_size=options['chunk_size'],
+                    workers=options['workers'],
+                    dry_run=options['dry_run']
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - start
+
+        for line, errors in sorted(result.errors, key=lambda error: error[0]):
+            self.stdout.write(self.style.ERROR(f"❌ line {line}: {format_errors(errors)}"))
+
+        action = 'validated' if options['dry_run'] else 'imported'
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {result.created} user(s) {action}, {result.failed} row(s) rejected in {elapsed:.2f}s"
+        ))
@@ -1,8 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
+from backend.tracking import TrackedFieldsModel
+from . import hashing
 
-class CustomUser(AbstractUser):
+class CustomUser(TrackedFieldsModel, AbstractUser):
     """
     Custom User model extending Django's AbstractUser
     """
@@ -31,6 +33,10 @@ class CustomUser(AbstractUser):
     total_cards = models.IntegerField(default=0)
     total_balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     
+    # Fields read when authenticating a request: saving a change to one of
+    # them invalidates the cached user of the token (users.signals)
+    TRACKED_FIELDS = ('password', 'is_active', 'is_superuser', 'user_type', 'status')
+    
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
     
@@ -38,6 +44,10 @@ class CustomUser(AbstractUser):
         db_table = 'custom_users'
         verbose_name = 'User'
         verbose_name_plural = 'Users'
+        indexes = [
+            # Keyset pagination of the admin user list
+            models.Index(fields=['date_created', 'id']),
+        ]
     
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.email})"
@@ -50,10 +60,31 @@ class CustomUser(AbstractUser):
     def is_admin(self):
         return self.user_type == 'admin' or self.is_superuser
     
+    def set_password(self, raw_password):
+        """Hash the password in the shared hashing pool"""
+        self.password = hashing.hash_password(raw_password)
+        self._password = raw_password
+    
+    def check_password(self, raw_password):
+        """
+        Check the password in the shared hashing pool, rehashing it when
+        the hasher or its iteration count changed
+        """
+        is_correct, must_update = hashing.verify_password(raw_password, self.password)
+        if is_correct and must_update:
+            self.set_password(raw_password)
+            # Password hash upgrades shouldn't be considered password changes
+            self._password = None
+            self.save(update_fields=['password'])
+            hashing.get_pool().metrics.record_rehash()
+        return is_correct
+    
     def update_card_stats(self):
-        """Update user's card statistics"""
-        # This will be implemented when we create the Cards model
-        pass
+        """Recompute user's card statistics from the cards table"""
+        from cards.models import CardStatistics
+        
+        CardStatistics.rebuild(user_ids=[self.pk])
+        self.refresh_from_db(fields=['total_cards', 'total_balance'])
 
 class UserActivity(models.Model):
     """
@@ -78,6 +109,11 @@ class UserActivity(models.Model):
     class Meta:
         db_table = 'user_activities'
         ordering = ['-timestamp']
+        indexes = [
+            # Keyset pagination of all activities and of one user's activities
+            models.Index(fields=['timestamp', 'id']),
+            models.Index(fields=['user', 'timestamp', 'id']),
+        ]
         verbose_name = 'User Activity'
         verbose_name_plural = 'User Activities'
     
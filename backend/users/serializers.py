@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from .models import CustomUser, UserActivity
+from backend.media import SignedImageField
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     """
@@ -27,10 +28,8 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data.pop('password_confirm')
         password = validated_data.pop('password')
-        user = CustomUser.objects.create_user(**validated_data)
-        user.set_password(password)
-        user.save()
-        return user
+        # Hashed once, in the same INSERT
+        return CustomUser.objects.create_user(password=password, **validated_data)
 
 class UserLoginSerializer(serializers.Serializer):
     """
@@ -59,6 +58,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
     """
     Serializer for user profile information
     """
+    profile_picture = SignedImageField(max_length=100, required=False, allow_null=True)
     full_name = serializers.ReadOnlyField()
     is_admin = serializers.ReadOnlyField()
     
@@ -74,6 +74,7 @@ class AdminUserSerializer(serializers.ModelSerializer):
     """
     Serializer for admin user management (full access)
     """
+    profile_picture = SignedImageField(max_length=100, required=False, allow_null=True)
     full_name = serializers.ReadOnlyField()
     
     class Meta:
@@ -94,6 +95,14 @@ class UserActivitySerializer(serializers.ModelSerializer):
         fields = ('id', 'user', 'user_email', 'user_name', 'activity_type', 
                  'description', 'ip_address', 'timestamp')
         read_only_fields = ('id', 'timestamp')
+    
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Load the user in the same query, with only the columns displayed"""
+        return queryset.select_related('user').only(
+            'id', 'user', 'activity_type', 'description', 'ip_address', 'timestamp',
+            'user__email', 'user__first_name', 'user__last_name'
+        )
 
 class PasswordChangeSerializer(serializers.Serializer):
     """
@@ -1,7 +1,11 @@
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.signals import user_logged_in, user_logged_out
-from .models import CustomUser, UserActivity
+from rest_framework.authtoken.models import Token
+from .activity import record_activity
+from .authentication import token_cache
+from .models import CustomUser
 
 @receiver(post_save, sender=CustomUser)
 def user_created_handler(sender, instance, created, **kwargs):
@@ -9,11 +13,27 @@ def user_created_handler(sender, instance, created, **kwargs):
     Handle user creation activities
     """
     if created:
-        UserActivity.objects.create(
-            user=instance,
-            activity_type='login',
-            description='User account created'
-        )
+        record_activity(instance, 'login', 'User account created')
+
+@receiver(post_save, sender=CustomUser)
+def user_saved_token_cache_handler(sender, instance, created, **kwargs):
+    """
+    Drop the cached user of the token when an authentication field changed
+    """
+    if created or not any(instance.has_changed(field) for field in CustomUser.TRACKED_FIELDS):
+        return
+    key = token_cache.invalidate_user(instance.pk)
+    if key is not None:
+        # Again once committed, in case a request cached the old row meanwhile
+        transaction.on_commit(lambda: token_cache.invalidate_token(key))
+
+@receiver(post_delete, sender=Token)
+def token_deleted_handler(sender, instance, **kwargs):
+    """
+    Drop a deleted token (logout, password change, user deletion) from the cache
+    """
+    token_cache.invalidate_token(instance.key)
+    transaction.on_commit(lambda: token_cache.invalidate_token(instance.key))
 
 @receiver(user_logged_in)
 def user_logged_in_handler(sender, request, user, **kwargs):
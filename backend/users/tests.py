@@ -0,0 +1,79 @@
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import views
+from .models import CustomUser, UserActivity
+
+
+class ListQueryCountTests(TestCase):
+    """User list and dashboard views run the same number of queries for any number of rows"""
+
+    # Rows seeded before each measurement (within one page)
+    ROW_COUNTS = (2, 16)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(
+            username='admin', email='admin@example.com',
+            first_name='Query', last_name='Admin', user_type='admin'
+        )
+        cls.owner = CustomUser.objects.create(
+            username='owner', email='owner@example.com',
+            first_name='Query', last_name='Owner'
+        )
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+
+    def get(self, view, user):
+        request = self.factory.get('/')
+        force_authenticate(request, user=user)
+        response = view(request)
+        if response.streaming:
+            # Streamed lists run their queries while being consumed
+            b''.join(response.streaming_content)
+        else:
+            response.render()
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def assertConstantQueries(self, view, user, seed, expected):
+        seeded = 0
+        for rows in self.ROW_COUNTS:
+            seed(rows - seeded)
+            seeded = rows
+            with self.subTest(rows=rows), self.assertNumQueries(expected):
+                self.get(view, user)
+
+    def seed_users(self, count):
+        start = CustomUser.objects.filter(username__startswith='extra-').count()
+        CustomUser.objects.bulk_create([
+            CustomUser(
+                username=f'extra-{index}',
+                email=f'extra-{index}@example.com',
+                first_name='Query',
+                last_name=str(index)
+            )
+            for index in range(start, start + count)
+        ])
+
+    def seed_activities(self, count):
+        UserActivity.objects.bulk_create([
+            UserActivity(user=self.owner, activity_type='login', description='Query check')
+            for _ in range(count)
+        ])
+
+    def test_admin_users(self):
+        self.assertConstantQueries(views.AdminUserListView.as_view(), self.admin, self.seed_users, 1)
+
+    def test_activities(self):
+        self.assertConstantQueries(views.UserActivityListView.as_view(), self.admin, self.seed_activities, 1)
+
+    def test_dashboard(self):
+        # The statistics rows are created by the first request
+        self.get(views.dashboard_stats, self.owner)
+        self.assertConstantQueries(views.dashboard_stats, self.owner, self.seed_activities, 2)
+
+    def test_admin_dashboard(self):
+        self.get(views.dashboard_stats, self.admin)
+        self.assertConstantQueries(views.dashboard_stats, self.admin, self.seed_activities, 3)
@@ -22,4 +22,6 @@ urlpatterns = [
     # Admin URLs
     path('admin/users/', views.AdminUserListView.as_view(), name='admin_users'),
     path('admin/users/<int:pk>/', views.AdminUserDetailView.as_view(), name='admin_user_detail'),
+    path('admin/hashing-metrics/', views.hashing_metrics, name='hashing_metrics'),
+    path('admin/token-cache-metrics/', views.token_cache_metrics, name='token_cache_metrics'),
 ]
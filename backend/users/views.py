@@ -1,15 +1,19 @@
 from django.shortcuts import render
 from django.contrib.auth import login, logout
-from django.db.models import Q
+from django.db.models import Q, Count
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.exceptions import PermissionDenied
 from django.utils import timezone
+from backend.pagination import KeysetPagination
+from cards.models import CardStatistics
 from .models import CustomUser, UserActivity
+from . import hashing
+from .activity import record_activity
+from .authentication import token_cache
 from .serializers import (
     UserRegistrationSerializer, 
     UserLoginSerializer, 
@@ -33,13 +37,8 @@ def log_user_activity(user, activity_type, description="", request=None):
     ip_address = get_client_ip(request) if request else None
     user_agent = request.META.get('HTTP_USER_AGENT', '') if request else ''
     
-    UserActivity.objects.create(
-        user=user,
-        activity_type=activity_type,
-        description=description,
-        ip_address=ip_address,
-        user_agent=user_agent
-    )
+    # Buffered and written in batches (see users.activity)
+    record_activity(user, activity_type, description, ip_address, user_agent)
 
 class UserRegistrationView(generics.CreateAPIView):
     """
@@ -79,7 +78,7 @@ def login_view(request):
         # Update last login info
         user.last_login = timezone.now()
         user.last_login_ip = get_client_ip(request)
-        user.save()
+        user.save(update_fields=['last_login', 'last_login_ip'])
         
         # Log login activity
         log_user_activity(user, 'login', 'User logged in', request)
@@ -127,7 +126,8 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        # Fresh row: request.user may come from the token cache
+        return CustomUser.objects.get(pk=self.request.user.pk)
 
     def update(self, request, *args, **kwargs):
         response = super().update(request, *args, **kwargs)
@@ -147,7 +147,8 @@ class PasswordChangeView(generics.GenericAPIView):
         if serializer.is_valid():
             user = request.user
             user.set_password(serializer.validated_data['new_password'])
-            user.save()
+            # request.user may come from the token cache: only the password is written
+            user.save(update_fields=['password'])
             
             # Log password change
             log_user_activity(user, 'password_changed', 'Password changed', request)
@@ -173,7 +174,8 @@ class AdminUserListView(generics.ListCreateAPIView):
     """
     queryset = CustomUser.objects.all()
     permission_classes = [IsAuthenticated]
-    pagination_class = PageNumberPagination
+    pagination_class = KeysetPagination
+    ordering = ('-date_created', '-id')
 
     def get_serializer_class(self):
         """
@@ -219,7 +221,7 @@ class AdminUserListView(generics.ListCreateAPIView):
         if status_filter:
             queryset = queryset.filter(status=status_filter)
 
-        return queryset.order_by('-date_created')
+        return queryset
 
 class AdminUserDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
@@ -263,7 +265,8 @@ class UserActivityListView(generics.ListAPIView):
     """
     serializer_class = UserActivitySerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = PageNumberPagination
+    pagination_class = KeysetPagination
+    ordering = ('-timestamp', '-id')
 
     def get_queryset(self):
         user = self.request.user
@@ -281,7 +284,7 @@ class UserActivityListView(generics.ListAPIView):
         if activity_type:
             queryset = queryset.filter(activity_type=activity_type)
         
-        return queryset.order_by('-timestamp')
+        return UserActivitySerializer.setup_eager_loading(queryset)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -293,30 +296,65 @@ def dashboard_stats(request):
     
     if user.is_admin:
         # Admin dashboard stats
-        total_users = CustomUser.objects.count()
-        active_users = CustomUser.objects.filter(status='active').count()
-        suspended_users = CustomUser.objects.filter(status='suspended').count()
-        total_admins = CustomUser.objects.filter(user_type='admin').count()
+        user_totals = CustomUser.objects.aggregate(
+            total_users=Count('id'),
+            active_users=Count('id', filter=Q(status='active')),
+            suspended_users=Count('id', filter=Q(status='suspended')),
+            total_admins=Count('id', filter=Q(user_type='admin')),
+        )
+        card_totals = CardStatistics.for_system()
         
         stats = {
-            'total_users': total_users,
-            'active_users': active_users,
-            'suspended_users': suspended_users,
-            'total_admins': total_admins,
+            'total_users': user_totals['total_users'],
+            'active_users': user_totals['active_users'],
+            'suspended_users': user_totals['suspended_users'],
+            'total_admins': user_totals['total_admins'],
+            'total_cards': card_totals.total_cards,
+            'total_balance': str(card_totals.total_balance),
             'recent_activities': UserActivitySerializer(
-                UserActivity.objects.all()[:5], many=True
+                UserActivitySerializer.setup_eager_loading(UserActivity.objects.all())[:5], many=True
             ).data
         }
     else:
         # User dashboard stats
+        card_totals = CardStatistics.for_user(user)
+        
         stats = {
-            'total_cards': user.total_cards,
-            'total_balance': str(user.total_balance),
+            'total_cards': card_totals.current_cards,
+            'total_balance': str(card_totals.current_balance),
             'account_status': user.status,
             'member_since': user.date_created,
             'recent_activities': UserActivitySerializer(
-                UserActivity.objects.filter(user=user)[:5], many=True
+                UserActivitySerializer.setup_eager_loading(UserActivity.objects.filter(user=user))[:5], many=True
             ).data
         }
     
     return Response(stats, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def hashing_metrics(request):
+    """
+    Password hashing pool metrics of the current process (admin only)
+    """
+    if not request.user.is_admin:
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    pool = hashing.get_pool()
+    return Response({
+        'workers': pool.workers,
+        'max_pending': pool.max_pending,
+        **pool.metrics.snapshot()
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def token_cache_metrics(request):
+    """
+    Token authentication cache hit/miss counters of the current process (admin only)
+    """
+    if not request.user.is_admin:
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    return Response(token_cache.stats())
+
@@ -1,8 +1,15 @@
-import React, { createContext, useContext, useState, useEffect, useCallback } from 'react';
+import React, { createContext, useContext, useState, useEffect, useCallback, useRef } from 'react';
 import { useAuth } from './AuthContext';
+import { API_BASE_URL } from '../hooks/useApiCall';
 
 const NotificationContext = createContext();
 
+// Échecs consécutifs du flux SSE avant le repli sur le polling
+const STREAM_MAX_FAILURES = 3;
+
+// Délai avant reconnexion au flux, multiplié par le nombre d'échecs (ms)
+const STREAM_RETRY_DELAY = 3000;
+
 export const useNotifications = () => {
     const context = useContext(NotificationContext);
     if (!context) {
@@ -23,7 +30,7 @@ export const NotificationProvider = ({ children }) => {
         if (!token) return;
 
         try {
-            const response = await fetch(`http://localhost:8000/api/notifications/polling/?last_check=${lastCheck}`, {
+            const response = await fetch(`${API_BASE_URL}/notifications/polling/?last_check=${lastCheck}`, {
                 headers: {
                     'Authorization': `Token ${token}`,
                     'Content-Type': 'application/json',
@@ -57,7 +64,7 @@ export const NotificationProvider = ({ children }) => {
 
         setLoading(true);
         try {
-            const response = await fetch(`http://localhost:8000/api/notifications/recent/?limit=${limit}`, {
+            const response = await fetch(`${API_BASE_URL}/notifications/recent/?limit=${limit}`, {
                 headers: {
                     'Authorization': `Token ${token}`,
                     'Content-Type': 'application/json',
@@ -81,7 +88,7 @@ export const NotificationProvider = ({ children }) => {
         if (!token) return;
 
         try {
-            const response = await fetch('http://localhost:8000/api/notifications/mark-read/', {
+            const response = await fetch(`${API_BASE_URL}/notifications/mark-read/`, {
                 method: 'POST',
                 headers: {
                     'Authorization': `Token ${token}`,
@@ -121,7 +128,7 @@ export const NotificationProvider = ({ children }) => {
         if (!token) return;
 
         try {
-            const response = await fetch(`http://localhost:8000/api/notifications/${notificationId}/delete/`, {
+            const response = await fetch(`${API_BASE_URL}/notifications/${notificationId}/delete/`, {
                 method: 'DELETE',
                 headers: {
                     'Authorization': `Token ${token}`,
@@ -148,7 +155,7 @@ export const NotificationProvider = ({ children }) => {
         if (!token) return;
 
         try {
-            const response = await fetch('http://localhost:8000/api/notifications/clear-all/', {
+            const response = await fetch(`${API_BASE_URL}/notifications/clear-all/`, {
                 method: 'POST',
                 headers: {
                     'Authorization': `Token ${token}`,
@@ -200,18 +207,125 @@ export const NotificationProvider = ({ children }) => {
         return Notification.permission === 'granted';
     };
 
-    // Polling automatique
+    // Dernière version de pollNotifications, qui change à chaque appel (lastCheck)
+    const pollRef = useRef(pollNotifications);
+    useEffect(() => {
+        pollRef.current = pollNotifications;
+    }, [pollNotifications]);
+
+    // Polling par défaut ; flux temps réel (SSE) lorsque le serveur est sous ASGI
     useEffect(() => {
         if (!token) return;
 
         // Premier chargement
         fetchRecentNotifications();
 
+        let source = null;
+        let retry = null;
+        let interval = null;
+        let failures = 0;
+        let cursor = null;
+        let connected = false;
+        let stopped = false;
+
         // Polling toutes les 30 secondes
-        const interval = setInterval(pollNotifications, 30000);
+        const startPolling = () => {
+            if (interval !== null) return;
+            setLastCheck(new Date().toISOString());
+            interval = setInterval(() => pollRef.current(), 30000);
+        };
+
+        const stopPolling = () => {
+            clearInterval(interval);
+            interval = null;
+        };
+
+        const onFailure = () => {
+            failures += 1;
+            if (failures >= STREAM_MAX_FAILURES) {
+                // Flux indisponible (proxy...) : on reste sur le polling
+                fetchRecentNotifications();
+                startPolling();
+                return;
+            }
+            retry = setTimeout(connect, STREAM_RETRY_DELAY * failures);
+        };
+
+        const connect = async () => {
+            // Ticket de courte durée : le jeton n'apparaît pas dans l'URL du flux
+            let data;
+            try {
+                const response = await fetch(`${API_BASE_URL}/notifications/stream/ticket/`, {
+                    method: 'POST',
+                    headers: {
+                        'Authorization': `Token ${token}`,
+                        'Content-Type': 'application/json',
+                    }
+                });
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                data = await response.json();
+            } catch (error) {
+                console.error('Erreur lors de l\'ouverture du flux de notifications:', error);
+                if (!stopped) onFailure();
+                return;
+            }
+            // Serveur WSGI : le flux ne serait envoyé qu'à sa fin, on reste sur le polling
+            if (stopped || !data.streaming) return;
+
+            // Reprise au dernier identifiant reçu ; sans lui, la liste est rechargée
+            const params = new URLSearchParams({ ticket: data.ticket });
+            if (cursor !== null) {
+                params.set('cursor', cursor);
+            } else if (connected) {
+                fetchRecentNotifications();
+            }
+            source = new EventSource(`${API_BASE_URL}/notifications/stream/?${params}`);
+
+            source.onopen = () => {
+                connected = true;
+                failures = 0;
+                stopPolling();
+            };
+
+            source.addEventListener('notifications', (event) => {
+                cursor = event.lastEventId;
+                const data = JSON.parse(event.data);
+
+                if (data.notifications.length > 0) {
+                    setNotifications(prev => [...data.notifications, ...prev]);
+
+                    // Jouer un son si activé
+                    playNotificationSound();
+
+                    // Afficher notification browser si permis
+                    showBrowserNotification(data.notifications[0]);
+                }
+
+                setUnreadCount(data.unread_count);
+            });
+
+            // Fin du flux ou erreur : le ticket a pu expirer, reconnexion avec un nouveau
+            source.onerror = () => {
+                source.close();
+                source = null;
+                onFailure();
+            };
+        };
+
+        startPolling();
+        if ('EventSource' in window) {
+            connect();
+        }
 
-        return () => clearInterval(interval);
-    }, [token, fetchRecentNotifications, pollNotifications]);
+        return () => {
+            stopped = true;
+            if (source) source.close();
+            clearTimeout(retry);
+            stopPolling();
+        };
+    }, [token, fetchRecentNotifications]);
 
     const value = {
         notifications,
@@ -1,11 +1,14 @@
 import { useAuth } from '../contexts/AuthContext';
 
+// Adresse de l'API du backend
+export const API_BASE_URL = 'http://localhost:8000/api';
+
 // Hook personnalisé pour les appels API avec authentification
 export const useApiCall = () => {
     const { token, logout } = useAuth();
 
     const apiCall = async (endpoint, options = {}) => {
-        const url = `http://localhost:8000/api${endpoint}`;
+        const url = `${API_BASE_URL}${endpoint}`;
 
         const config = {
             headers: {